@@ -0,0 +1,284 @@
+"""
+Analytics Mirror (optional embedded DuckDB engine)
+Keeps a Parquet snapshot of sales_data, sales_performance_monthly, product_cost,
+monthly_targets, ar_aging_report, ar_aging_latest, ar_snapshot_summary and the dimension
+tables and answers analytics / chat queries from it with DuckDB, so scan-heavy reads
+run vectorized and off the primary MySQL database.
+
+- sales_data is stored as one Parquet file per (year, month) and ar_aging_report as
+  one file per report_date; after an import only the periods / snapshot dates
+  recorded in data_version are re-exported
+- AR files hold the full snapshot of their date, reconstructed through
+  debt_storage_services, so the mirror is correct in DEBT_STORAGE=delta mode too
+- The smaller tables are re-exported whole
+- Refresh happens after each import (refresh_global_state) and lazily on the first
+  query after a data_version change
+
+Enable with ANALYTICS_ENGINE=duckdb (requires the duckdb package).
+Any mirror error falls back to MySQL, so the setting can never break a page.
+"""
+import os
+import re
+import glob
+import threading
+import time
+from typing import Any, Dict, List, Optional
+import pandas as pd
+from sqlalchemy import text
+from sqlalchemy.sql.elements import TextClause
+from database import engine
+from data_version import current_version, changed_periods_since, changed_report_dates_since
+from debt_storage_services import snapshot_source, SNAPSHOT_TABLE
+
+try:
+    import duckdb
+except ImportError:  # optional dependency
+    duckdb = None
+
+MIRROR_DIR = os.getenv("ANALYTICS_MIRROR_DIR", os.path.join(os.path.dirname(__file__), "analytics_mirror"))
+SALES_DIR = os.path.join(MIRROR_DIR, "sales_data")
+AR_DIR = os.path.join(MIRROR_DIR, "ar_aging_report")
+NULL_PERIOD_FILE = "period_null.parquet"
+
+# Tables re-exported whole on every refresh
+SMALL_TABLES = ("sales_performance_monthly", "product_cost", "monthly_targets",
+                "ar_aging_latest", "ar_snapshot_summary",
+                "dim_salesman", "dim_customer", "dim_product", "dim_branch", "dim_channel")
+
+_PARAM_PATTERN = re.compile(r"(?<![:\w]):(\w+)")
+
+_lock = threading.Lock()  # serializes refreshes
+_connection = None
+_mirror_version = None
+
+# Connection swap bookkeeping: a refresh retires the old connection and it is closed
+# once the queries still running on it finish
+_connection_lock = threading.Lock()
+_in_flight: Dict[int, int] = {}  # id(connection) -> running queries
+_retired: Dict[int, Any] = {}    # id(connection) -> connection waiting to be closed
+
+
+def enabled() -> bool:
+    return duckdb is not None and os.getenv("ANALYTICS_ENGINE", "mysql").lower() == "duckdb"
+
+
+# ---------- snapshot export ----------
+
+def _write_parquet(df: pd.DataFrame, path: str):
+    """Write atomically so concurrent DuckDB scans never see a half-written file"""
+    tmp_path = path + ".tmp"
+    df.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+
+def _remove_stale(directory: str, keep):
+    """
+    Drop the files a full export no longer wrote
+    Files are replaced in place first, so queries running meanwhile never miss one.
+    """
+    for path in glob.glob(os.path.join(directory, "*.parquet")):
+        if path not in keep:
+            os.remove(path)
+
+
+def _period_file(year, month) -> str:
+    if year is None or month is None:
+        return os.path.join(SALES_DIR, NULL_PERIOD_FILE)
+    return os.path.join(SALES_DIR, f"period_{int(year)}_{int(month):02d}.parquet")
+
+
+def _export_period(conn, year, month):
+    if year is None or month is None:
+        df = pd.read_sql(text("SELECT * FROM sales_data WHERE year IS NULL OR month_number IS NULL"), conn)
+    else:
+        df = pd.read_sql(text("SELECT * FROM sales_data WHERE year = :year AND month_number = :month"),
+                         conn, params={"year": int(year), "month": int(month)})
+    path = _period_file(year, month)
+    if df.empty:
+        if os.path.exists(path):
+            os.remove(path)
+        return 0
+    _write_parquet(df, path)
+    return len(df)
+
+
+def _export_sales(conn, periods=None) -> int:
+    """Export the given (year, month) periods of sales_data, or every period when None"""
+    os.makedirs(SALES_DIR, exist_ok=True)
+    full = periods is None
+    if full:
+        periods = [tuple(r) for r in conn.execute(text(
+            "SELECT DISTINCT year, month_number FROM sales_data"
+        )).fetchall()]
+        if any(y is None or m is None for y, m in periods):
+            periods = [p for p in periods if p[0] is not None and p[1] is not None] + [(None, None)]
+    rows = sum(_export_period(conn, year, month) for year, month in periods)
+    if full:
+        _remove_stale(SALES_DIR, {_period_file(year, month) for year, month in periods})
+    return rows
+
+
+def _report_date_file(report_date) -> str:
+    return os.path.join(AR_DIR, f"report_{report_date}.parquet")
+
+
+def _export_report_date(conn, report_date) -> int:
+    """Export the full snapshot of report_date (delta dates store only changed rows)"""
+    source, params = snapshot_source(conn, report_date)
+    df = pd.read_sql(text(f"SELECT * FROM {source} r"), conn, params=params)
+    path = _report_date_file(report_date)
+    if df.empty:
+        if os.path.exists(path):
+            os.remove(path)
+        return 0
+    _write_parquet(df, path)
+    return len(df)
+
+
+def _export_debt(conn, report_dates=None) -> int:
+    """Export the given AR snapshot dates, or every date when None"""
+    os.makedirs(AR_DIR, exist_ok=True)
+    full = report_dates is None
+    if full:
+        # A delta date where nothing changed has no rows of its own
+        report_dates = [r[0] for r in conn.execute(text(
+            f"SELECT report_date FROM ar_aging_report UNION SELECT report_date FROM {SNAPSHOT_TABLE}"
+        )).fetchall()]
+    rows = sum(_export_report_date(conn, str(report_date)) for report_date in sorted(report_dates))
+    if full:
+        _remove_stale(AR_DIR, {_report_date_file(str(report_date)) for report_date in report_dates})
+    return rows
+
+
+def _export_small_tables(conn):
+    for table in SMALL_TABLES:
+        _write_parquet(pd.read_sql(text(f"SELECT * FROM {table}"), conn), os.path.join(MIRROR_DIR, f"{table}.parquet"))
+
+
+def _open_connection():
+    """In-memory DuckDB with one view per mirrored table"""
+    con = duckdb.connect(database=":memory:")
+    # read_parquet fails on an empty glob: leave the view out so those queries fall back to MySQL
+    if glob.glob(os.path.join(SALES_DIR, "*.parquet")):
+        sales_glob = os.path.join(SALES_DIR, "*.parquet").replace("'", "''")
+        con.execute(f"CREATE VIEW sales_data AS SELECT * FROM read_parquet('{sales_glob}', union_by_name = true)")
+    if glob.glob(os.path.join(AR_DIR, "*.parquet")):
+        ar_glob = os.path.join(AR_DIR, "*.parquet").replace("'", "''")
+        con.execute(f"CREATE VIEW ar_aging_report AS SELECT * FROM read_parquet('{ar_glob}', union_by_name = true)")
+    for table in SMALL_TABLES:
+        path = os.path.join(MIRROR_DIR, f"{table}.parquet").replace("'", "''")
+        con.execute(f"CREATE VIEW {table} AS SELECT * FROM read_parquet('{path}')")
+    return con
+
+
+def refresh(full: bool = False) -> Optional[int]:
+    """
+    Bring the mirror up to the current data version
+
+    Args:
+        full: Re-export every sales period (otherwise only the changed ones)
+
+    Returns:
+        Mirror version, or None when the mirror is disabled
+    """
+    global _connection, _mirror_version
+    if not enabled():
+        return None
+
+    with _lock:
+        version = current_version()
+        if _mirror_version == version and _connection is not None and not full:
+            return version
+
+        start = time.perf_counter()
+        periods, report_dates = None, None
+        if not full and _mirror_version is not None:
+            if glob.glob(os.path.join(SALES_DIR, "*.parquet")):
+                periods = changed_periods_since(_mirror_version)
+            if os.path.isdir(AR_DIR):
+                report_dates = changed_report_dates_since(_mirror_version)
+
+        with engine.connect() as conn:
+            rows = _export_sales(conn, periods)
+            _export_debt(conn, report_dates)
+            _export_small_tables(conn)
+
+        new_connection = _open_connection()
+        with _connection_lock:
+            old_connection, _connection = _connection, new_connection
+            _mirror_version = version
+            if old_connection is not None and _in_flight.get(id(old_connection)):
+                _retired[id(old_connection)] = old_connection
+                old_connection = None
+        if old_connection is not None:
+            old_connection.close()
+
+        scope = "full" if periods is None else f"{len(periods)} periods"
+        scope += ", all AR snapshots" if report_dates is None else f", {len(report_dates)} AR snapshots"
+        print(f"Analytics mirror refreshed ({scope}, {rows:,} sales rows) in {(time.perf_counter() - start) * 1000:.0f} ms")
+        return version
+
+
+# ---------- query routing ----------
+
+def _to_duckdb(query, params: Optional[Dict[str, Any]]):
+    """SQLAlchemy-style :name parameters -> DuckDB $name parameters"""
+    sql = query.text if isinstance(query, TextClause) else str(query)
+    if not params:
+        return sql, None
+    sql = _PARAM_PATTERN.sub(lambda m: f"${m.group(1)}" if m.group(1) in params else m.group(0), sql)
+    return sql, params
+
+
+def _acquire():
+    """Current connection, counted as in use until _release"""
+    with _connection_lock:
+        con = _connection
+        if con is not None:
+            _in_flight[id(con)] = _in_flight.get(id(con), 0) + 1
+        return con
+
+
+def _release(con):
+    """Close a retired connection once its last query is done"""
+    with _connection_lock:
+        remaining = _in_flight.pop(id(con)) - 1
+        if remaining:
+            _in_flight[id(con)] = remaining
+            return
+        con = _retired.pop(id(con), None)
+    if con is not None:
+        con.close()
+
+
+def execute(query, params: Optional[Dict[str, Any]] = None) -> List[tuple]:
+    """Run a query on the mirror (refreshing it first if the data changed)"""
+    if _mirror_version != current_version() or _connection is None:
+        refresh()
+    sql, duck_params = _to_duckdb(query, params)
+    con = _acquire()
+    if con is None:
+        raise RuntimeError("Analytics mirror is not available")
+    try:
+        cursor = con.cursor()
+        try:
+            return cursor.execute(sql, duck_params).fetchall() if duck_params else cursor.execute(sql).fetchall()
+        finally:
+            cursor.close()
+    finally:
+        _release(con)
+
+
+def fetchall(db, query, params: Optional[Dict[str, Any]] = None) -> List[Any]:
+    """
+    Route a read-only analytics query: DuckDB mirror when enabled, otherwise MySQL
+    Falls back to MySQL if the mirror fails (missing snapshot, dialect difference, ...)
+    """
+    if enabled():
+        try:
+            return execute(query, params)
+        except Exception as e:
+            print(f"Analytics mirror query failed, falling back to MySQL: {e}")
+    if isinstance(query, str):
+        query = text(query)
+    return db.execute(query, params or {}).fetchall()
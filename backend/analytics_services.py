@@ -7,6 +7,9 @@ import pandas as pd
 from sqlalchemy.orm import Session
 from sqlalchemy import text
 from typing import List, Dict, Any
+from query_builder import filtered_query
+import columnar_cache
+import analytics_mirror
 
 
 def get_product_matrix(db: Session, year: int = None, semester: int = None) -> List[Dict[str, Any]]:
@@ -17,25 +20,36 @@ def get_product_matrix(db: Session, year: int = None, semester: int = None) -> L
     Supports semester filtering: None (whole year), 1 (Jan-Jun), 2 (Jul-Dec)
     """
     try:
-        # Build query to join sales_data with product_cost
-        # LIMIT to TOP 50 by revenue
-        query = text("""
+        cache = columnar_cache.get_cache(db)
+        if cache is not None:
+            return cache.product_matrix(year, semester)
+        
+        # Group on the integer product key, LIMIT to TOP 50 by revenue,
+        # then join product names for those 50 rows only
+        query, params = filtered_query("""
             SELECT 
-                sd.description as product_name,
-                SUM(sd.net_value) as total_revenue,
-                SUM(sd.billing_qty) as total_quantity,
-                SUM(sd.profit) as total_profit
-            FROM sales_data sd
-            WHERE (:year IS NULL OR sd.year = :year)
-              AND (:semester IS NULL OR 
-                   (CASE WHEN sd.month_number <= 6 THEN 1 ELSE 2 END) = :semester)
-            GROUP BY sd.description
-            HAVING total_revenue > 0
-            ORDER BY total_revenue DESC
-            LIMIT 50
-        """)
-        
-        result = db.execute(query, {'year': year, 'semester': semester}).fetchall()
+                dp.name as product_name,
+                t.total_revenue,
+                t.total_quantity,
+                t.total_profit
+            FROM (
+                SELECT 
+                    sd.product_id,
+                    SUM(sd.net_value) as total_revenue,
+                    SUM(sd.billing_qty) as total_quantity,
+                    SUM(sd.profit) as total_profit
+                FROM sales_data sd
+                WHERE {where}
+                GROUP BY sd.product_id
+                HAVING SUM(sd.net_value) > 0
+                ORDER BY total_revenue DESC
+                LIMIT 50
+            ) t
+            LEFT JOIN dim_product dp ON dp.id = t.product_id
+            ORDER BY t.total_revenue DESC
+        """, alias='sd', year=year, semester=semester)
+        
+        result = analytics_mirror.fetchall(db, query, params)
         
         products = []
         for row in result:
@@ -71,21 +85,20 @@ def get_target_waterfall(db: Session, year: int = None, semester: int = None) ->
     Supports semester filtering: None (whole year), 1 (Jan-Jun), 2 (Jul-Dec)
     """
     try:
-        # Query sales performance view with NULL handling
-        query = text("""
+        # Query materialized sales performance summary with NULL handling
+        query, params = filtered_query("""
             SELECT 
                 salesman_name,
                 COALESCE(SUM(total_revenue), 0) as actual,
                 COALESCE(SUM(total_target), 0) as target
-            FROM view_sales_performance_v2
-            WHERE (:year IS NULL OR year = :year)
-              AND (:semester IS NULL OR semester = :semester)
+            FROM sales_performance_monthly
+            WHERE {where}
             GROUP BY salesman_name
             HAVING target > 0
             ORDER BY salesman_name
-        """)
+        """, year=year, semester=semester)
         
-        result = db.execute(query, {'year': year, 'semester': semester}).fetchall()
+        result = analytics_mirror.fetchall(db, query, params)
         
         if not result:
             return []
@@ -135,21 +148,23 @@ def get_seasonality_heatmap(db: Session, year: int = None, semester: int = None)
     Supports semester filtering: None (whole year), 1 (Jan-Jun), 2 (Jul-Dec)
     """
     try:
+        cache = columnar_cache.get_cache(db)
+        if cache is not None:
+            return cache.seasonality(year, semester)
+        
         # Query revenue by year and month
-        query = text("""
+        query, params = filtered_query("""
             SELECT 
                 year,
                 month_number,
                 SUM(net_value) as revenue
             FROM sales_data
-            WHERE (:year IS NULL OR year = :year)
-              AND (:semester IS NULL OR 
-                   (CASE WHEN month_number <= 6 THEN 1 ELSE 2 END) = :semester)
+            WHERE {where}
             GROUP BY year, month_number
             ORDER BY year, month_number
-        """)
+        """, year=year, semester=semester)
         
-        result = db.execute(query, {'year': year, 'semester': semester}).fetchall()
+        result = analytics_mirror.fetchall(db, query, params)
         
         heatmap_data = []
         for row in result:
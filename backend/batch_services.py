@@ -0,0 +1,277 @@
+"""
+Import Batch Lineage Services
+Every import stamps an import_batch_id on the rows it writes so a bad upload can be rolled back.
+Rows an import overwrites or deletes (upserted SAP corrections, a replaced period,
+a re-imported AR snapshot) are kept in import_batch_preimages and restored on rollback.
+"""
+import json
+import uuid
+from collections import defaultdict
+from datetime import datetime, date
+from typing import List, Dict, Any, Iterable, Mapping, Set, Tuple
+import pandas as pd
+from sqlalchemy.orm import Session
+from sqlalchemy import text, bindparam
+from models import ImportBatch
+from summary_services import refresh_sales_performance_cells, refresh_ar_snapshot_summary
+from debt_storage_services import detach_snapshot, snapshot_preimage, restore_snapshot, ROW_COLUMNS
+
+PREIMAGE_TABLE = "import_batch_preimages"
+
+# Rows per executemany batch when saving / restoring pre-images
+PREIMAGE_BATCH_SIZE = 5000
+
+
+def create_import_batch(db: Session, kind: str, filename: str = None, batch_id: str = None) -> str:
+    """
+    Register a new import batch in the caller's transaction
+    The batch row is committed together with the data it describes
+
+    Args:
+        kind: 'sales' or 'debt'
+        filename: Original upload name (for the import history)
+        batch_id: Pre-generated id (when rows were stamped before the batch row is written)
+
+    Returns:
+        The batch id (UUID string)
+    """
+    batch_id = batch_id or str(uuid.uuid4())
+    db.add(ImportBatch(
+        id=batch_id,
+        kind=kind,
+        filename=filename,
+        created_at=datetime.utcnow(),
+        rows_written=0,
+        status="active"
+    ))
+    db.flush()
+    return batch_id
+
+
+def finish_import_batch(db: Session, batch_id: str, rows_written: int):
+    """Record how many rows the batch wrote (still inside the import transaction)"""
+    db.query(ImportBatch).filter(ImportBatch.id == batch_id).update({"rows_written": rows_written})
+
+
+def list_import_batches(db: Session, limit: int = 50) -> List[Dict[str, Any]]:
+    """Most recent import batches first"""
+    batches = db.query(ImportBatch).order_by(ImportBatch.created_at.desc()).limit(limit).all()
+    return [
+        {
+            "batch_id": b.id,
+            "kind": b.kind,
+            "filename": b.filename,
+            "created_at": b.created_at.isoformat() if b.created_at else None,
+            "rows_written": b.rows_written,
+            "status": b.status
+        }
+        for b in batches
+    ]
+
+
+# ---------- pre-images ----------
+
+def save_preimage(db: Session, batch_id: str, table_name: str, rows: Iterable[Mapping[str, Any]]) -> int:
+    """
+    Keep the previous version of rows an import is about to overwrite or delete
+    Runs in the import transaction, so the pre-image commits with the data it protects.
+
+    Args:
+        table_name: Table the rows belong to
+        rows: Column -> value mappings (full rows, including id where there is one)
+
+    Returns:
+        Number of rows saved
+    """
+    payload = [
+        {"batch_id": batch_id, "table_name": table_name, "row_data": json.dumps(dict(row), default=str)}
+        for row in rows
+    ]
+    insert = text(f"""
+        INSERT INTO {PREIMAGE_TABLE} (batch_id, table_name, row_data)
+        VALUES (:batch_id, :table_name, :row_data)
+    """)
+    for i in range(0, len(payload), PREIMAGE_BATCH_SIZE):
+        db.execute(insert, payload[i:i + PREIMAGE_BATCH_SIZE])
+    return len(payload)
+
+
+def save_snapshot_preimage(db: Session, batch_id: str, report_date: date) -> int:
+    """Keep the AR snapshot a debt import is about to replace (no-op for a new date)"""
+    frame, owner = snapshot_preimage(db, report_date)
+    if frame.empty:
+        return 0
+    records = frame[ROW_COLUMNS].astype(object).where(frame[ROW_COLUMNS].notna(), None)
+    save_preimage(db, batch_id, "ar_snapshots", [{"report_date": report_date, "batch_id": owner}])
+    return save_preimage(db, batch_id, "ar_aging_report",
+                         [{**row, "report_date": report_date} for row in records.to_dict("records")])
+
+
+def _load_preimage(db: Session, batch_id: str) -> Dict[str, List[Dict[str, Any]]]:
+    rows = db.execute(text(f"""
+        SELECT table_name, row_data FROM {PREIMAGE_TABLE}
+        WHERE batch_id = :batch_id
+        ORDER BY id
+    """), {"batch_id": batch_id}).fetchall()
+    tables = defaultdict(list)
+    for table_name, row_data in rows:
+        tables[table_name].append(json.loads(row_data))
+    return tables
+
+
+def _rolled_back_batches(db: Session, batch_ids: Set[str]) -> Set[str]:
+    if not batch_ids:
+        return set()
+    rows = db.execute(text("""
+        SELECT id FROM import_batches WHERE status = 'rolled_back' AND id IN :ids
+    """).bindparams(bindparam("ids", expanding=True)), {"ids": sorted(batch_ids)}).fetchall()
+    return {r[0] for r in rows}
+
+
+def _restore_sales_rows(db: Session, rows: List[Dict[str, Any]]) -> int:
+    """
+    Re-insert pre-image sales rows
+    Rows stamped by a batch that was rolled back since are dropped, and keys a later
+    batch has written again keep the later version (INSERT IGNORE on the unique key).
+    """
+    gone = _rolled_back_batches(db, {r["import_batch_id"] for r in rows if r.get("import_batch_id")})
+    rows = [r for r in rows if r.get("import_batch_id") not in gone]
+    if not rows:
+        return 0
+    cols = list(rows[0].keys())
+    insert = text(f"""
+        INSERT IGNORE INTO sales_data ({", ".join(cols)})
+        VALUES ({", ".join(':' + c for c in cols)})
+    """)
+    restored = 0
+    for i in range(0, len(rows), PREIMAGE_BATCH_SIZE):
+        restored += db.execute(insert, rows[i:i + PREIMAGE_BATCH_SIZE]).rowcount
+    return restored
+
+
+def _sales_periods(db: Session, batch_id: str) -> Set[Tuple[int, int]]:
+    rows = db.execute(text("""
+        SELECT DISTINCT year, month_number FROM sales_data WHERE import_batch_id = :batch_id
+    """), {"batch_id": batch_id}).fetchall()
+    return {(int(y), int(m)) for y, m in rows if y is not None and m is not None}
+
+
+def _later_sales_conflicts(db: Session, batch: ImportBatch, periods: Set[Tuple[int, int]]) -> List[str]:
+    """Active sales batches imported after `batch` that wrote rows into the same periods"""
+    later = db.query(ImportBatch).filter(
+        ImportBatch.kind == "sales",
+        ImportBatch.status == "active",
+        ImportBatch.created_at >= batch.created_at,
+        ImportBatch.id != batch.id
+    ).all()
+    return [b.id for b in later if _sales_periods(db, b.id) & periods]
+
+
+# ---------- rollback ----------
+
+def rollback_import_batch(db: Session, batch_id: str) -> Dict[str, Any]:
+    """
+    Undo an import batch
+    Deletes the rows it wrote (through the import_batch_id indexes) and restores the
+    rows it overwrote from its pre-image: the previous version of upserted SAP lines,
+    the replaced period's rows, the replaced AR snapshot. Summary tables are refreshed
+    only for the cells / snapshot dates involved, so the cost follows the batch size.
+
+    A sales batch with a pre-image cannot be rolled back while a later active sales
+    batch has rows in the same periods (restoring would overwrite the later import);
+    those later batches must be rolled back first. AR snapshots that a later import
+    has replaced are left alone.
+
+    Returns:
+        Dict with status ('success', or 'error' / 'conflict' / 'info' with a message),
+        rows deleted / restored per table and the affected sales periods / AR snapshots
+    """
+    batch = db.query(ImportBatch).filter(ImportBatch.id == batch_id).first()
+    if not batch:
+        return {"status": "error", "message": f"Import batch {batch_id} not found"}
+    if batch.status == "rolled_back":
+        return {"status": "info", "message": f"Import batch {batch_id} was already rolled back"}
+
+    try:
+        params = {"batch_id": batch_id}
+        preimage = _load_preimage(db, batch_id)
+
+        # Capture what the batch touched before deleting (index range scans)
+        sales_cells = db.execute(text("""
+            SELECT DISTINCT salesman_name, year, month_number
+            FROM sales_data
+            WHERE import_batch_id = :batch_id
+        """), params).fetchall()
+        sales_cells = {(r[0], r[1], r[2]) for r in sales_cells}
+        sales_cells |= {(r.get("salesman_name"), r.get("year"), r.get("month_number")) for r in preimage["sales_data"]}
+
+        if preimage["sales_data"]:
+            periods = {(int(y), int(m)) for _, y, m in sales_cells if y is not None and m is not None}
+            conflicts = _later_sales_conflicts(db, batch, periods)
+            if conflicts:
+                return {
+                    "status": "conflict",
+                    "message": (f"Import batch {batch_id} overwrote existing rows and later imports "
+                                f"{', '.join(conflicts)} changed the same periods. Roll those back first.")
+                }
+
+        # Snapshot dates this batch still owns (delta dates may store no rows of their own)
+        report_dates = sorted({r[0] for r in db.execute(text("""
+            SELECT DISTINCT report_date FROM ar_aging_report WHERE import_batch_id = :batch_id
+            UNION
+            SELECT report_date FROM ar_snapshots WHERE batch_id = :batch_id
+        """), params).fetchall()})
+
+        # Delta AR snapshots that reconstruct through these dates become checkpoints first
+        for report_date in report_dates:
+            detach_snapshot(db, report_date)
+
+        sales_deleted = db.execute(
+            text("DELETE FROM sales_data WHERE import_batch_id = :batch_id"), params
+        ).rowcount
+        debt_deleted = db.execute(
+            text("DELETE FROM ar_aging_report WHERE import_batch_id = :batch_id"), params
+        ).rowcount
+
+        # Put back what the batch overwrote
+        sales_restored = _restore_sales_rows(db, preimage["sales_data"])
+        owners = {str(r["report_date"]): r["batch_id"] for r in preimage["ar_snapshots"]}
+        previous_snapshots = defaultdict(list)
+        for row in preimage["ar_aging_report"]:
+            previous_snapshots[str(row["report_date"])].append(row)
+        debt_restored = 0
+        for report_date in report_dates:
+            rows = previous_snapshots.get(str(report_date))
+            if rows:
+                restore_snapshot(db, report_date, pd.DataFrame(rows, columns=ROW_COLUMNS), owners.get(str(report_date)))
+                debt_restored += len(rows)
+
+        # Summary tables: re-aggregate only the cells this batch touched
+        refresh_sales_performance_cells(db, sales_cells)
+        refresh_ar_snapshot_summary(db, report_dates)
+
+        db.execute(text(f"DELETE FROM {PREIMAGE_TABLE} WHERE batch_id = :batch_id"), params)
+        batch.status = "rolled_back"
+        db.commit()
+
+        periods = sorted({(int(r[1]), int(r[2])) for r in sales_cells if r[1] is not None and r[2] is not None})
+        print(f"Rolled back batch {batch_id}: {sales_deleted} sales rows deleted, {sales_restored} restored, "
+              f"{debt_deleted} debt rows deleted, {debt_restored} restored")
+
+        return {
+            "status": "success",
+            "batch_id": batch_id,
+            "sales_rows_deleted": sales_deleted,
+            "sales_rows_restored": sales_restored,
+            "debt_rows_deleted": debt_deleted,
+            "debt_rows_restored": debt_restored,
+            "periods_affected": [{"year": y, "month": m} for y, m in periods],
+            "report_dates_affected": [str(d) for d in report_dates]
+        }
+
+    except Exception as e:
+        db.rollback()
+        print(f"Error rolling back batch {batch_id}: {e}")
+        import traceback
+        traceback.print_exc()
+        raise
@@ -0,0 +1,75 @@
+"""
+Benchmark: columnar cache vs the MySQL path
+Times the dashboard, product matrix, seasonality and channel aggregations for the
+latest year through both paths against the configured database, and checks that
+both return the same numbers.
+
+Usage: python benchmark_columnar_cache.py [repeats]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from database import SessionLocal
+import columnar_cache
+import year_services
+import analytics_services
+import services
+
+
+def timed(fn, repeats):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        result = fn()
+    return result, (time.perf_counter() - start) / repeats * 1000
+
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    db = SessionLocal()
+    try:
+        year = year_services.get_default_year(db)
+
+        os.environ["COLUMNAR_CACHE"] = "1"
+        start = time.perf_counter()
+        cache = columnar_cache.get_cache(db)
+        load_ms = (time.perf_counter() - start) * 1000
+        # Service functions below take the MySQL path; the cache is queried directly
+        os.environ["COLUMNAR_CACHE"] = "0"
+
+        cases = [
+            ("Dashboard charts",
+             lambda: year_services._dashboard_charts_sql(db, year),
+             lambda: cache.dashboard_charts(year),
+             lambda r: r["revenue"]),
+            ("Product matrix (S1)",
+             lambda: analytics_services.get_product_matrix(db, year, 1),
+             lambda: cache.product_matrix(year, 1),
+             lambda r: sum(p["revenue"] for p in r)),
+            ("Seasonality",
+             lambda: analytics_services.get_seasonality_heatmap(db),
+             lambda: cache.seasonality(),
+             lambda r: sum(p["revenue"] for p in r)),
+            ("Channel performance",
+             lambda: services._channel_rows_sql(db, year),
+             lambda: cache.channel_rows(year),
+             lambda r: sum(row[2] for row in r)),
+        ]
+
+        print("=" * 80)
+        print(f"COLUMNAR CACHE vs MySQL ({len(cache):,} rows, year {year}, load {load_ms:.0f} ms)")
+        print("=" * 80)
+        print(f"  {'Query':<24}{'MySQL ms':>12}{'Cache ms':>12}{'Speedup':>10}  Match")
+        for name, sql_fn, cache_fn, checksum in cases:
+            sql_result, sql_ms = timed(sql_fn, repeats)
+            cache_result, cache_ms = timed(cache_fn, repeats)
+            match = abs(float(checksum(sql_result)) - float(checksum(cache_result))) < 1e-3 * max(1.0, abs(float(checksum(sql_result))))
+            print(f"  {name:<24}{sql_ms:>12.1f}{cache_ms:>12.2f}{sql_ms / max(cache_ms, 1e-6):>9.0f}x  {'✅' if match else '❌'}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
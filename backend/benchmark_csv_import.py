@@ -0,0 +1,81 @@
+"""
+Benchmark: xlsx vs CSV/TSV ingest time for the same ZRSD002 data
+Generates a synthetic sales export, writes it in each format, then times
+file_readers.read_table + the import preparation step for each.
+
+Usage: python benchmark_csv_import.py [rows]
+"""
+import os
+import sys
+import time
+import tempfile
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from file_readers import read_table, CSV_ENGINE
+from import_services import SALES_COLUMN_MAPPING, _prepare_sales_frame
+
+
+def make_sales_export(rows: int) -> pd.DataFrame:
+    """Synthetic ZRSD002 export with the real column headers"""
+    rng = np.random.default_rng(42)
+    dates = pd.Timestamp('2025-01-01') + pd.to_timedelta(rng.integers(0, 365, rows), unit='D')
+    return pd.DataFrame({
+        "Billing Document": 90000000 + np.arange(rows) // 5,
+        "Billing Item": (np.arange(rows) % 5 + 1) * 10,
+        "Material": rng.integers(100000, 101000, rows).astype(str),
+        "Net Value": rng.uniform(1e5, 5e7, rows).round(0),
+        "Salesman Name": rng.choice([f"SALESMAN {i}" for i in range(80)], rows),
+        "Billing Date": dates,
+        "Description": rng.choice([f"PRODUCT {i}" for i in range(1500)], rows),
+        "Billing Qty": rng.integers(1, 500, rows),
+        "Dist": rng.choice(["Industry", "Retail", "Project"], rows),
+        "Branch": rng.choice(["HCM", "HN", "DN", "CT"], rows),
+        "PH3": rng.choice([f"GROUP {i}" for i in range(40)], rows),
+        "Name of Bill to": rng.choice([f"CUSTOMER {i}" for i in range(5000)], rows),
+    })
+
+
+def time_ingest(path: str, repeats: int = 3) -> float:
+    """Best-of-N seconds to read + prepare a file"""
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        df = read_table(path, os.path.basename(path)).rename(columns=SALES_COLUMN_MAPPING)
+        _prepare_sales_frame(df)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run_benchmark(rows: int = 100_000):
+    print("=" * 80)
+    print(f"INGEST BENCHMARK: {rows:,} rows (CSV engine: {CSV_ENGINE})")
+    print("=" * 80)
+
+    df = make_sales_export(rows)
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = {
+            "xlsx": os.path.join(tmp, "zrsd002.xlsx"),
+            "csv": os.path.join(tmp, "zrsd002.csv"),
+            "tsv": os.path.join(tmp, "zrsd002.tsv"),
+        }
+        print("\n[Setup] Writing files...")
+        df.to_excel(paths["xlsx"], index=False)
+        df.to_csv(paths["csv"], index=False)
+        df.to_csv(paths["tsv"], index=False, sep='\t')
+
+        results = {}
+        for fmt, path in paths.items():
+            results[fmt] = time_ingest(path)
+            size_mb = os.path.getsize(path) / 1024 / 1024
+            print(f"  {fmt:5s} {size_mb:8.1f} MB  {results[fmt] * 1000:10.0f} ms")
+
+    print("\n[Result]")
+    for fmt in ("csv", "tsv"):
+        print(f"  {fmt} is {results['xlsx'] / results[fmt]:.1f}x faster than xlsx")
+
+
+if __name__ == "__main__":
+    run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
@@ -0,0 +1,83 @@
+"""
+Benchmark: delta storage for daily AR snapshots
+Generates a year of synthetic daily ZRFI005 snapshots (a fraction of customers change
+balance each day, a few leave and a few arrive) and counts the ar_aging_report rows
+stored in full mode vs delta mode with debt_storage_services.diff_snapshot.
+
+Usage: python benchmark_debt_storage.py [customers] [days] [daily_change_rate] [checkpoint_interval]
+"""
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from debt_storage_services import diff_snapshot, AMOUNT_COLUMNS, ROW_COLUMNS
+
+# Approximate InnoDB row size of ar_aging_report (8 doubles + strings + indexes)
+BYTES_PER_ROW = 320
+
+
+def initial_snapshot(rng, n_customers: int) -> pd.DataFrame:
+    df = pd.DataFrame({
+        "salesman_name": rng.choice([f"Salesman {i}" for i in range(60)], n_customers),
+        "customer_name": [f"Customer {i}" for i in range(n_customers)],
+        "customer_code": [f"C{i:07d}" for i in range(n_customers)],
+        "channel": rng.choice(["Industry", "Retail", "Project", "Others"], n_customers),
+    })
+    for column in AMOUNT_COLUMNS:
+        df[column] = np.round(rng.lognormal(16, 1.5, n_customers) * (rng.random(n_customers) < 0.4), 0)
+    df["import_batch_id"] = None
+    return df[ROW_COLUMNS]
+
+
+def next_day(rng, df: pd.DataFrame, change_rate: float, next_code: int) -> pd.DataFrame:
+    df = df.copy()
+    changed = rng.random(len(df)) < change_rate
+    df.loc[changed, "total_debt"] = np.round(df.loc[changed, "total_debt"] * rng.uniform(0.5, 1.2, changed.sum()), 0)
+    df.loc[changed, "total_realization"] += np.round(rng.lognormal(14, 1, changed.sum()), 0)
+    df = df[rng.random(len(df)) >= change_rate / 20]  # churn: customers leaving
+    arrivals = initial_snapshot(rng, max(1, int(len(df) * change_rate / 20)))
+    arrivals["customer_code"] = [f"C{next_code + i:07d}" for i in range(len(arrivals))]
+    return pd.concat([df, arrivals], ignore_index=True)
+
+
+def main():
+    n_customers = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    days = int(sys.argv[2]) if len(sys.argv) > 2 else 365
+    change_rate = float(sys.argv[3]) if len(sys.argv) > 3 else 0.03
+    interval = int(sys.argv[4]) if len(sys.argv) > 4 else 7
+
+    rng = np.random.default_rng(5)
+    previous = initial_snapshot(rng, n_customers)
+    next_code = n_customers
+    full_rows = delta_rows = len(previous)
+    diff_seconds = 0.0
+
+    for day in range(1, days):
+        current = next_day(rng, previous, change_rate, next_code)
+        next_code += n_customers
+        full_rows += len(current)
+        if day % interval == 0:
+            delta_rows += len(current)
+        else:
+            start = time.perf_counter()
+            changed, removed = diff_snapshot(previous, current)
+            diff_seconds += time.perf_counter() - start
+            delta_rows += len(changed) + len(removed)
+        previous = current
+
+    print("=" * 80)
+    print(f"AR SNAPSHOT STORAGE: {days} days, ~{n_customers:,} customers, "
+          f"{change_rate * 100:.1f}% daily change, checkpoint every {interval}")
+    print("=" * 80)
+    print(f"  Full mode rows:   {full_rows:>14,}  (~{full_rows * BYTES_PER_ROW / 2**20:,.0f} MB)")
+    print(f"  Delta mode rows:  {delta_rows:>14,}  (~{delta_rows * BYTES_PER_ROW / 2**20:,.0f} MB)")
+    print(f"  Reduction:        {(1 - delta_rows / full_rows) * 100:>13.1f} %")
+    print(f"  Diff per import:  {diff_seconds / max(1, days - 1 - (days - 1) // interval) * 1000:>11.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
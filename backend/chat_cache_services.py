@@ -0,0 +1,274 @@
+"""
+Chat SQL Cache
+Generated SQL of the AI analyst keyed by the normalized question, so repeated
+questions ("Doanh thu tháng 10?", "doanh thu thang 10") skip the SQL-generation
+model call, and results of that SQL keyed by the normalized SQL text and the
+data version, so repeated analytic queries skip the database until the next import.
+
+- Questions are case-folded, stripped of Vietnamese diacritics (đ -> d) and of
+  trailing punctuation, and whitespace-collapsed before hashing
+- Entries carry the fingerprint of the schema prompt; a changed DB_SCHEMA / rule
+  set drops every older entry
+- Bounded LRU in memory (CHAT_SQL_CACHE_SIZE), persisted in chat_sql_cache so the
+  cache survives restarts; evicted entries are deleted from the table too
+- Only SQL that executed successfully (or NO_SQL answers) is stored
+- Results live in memory only (CHAT_RESULT_CACHE_SIZE entries), are dropped on a
+  data_version change and are never cached above CHAT_RESULT_MAX_ROWS rows, nor
+  for SQL whose answer changes without an import (CURDATE(), NOW(), RAND(), ...)
+
+Persistence errors are logged and ignored: the cache can never break a chat.
+"""
+import os
+import re
+import hashlib
+import threading
+import traceback
+import unicodedata
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy.orm import Session
+from sqlalchemy import text, bindparam
+from data_version import current_version
+
+SQL_CACHE_TABLE = "chat_sql_cache"
+SQL_CACHE_SIZE = int(os.getenv("CHAT_SQL_CACHE_SIZE", "1000"))
+
+_TRAILING_PUNCTUATION = " ?!.,;:…"
+
+_lock = threading.Lock()
+_entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()  # question_key -> {sql, generation_ms}
+_loaded_fingerprint = None
+_stats = {"hits": 0, "misses": 0, "saved_ms": 0.0}
+
+RESULT_CACHE_SIZE = int(os.getenv("CHAT_RESULT_CACHE_SIZE", "200"))
+RESULT_MAX_ROWS = int(os.getenv("CHAT_RESULT_MAX_ROWS", "1000"))
+
+# Quoted literals / identifiers, kept verbatim by normalize_sql
+_QUOTED = re.compile(r"""('(?:[^'\\]|\\.|'')*'|"(?:[^"\\]|\\.)*"|`[^`]*`)""")
+
+# Functions whose value changes between executions of the same SQL (matched outside quoted literals)
+_VOLATILE = re.compile(
+    r"\b(CURDATE|CURTIME|NOW|SYSDATE|CURRENT_DATE|CURRENT_TIME|CURRENT_TIMESTAMP|LOCALTIME|LOCALTIMESTAMP"
+    r"|UTC_DATE|UTC_TIME|UTC_TIMESTAMP|UNIX_TIMESTAMP|RAND|RANDOM|UUID|UUID_SHORT)\b",
+    re.IGNORECASE
+)
+
+_result_lock = threading.Lock()
+_results: "OrderedDict[str, List[Tuple]]" = OrderedDict()  # normalized sql -> rows
+_results_version = None
+_result_stats = {"hits": 0, "misses": 0, "too_large": 0, "volatile": 0}
+
+
+def normalize_question(question: str) -> str:
+    """
+    Cache form of a question: no diacritics, case-folded, single spaces
+    e.g. "  Doanh thu THÁNG 10 ?" -> "doanh thu thang 10"
+    """
+    decomposed = unicodedata.normalize("NFD", question or "")
+    stripped = "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+    stripped = stripped.replace("đ", "d").replace("Đ", "D")
+    collapsed = re.sub(r"\s+", " ", stripped.casefold())
+    return collapsed.strip(_TRAILING_PUNCTUATION)
+
+
+def question_key(question: str) -> str:
+    return hashlib.sha256(normalize_question(question).encode("utf-8")).hexdigest()
+
+
+def schema_fingerprint(*prompt_parts: str) -> str:
+    """Hash of the prompt text that shapes the generated SQL (schema + rules)"""
+    return hashlib.sha256("\x00".join(prompt_parts).encode("utf-8")).hexdigest()
+
+
+def _load(db: Session, fingerprint: str):
+    """Fill the in-memory LRU from the table once per fingerprint, dropping stale entries"""
+    global _loaded_fingerprint
+    if _loaded_fingerprint == fingerprint:
+        return
+    rows = []
+    try:
+        db.execute(text(f"DELETE FROM {SQL_CACHE_TABLE} WHERE schema_hash <> :fp"), {"fp": fingerprint})
+        db.commit()
+        rows = db.execute(text(f"""
+            SELECT question_key, sql_query, generation_ms
+            FROM {SQL_CACHE_TABLE}
+            WHERE schema_hash = :fp
+            ORDER BY last_used_at DESC
+            LIMIT :size
+        """), {"fp": fingerprint, "size": SQL_CACHE_SIZE}).fetchall()
+    except Exception as e:
+        db.rollback()
+        print(f"[Chat Cache] Could not load {SQL_CACHE_TABLE}: {e}")
+
+    with _lock:
+        _entries.clear()
+        for key, sql_query, generation_ms in reversed(rows):  # oldest first, most recent at the end
+            _entries[key] = {"sql": sql_query, "generation_ms": float(generation_ms or 0)}
+        _loaded_fingerprint = fingerprint
+
+
+def get_sql(db: Session, question: str, fingerprint: str) -> Optional[str]:
+    """
+    Cached SQL for a question (None on a miss)
+    A hit counts the generation time it saves and refreshes the entry's LRU position.
+    """
+    _load(db, fingerprint)
+    key = question_key(question)
+    with _lock:
+        entry = _entries.get(key)
+        if entry is None:
+            _stats["misses"] += 1
+            return None
+        _entries.move_to_end(key)
+        _stats["hits"] += 1
+        _stats["saved_ms"] += entry["generation_ms"]
+
+    try:
+        db.execute(text(f"""
+            UPDATE {SQL_CACHE_TABLE}
+            SET hits = hits + 1, last_used_at = :now
+            WHERE question_key = :key
+        """), {"key": key, "now": datetime.utcnow()})
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        print(f"[Chat Cache] Could not record hit: {e}")
+    return entry["sql"]
+
+
+def put_sql(db: Session, question: str, fingerprint: str, sql_query: str, generation_ms: float):
+    """Store generated SQL; evicts least recently used entries beyond SQL_CACHE_SIZE"""
+    key = question_key(question)
+    with _lock:
+        if _loaded_fingerprint != fingerprint:
+            return
+        _entries[key] = {"sql": sql_query, "generation_ms": float(generation_ms)}
+        _entries.move_to_end(key)
+        evicted = []
+        while len(_entries) > SQL_CACHE_SIZE:
+            evicted.append(_entries.popitem(last=False)[0])
+
+    now = datetime.utcnow()
+    try:
+        db.execute(text(f"DELETE FROM {SQL_CACHE_TABLE} WHERE question_key = :key"), {"key": key})
+        db.execute(text(f"""
+            INSERT INTO {SQL_CACHE_TABLE}
+                (question_key, question, schema_hash, sql_query, generation_ms, hits, created_at, last_used_at)
+            VALUES (:key, :question, :fp, :sql_query, :generation_ms, 0, :now, :now)
+        """), {"key": key, "question": normalize_question(question), "fp": fingerprint,
+               "sql_query": sql_query, "generation_ms": float(generation_ms), "now": now})
+        if evicted:
+            db.execute(text(f"DELETE FROM {SQL_CACHE_TABLE} WHERE question_key IN :keys")
+                       .bindparams(bindparam("keys", expanding=True)), {"keys": evicted})
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        print(f"[Chat Cache] Could not persist entry: {e}")
+        traceback.print_exc()
+
+
+def discard_sql(db: Session, question: str):
+    """Forget a cached question (its SQL failed to execute)"""
+    key = question_key(question)
+    with _lock:
+        _entries.pop(key, None)
+    try:
+        db.execute(text(f"DELETE FROM {SQL_CACHE_TABLE} WHERE question_key = :key"), {"key": key})
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        print(f"[Chat Cache] Could not discard entry: {e}")
+
+
+def get_cache_stats() -> Dict[str, Any]:
+    """Hit rate and model latency saved since the API process started"""
+    with _lock:
+        hits, misses = _stats["hits"], _stats["misses"]
+        lookups = hits + misses
+        return {
+            "entries": len(_entries),
+            "capacity": SQL_CACHE_SIZE,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / lookups * 100, 1) if lookups else 0,
+            "latency_saved_ms": round(_stats["saved_ms"], 1)
+        }
+
+
+# ---------- result cache ----------
+
+def normalize_sql(sql_query: str) -> str:
+    """Whitespace collapsed outside quoted literals, no trailing semicolon"""
+    parts = _QUOTED.split(sql_query.strip().rstrip(";").strip())
+    # split() with a capture group: even indexes are SQL text, odd ones quoted literals
+    return "".join(part if i % 2 else re.sub(r"\s+", " ", part) for i, part in enumerate(parts)).strip()
+
+
+def is_volatile(sql_query: str) -> bool:
+    """True when the SQL calls a date/time or random function (its result is never cached)"""
+    parts = _QUOTED.split(sql_query)
+    return any(_VOLATILE.search(part) for part in parts[::2])
+
+
+def get_result(sql_query: str) -> Optional[List[Tuple]]:
+    """Cached rows of a query at the current data version (None on a miss)"""
+    global _results_version
+    version = current_version()
+    key = normalize_sql(sql_query)
+    with _result_lock:
+        if _results_version != version:
+            _results.clear()
+            _results_version = version
+        rows = _results.get(key)
+        if rows is None:
+            _result_stats["misses"] += 1
+            return None
+        _results.move_to_end(key)
+        _result_stats["hits"] += 1
+        return rows
+
+
+def put_result(sql_query: str, rows: List[Any], version: int) -> List[Any]:
+    """
+    Cache rows read at data version `version` (skipped above RESULT_MAX_ROWS
+    and for volatile SQL)
+
+    Returns:
+        The rows to use (as tuples when cached)
+    """
+    if len(rows) > RESULT_MAX_ROWS:
+        with _result_lock:
+            _result_stats["too_large"] += 1
+        return rows
+    if is_volatile(sql_query):
+        with _result_lock:
+            _result_stats["volatile"] += 1
+        return rows
+    rows = [tuple(row) for row in rows]
+    key = normalize_sql(sql_query)
+    with _result_lock:
+        if _results_version == version == current_version():
+            _results[key] = rows
+            _results.move_to_end(key)
+            while len(_results) > RESULT_CACHE_SIZE:
+                _results.popitem(last=False)
+    return rows
+
+
+def get_result_stats() -> Dict[str, Any]:
+    """Result cache size and hit rate since the API process started"""
+    with _result_lock:
+        hits, misses = _result_stats["hits"], _result_stats["misses"]
+        lookups = hits + misses
+        return {
+            "entries": len(_results),
+            "capacity": RESULT_CACHE_SIZE,
+            "max_rows": RESULT_MAX_ROWS,
+            "data_version": _results_version,
+            "hits": hits,
+            "misses": misses,
+            "too_large": _result_stats["too_large"],
+            "volatile": _result_stats["volatile"],
+            "hit_rate": round(hits / lookups * 100, 1) if lookups else 0
+        }
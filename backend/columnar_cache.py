@@ -0,0 +1,270 @@
+"""
+In-Process Columnar Sales Cache (optional)
+Holds sales_data as numpy column arrays so the group-by-sum analytics (dashboard,
+product matrix, seasonality, channel performance) are answered with bincount kernels
+instead of MySQL round trips.
+
+- Categorical columns are dictionary-encoded as int32 codes (code 0 = NULL)
+- Measures are float64 arrays; NULL measures are stored as 0 (SUM ignores NULL)
+- Loaded once, then refreshed incrementally: when data_version moves, only the
+  (year, month) periods recorded by the sales write paths are reloaded
+
+Enable with COLUMNAR_CACHE=1 in the environment (.env). When disabled or when
+loading fails, get_cache() returns None and callers use the SQL path.
+"""
+import os
+import threading
+import time
+from typing import Dict, Any, List, Optional, Iterable, Tuple
+import numpy as np
+import pandas as pd
+from sqlalchemy.orm import Session
+from sqlalchemy import text, bindparam
+from data_version import current_version, changed_periods_since
+from query_builder import SEMESTER_MONTHS
+
+MONTH_NAMES = ["Jan", "Feb", "Mar", "Apr", "May", "Jun",
+               "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+
+DIMENSIONS = ("dist", "branch", "salesman_name", "description", "customer_name")
+MEASURES = ("net_value", "profit", "marketing_spend", "billing_qty")
+
+_LOAD_SQL = f"""
+    SELECT year, month_number, {", ".join(DIMENSIONS)}, {", ".join(MEASURES)}
+    FROM sales_data
+    WHERE {{where}}
+"""
+
+
+def enabled() -> bool:
+    return os.getenv("COLUMNAR_CACHE", "0").lower() in ("1", "true", "yes")
+
+
+class ColumnarSales:
+    """sales_data as dictionary-encoded column arrays"""
+
+    def __init__(self):
+        self.version = None
+        self.year = np.zeros(0, dtype=np.int32)
+        self.month = np.zeros(0, dtype=np.int32)  # 0 = NULL month_number
+        self.codes = {dim: np.zeros(0, dtype=np.int32) for dim in DIMENSIONS}
+        self.labels = {dim: [None] for dim in DIMENSIONS}
+        self._label_index = {dim: {None: 0} for dim in DIMENSIONS}
+        self.measures = {m: np.zeros(0) for m in MEASURES}
+
+    def __len__(self):
+        return len(self.year)
+
+    # ---------- loading ----------
+
+    def _encode(self, dim: str, values: pd.Series) -> np.ndarray:
+        """Map a column to global int32 codes, extending the dictionary with new labels"""
+        local_codes, uniques = pd.factorize(values, use_na_sentinel=True)
+        index = self._label_index[dim]
+        labels = self.labels[dim]
+        mapping = np.empty(len(uniques) + 1, dtype=np.int32)
+        mapping[-1] = 0  # sentinel -1 -> NULL code
+        for i, label in enumerate(uniques):
+            code = index.get(label)
+            if code is None:
+                code = index[label] = len(labels)
+                labels.append(label)
+            mapping[i] = code
+        return mapping[local_codes]
+
+    def _load_frame(self, db: Session, periods: Optional[Iterable[Tuple[int, int]]] = None) -> Dict[str, np.ndarray]:
+        if periods is None:
+            query, params = text(_LOAD_SQL.format(where="1=1")), {}
+        else:
+            # One IN list over the composite (year, month_number) index
+            keys = sorted({y * 100 + m for y, m in periods})
+            query = text(_LOAD_SQL.format(where="year * 100 + month_number IN :keys"
+                                          " AND year IN :years")).bindparams(
+                bindparam("keys", expanding=True), bindparam("years", expanding=True))
+            params = {"keys": keys, "years": sorted({k // 100 for k in keys})}
+
+        df = pd.DataFrame(db.execute(query, params).fetchall(),
+                          columns=["year", "month_number", *DIMENSIONS, *MEASURES])
+        frame = {
+            "year": pd.to_numeric(df["year"]).fillna(0).to_numpy(dtype=np.int32),
+            "month": pd.to_numeric(df["month_number"]).fillna(0).to_numpy(dtype=np.int32)
+        }
+        for dim in DIMENSIONS:
+            frame[dim] = self._encode(dim, df[dim])
+        for measure in MEASURES:
+            frame[measure] = pd.to_numeric(df[measure], errors="coerce").fillna(0).to_numpy(dtype=np.float64)
+        return frame
+
+    def _set(self, frame: Dict[str, np.ndarray]):
+        self.year, self.month = frame["year"], frame["month"]
+        self.codes = {dim: frame[dim] for dim in DIMENSIONS}
+        self.measures = {m: frame[m] for m in MEASURES}
+
+    def load(self, db: Session, version: int):
+        self._set(self._load_frame(db))
+        self.version = version
+
+    def refreshed(self, db: Session, periods, version: int) -> "ColumnarSales":
+        """
+        Copy of the cache with the given (year, month) periods reloaded from MySQL
+        Readers of the current object are unaffected; dictionaries are append-only and shared.
+        """
+        fresh = ColumnarSales()
+        fresh.labels, fresh._label_index = self.labels, self._label_index
+        current = {"year": self.year, "month": self.month, **self.codes, **self.measures}
+        if periods:
+            keep = ~np.isin(self.year * 100 + self.month, [y * 100 + m for y, m in periods])
+            reloaded = fresh._load_frame(db, periods)
+            current = {k: np.concatenate([v[keep], reloaded[k]]) for k, v in current.items()}
+        fresh._set(current)
+        fresh.version = version
+        return fresh
+
+    # ---------- kernels ----------
+
+    def _mask(self, year: int = None, semester: int = None, month: int = None) -> np.ndarray:
+        mask = np.ones(len(self), dtype=bool)
+        if year is not None:
+            mask &= self.year == year
+        if month is not None:
+            mask &= self.month == month
+        elif semester is not None:
+            month_from, month_to = SEMESTER_MONTHS[semester]
+            mask &= (self.month >= month_from) & (self.month <= month_to)
+        return mask
+
+    def group_sum(self, dim: str, measure: str, mask: np.ndarray) -> np.ndarray:
+        """SUM(measure) GROUP BY dim -> array indexed by code"""
+        return np.bincount(self.codes[dim][mask], weights=self.measures[measure][mask],
+                           minlength=len(self.labels[dim]))
+
+    def top(self, dim: str, mask: np.ndarray, limit: int = 10) -> List[Dict[str, Any]]:
+        """Top-N labels by revenue, NULL excluded (dashboard distributions)"""
+        sums = self.group_sum(dim, "net_value", mask)
+        present = np.bincount(self.codes[dim][mask], minlength=len(sums)) > 0
+        present[0] = False
+        order = [c for c in np.argsort(-sums, kind="stable") if present[c]][:limit]
+        return [{"name": self.labels[dim][c], "value": float(sums[c])} for c in order]
+
+    # ---------- analytics ----------
+
+    def dashboard_charts(self, year: int) -> Dict[str, Any]:
+        """KPI sums, monthly trend and top-10 distributions (same shape as year_services)"""
+        mask = self._mask(year)
+        prev = self._mask(year - 1)
+
+        months = self.month[mask]
+        revenue_by_month = np.bincount(months, weights=self.measures["net_value"][mask], minlength=13)
+        profit_by_month = np.bincount(months, weights=self.measures["profit"][mask], minlength=13)
+        present = np.bincount(months, minlength=13) > 0
+
+        return {
+            "revenue": float(self.measures["net_value"][mask].sum()),
+            "profit": float(self.measures["profit"][mask].sum()),
+            "marketing": float(self.measures["marketing_spend"][mask].sum()),
+            "prev_revenue": float(self.measures["net_value"][prev].sum()),
+            "prev_profit": float(self.measures["profit"][prev].sum()),
+            "monthly_trend": [
+                {"name": MONTH_NAMES[m - 1], "revenue": float(revenue_by_month[m]), "profit": float(profit_by_month[m])}
+                for m in range(1, 13) if present[m]
+            ],
+            "channel_distribution": self.top("dist", mask),
+            "branch_distribution": self.top("branch", mask),
+            "top_products": self.top("description", mask),
+            "top_salesmen": self.top("salesman_name", mask)
+        }
+
+    def product_matrix(self, year: int = None, semester: int = None, limit: int = 50) -> List[Dict[str, Any]]:
+        """Top products by revenue with margin and quantity (same shape as analytics_services)"""
+        mask = self._mask(year, semester)
+        revenue = self.group_sum("description", "net_value", mask)
+        quantity = self.group_sum("description", "billing_qty", mask)
+        profit = self.group_sum("description", "profit", mask)
+
+        products = []
+        for code in np.argsort(-revenue, kind="stable")[:limit]:
+            if revenue[code] <= 0:
+                break
+            margin = profit[code] / revenue[code] * 100
+            products.append({
+                'name': self.labels["description"][code],
+                'revenue': float(revenue[code]),
+                'margin': round(float(margin), 2),
+                'quantity': float(quantity[code]),
+                'profit': float(profit[code])
+            })
+        return products
+
+    def seasonality(self, year: int = None, semester: int = None) -> List[Dict[str, Any]]:
+        """Revenue by (year, month)"""
+        mask = self._mask(year, semester) & (self.month > 0) & (self.year > 0)
+        if not mask.any():
+            return []
+        years = self.year[mask]
+        first_year = int(years.min())
+        keys = (years - first_year) * 13 + self.month[mask]
+        revenue = np.bincount(keys, weights=self.measures["net_value"][mask])
+        present = np.bincount(keys) > 0
+        return [
+            {'year': first_year + int(k) // 13, 'month': int(k) % 13, 'revenue': float(revenue[k])}
+            for k in np.flatnonzero(present)
+        ]
+
+    def channel_rows(self, year: int = None, semester: int = None) -> List[Tuple[int, Any, float, float, int]]:
+        """(month, channel, revenue, profit, deals) rows for services._derive_channel_performance"""
+        mask = self._mask(year, semester) & (self.month > 0)
+        n_channels = len(self.labels["dist"])
+        keys = self.month[mask] * n_channels + self.codes["dist"][mask]
+        size = 13 * n_channels
+        revenue = np.bincount(keys, weights=self.measures["net_value"][mask], minlength=size)
+        profit = np.bincount(keys, weights=self.measures["profit"][mask], minlength=size)
+        deals = np.bincount(keys, minlength=size)
+        return [
+            (int(k) // n_channels, self.labels["dist"][int(k) % n_channels],
+             float(revenue[k]), float(profit[k]), int(deals[k]))
+            for k in np.flatnonzero(deals)
+        ]
+
+
+_lock = threading.Lock()
+_cache: Optional[ColumnarSales] = None
+
+
+def get_cache(db: Session) -> Optional[ColumnarSales]:
+    """
+    The columnar cache brought up to the current data version, or None when disabled
+
+    First call loads all of sales_data; later calls reload only the periods changed
+    since the cached version (full reload if the change log no longer covers it).
+    """
+    global _cache
+    if not enabled():
+        return None
+
+    version = current_version()
+    cache = _cache
+    if cache is not None and cache.version == version:
+        return cache
+
+    with _lock:
+        cache = _cache
+        if cache is not None and cache.version == version:
+            return cache
+        try:
+            start = time.perf_counter()
+            periods = changed_periods_since(cache.version) if cache is not None else None
+            if periods is None:
+                cache = ColumnarSales()
+                cache.load(db, version)
+                action = "loaded"
+            else:
+                cache = cache.refreshed(db, periods, version)
+                action = f"refreshed {len(periods)} periods"
+            _cache = cache
+            print(f"Columnar cache {action}: {len(cache):,} rows in {(time.perf_counter() - start) * 1000:.0f} ms")
+            return cache
+        except Exception as e:
+            print(f"Error loading columnar cache, falling back to SQL: {e}")
+            import traceback
+            traceback.print_exc()
+            return None
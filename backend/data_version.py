@@ -0,0 +1,87 @@
+"""
+Data Version Counter
+In-process counter bumped after every write that changes sales / AR data
+(imports, COGS / target uploads, rollbacks). Caches of derived results
+(forecast models, projections, ...) are keyed by it and recompute lazily
+on the first request after a change.
+
+Sales write paths also record which (year, month) periods of sales_data they
+touched, and debt write paths which AR report_dates, so caches that hold raw
+rows can reload only those periods / snapshots.
+
+Note: the counter lives in the API process (single uvicorn worker);
+scripts that write to the database directly must restart the API.
+"""
+import threading
+from typing import Iterable, Optional, Set, Tuple
+
+# Versions whose changed periods are remembered; older caches reload fully
+CHANGE_LOG_SIZE = 100
+
+_lock = threading.Lock()
+_version = 0
+_pending_periods: Set[Tuple[int, int]] = set()
+_pending_report_dates: Set[str] = set()
+_change_log = []  # [(version, frozenset of (year, month), frozenset of 'YYYY-MM-DD')]
+
+
+def current_version() -> int:
+    """Version of the data currently in the database"""
+    return _version
+
+
+def mark_changed_periods(periods: Iterable[Tuple[int, int]]):
+    """Record sales_data (year, month) periods written by the current import / rollback"""
+    with _lock:
+        _pending_periods.update((int(y), int(m)) for y, m in periods)
+
+
+def mark_changed_report_dates(report_dates: Iterable):
+    """Record ar_aging_report snapshot dates written by the current import / rollback"""
+    with _lock:
+        _pending_report_dates.update(str(d) for d in report_dates if d)
+
+
+def bump_version() -> int:
+    """Mark the data as changed; returns the new version"""
+    global _version
+    with _lock:
+        _version += 1
+        _change_log.append((_version, frozenset(_pending_periods), frozenset(_pending_report_dates)))
+        del _change_log[:-CHANGE_LOG_SIZE]
+        _pending_periods.clear()
+        _pending_report_dates.clear()
+        return _version
+
+
+def _changed_since(version: int, field: int) -> Optional[Set]:
+    with _lock:
+        if version == _version:
+            return set()
+        if not _change_log or _change_log[0][0] > version + 1:
+            return None
+        changed = set()
+        for entry in _change_log:
+            if entry[0] > version:
+                changed |= entry[field]
+        return changed
+
+
+def changed_periods_since(version: int) -> Optional[Set[Tuple[int, int]]]:
+    """
+    sales_data periods changed after `version`
+
+    Returns:
+        Set of (year, month), or None when the change log no longer reaches back that far
+    """
+    return _changed_since(version, 1)
+
+
+def changed_report_dates_since(version: int) -> Optional[Set[str]]:
+    """
+    AR snapshot dates ('YYYY-MM-DD') changed after `version`
+
+    Returns:
+        Set of dates, or None when the change log no longer reaches back that far
+    """
+    return _changed_since(version, 2)
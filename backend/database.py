@@ -16,7 +16,8 @@ Base = declarative_base()
 
 def init_db():
     # Import models here to ensure they are registered with Base.metadata
-    from models import SalesData, ChatHistory, ProductCost, SalesTarget
+    from models import SalesData, ChatHistory, ProductCost, SalesTarget, MonthlyTarget, ARAgingReport, ImportBatch, ImportBatchPreimage, SalesPerformance, ARSnapshotSummary, ARSnapshot
+    from models import DimSalesman, DimCustomer, DimProduct, DimBranch, DimChannel, CustomerKeyMap, CustomerTrailingRevenue, ChatSqlCache
     Base.metadata.create_all(bind=engine)
 
 def get_db():
@@ -0,0 +1,223 @@
+"""
+AR Aging Migration Services
+Compares two ar_aging_report snapshots customer by customer and reports how debt
+moved between aging buckets (roll rates), how much was collected and which
+customers are new, plus the customers whose debt changed the most.
+
+The matrix is computed per bucket amount, not per customer: each customer's earlier
+debt ("Not due" = total minus the aging buckets, then 1-30 ... >180) is matched to
+their later bucket amounts, so every cell is "how much of the earlier X debt is
+now Y". Debt only ages (moves to the same or an older bucket), matching prefers
+debt that aged by one bucket, then debt that stayed, then older jumps, and payments
+are taken from the oldest debt first. Earlier debt left unmatched was collected;
+later debt left unmatched is new. Rows therefore sum to the earlier bucket amounts
+and columns to the later ones.
+
+Both snapshots are read through the (report_date, customer_code) index and merged
+with one vectorized pandas join; the matching runs over bucket pairs on whole columns.
+"""
+from datetime import date
+from typing import Dict, Any, Optional, Union
+import numpy as np
+import pandas as pd
+from sqlalchemy.orm import Session
+from sqlalchemy import text
+from debt_services import get_latest_report_date, parse_report_date
+from debt_storage_services import snapshot_source
+
+BUCKET_COLUMNS = ["debt_1_30", "debt_31_60", "debt_61_90", "debt_91_120", "debt_121_180", "debt_over_180"]
+BUCKET_LABELS = ["Not due", "1-30 Days", "31-60 Days", "61-90 Days", "91-120 Days", "121-180 Days", ">180 Days"]
+FROM_STATES = BUCKET_LABELS + ["New"]
+TO_STATES = BUCKET_LABELS + ["Collected"]
+
+NEW_STATE = len(BUCKET_LABELS)
+COLLECTED_STATE = len(BUCKET_LABELS)
+SETTLED = -1
+# Residual amounts below this (float rounding) do not count a customer in a cell
+AMOUNT_EPSILON = 0.005
+
+
+def _load_snapshot(db: Session, report_date: date) -> pd.DataFrame:
+    """One row per customer_code (a customer can appear under several salesmen / channels)"""
+    source, params = snapshot_source(db, report_date)
+    rows = db.execute(text(f"""
+        SELECT customer_code, customer_name, total_debt, {", ".join(BUCKET_COLUMNS)}
+        FROM {source} r
+    """), params).fetchall()
+    df = pd.DataFrame(rows, columns=["customer_code", "customer_name", "total_debt", *BUCKET_COLUMNS])
+    if df.empty:
+        return df.set_index("customer_code")
+    amounts = ["total_debt", *BUCKET_COLUMNS]
+    df[amounts] = df[amounts].apply(pd.to_numeric, errors="coerce").fillna(0.0)
+    return df.groupby("customer_code").agg({"customer_name": "first", **{c: "sum" for c in amounts}})
+
+
+def bucket_states(total_debt: np.ndarray, buckets: np.ndarray) -> np.ndarray:
+    """
+    Oldest bucket holding debt per customer
+
+    Args:
+        total_debt: (n,) open amount
+        buckets: (n, 6) aging bucket amounts, youngest first
+
+    Returns:
+        (n,) state index into BUCKET_LABELS, or SETTLED when nothing is open
+    """
+    overdue = buckets > 0
+    oldest = buckets.shape[1] - np.argmax(overdue[:, ::-1], axis=1)  # 1..6
+    states = np.where(overdue.any(axis=1), oldest, 0)
+    return np.where(total_debt > 0, states, SETTLED)
+
+
+def state_amounts(total_debt: np.ndarray, buckets: np.ndarray) -> np.ndarray:
+    """
+    (n, 7) open amount per state: Not due (total minus the aging buckets), then the buckets
+    Negative amounts (credits) are ignored.
+    """
+    buckets = np.clip(buckets, 0, None)
+    not_due = np.clip(total_debt - buckets.sum(axis=1), 0, None)
+    return np.column_stack([not_due, buckets])
+
+
+def _match_pairs(n_states: int):
+    """
+    (from, to) state pairs in matching order: aged one bucket (oldest debt first),
+    stayed in the same bucket, then any older jump; a later state never feeds an earlier one
+    """
+    pairs = []
+    for to in range(n_states - 1, -1, -1):
+        if to > 0:
+            pairs.append((to - 1, to))
+        pairs.append((to, to))
+    for to in range(n_states):
+        pairs.extend((frm, to) for frm in range(to - 2, -1, -1))
+    return pairs
+
+
+def migration_flows(previous: np.ndarray, current: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Match each customer's earlier state amounts to their later ones
+
+    Args:
+        previous, current: (n, 7) state amounts (see state_amounts)
+
+    Returns:
+        Dict with amount (7, 7) total moved from -> to, customers (7, 7) customers
+        contributing to each cell, collected (n, 7) earlier debt left unmatched and
+        new (n, 7) later debt left unmatched
+    """
+    n_states = previous.shape[1]
+    remaining_prev = previous.astype(float).copy()
+    remaining_curr = current.astype(float).copy()
+    amount = np.zeros((n_states, n_states))
+    customers = np.zeros((n_states, n_states), dtype=int)
+    for frm, to in _match_pairs(n_states):
+        take = np.minimum(remaining_prev[:, frm], remaining_curr[:, to])
+        amount[frm, to] += take.sum()
+        customers[frm, to] += int((take > AMOUNT_EPSILON).sum())
+        remaining_prev[:, frm] -= take
+        remaining_curr[:, to] -= take
+    return {"amount": amount, "customers": customers, "collected": remaining_prev, "new": remaining_curr}
+
+
+def migration_matrix(previous: pd.DataFrame, current: pd.DataFrame, top: int = 20) -> Dict[str, Any]:
+    """
+    Bucket-to-bucket migration between two per-customer snapshots (see _load_snapshot)
+
+    Returns:
+        Dict with from_states, to_states, amount / customers matrices (a customer is
+        counted in every cell it contributes to), collected, new_debt and top_movers
+    """
+    merged = previous.join(current, how="outer", lsuffix="_prev", rsuffix="_curr")
+    amount_columns = [f"{c}_{side}" for side in ("prev", "curr") for c in ["total_debt", *BUCKET_COLUMNS]]
+    merged[amount_columns] = merged[amount_columns].fillna(0.0)
+
+    prev_total = merged["total_debt_prev"].to_numpy()
+    curr_total = merged["total_debt_curr"].to_numpy()
+    prev_buckets = merged[[f"{c}_prev" for c in BUCKET_COLUMNS]].to_numpy()
+    curr_buckets = merged[[f"{c}_curr" for c in BUCKET_COLUMNS]].to_numpy()
+    flows = migration_flows(state_amounts(prev_total, prev_buckets), state_amounts(curr_total, curr_buckets))
+
+    # Rows: earlier state (or New), columns: later state (or Collected)
+    n_states = len(BUCKET_LABELS)
+    amount = np.zeros((len(FROM_STATES), len(TO_STATES)))
+    customers = np.zeros((len(FROM_STATES), len(TO_STATES)), dtype=int)
+    amount[:n_states, :n_states] = flows["amount"]
+    customers[:n_states, :n_states] = flows["customers"]
+    amount[:n_states, COLLECTED_STATE] = flows["collected"].sum(axis=0)
+    customers[:n_states, COLLECTED_STATE] = (flows["collected"] > AMOUNT_EPSILON).sum(axis=0)
+    amount[NEW_STATE, :n_states] = flows["new"].sum(axis=0)
+    customers[NEW_STATE, :n_states] = (flows["new"] > AMOUNT_EPSILON).sum(axis=0)
+
+    # Top movers by absolute change in open debt (labelled with their oldest open bucket)
+    prev_state = bucket_states(prev_total, prev_buckets)
+    curr_state = bucket_states(curr_total, curr_buckets)
+    from_state = np.where(prev_state == SETTLED, NEW_STATE, prev_state)
+    to_state = np.where(curr_state == SETTLED, COLLECTED_STATE, curr_state)
+    change = curr_total - prev_total
+    order = np.argsort(-np.abs(change), kind="stable")[:top]
+    names = merged["customer_name_curr"].fillna(merged["customer_name_prev"]).to_numpy()
+    codes = merged.index.to_numpy()
+    top_movers = [
+        {
+            "customer_code": codes[i],
+            "customer_name": names[i],
+            "previous_debt": float(prev_total[i]),
+            "current_debt": float(curr_total[i]),
+            "change": float(change[i]),
+            "from": FROM_STATES[from_state[i]],
+            "to": TO_STATES[to_state[i]]
+        }
+        for i in order if change[i] != 0
+    ]
+
+    return {
+        "from_states": FROM_STATES,
+        "to_states": TO_STATES,
+        "amount": amount.round(2).tolist(),
+        "customers": customers.tolist(),
+        "collected": float(amount[:NEW_STATE, COLLECTED_STATE].sum()),
+        "new_debt": float(amount[NEW_STATE].sum()),
+        "new_customers": int(((prev_total <= 0) & (curr_total > 0)).sum()),
+        "top_movers": top_movers
+    }
+
+
+def _previous_date(db: Session, report_date: date) -> Optional[date]:
+    return db.execute(text("""
+        SELECT MAX(report_date) FROM ar_snapshot_summary WHERE report_date < :report_date
+    """), {"report_date": report_date}).scalar()
+
+
+def get_aging_migration(db: Session, date_from: Union[str, date] = None, date_to: Union[str, date] = None,
+                        top: int = 20) -> Dict[str, Any]:
+    """
+    Aging migration between two AR snapshots
+
+    Args:
+        date_from: Earlier snapshot (default: the snapshot before date_to)
+        date_to: Later snapshot (default: latest available)
+        top: Number of top movers
+
+    Raises:
+        ValueError: When a date is malformed, a snapshot is missing or date_from is not before date_to
+    """
+    date_from, date_to = parse_report_date(date_from), parse_report_date(date_to)
+    if not date_to:
+        date_to = get_latest_report_date(db)
+        if not date_to:
+            raise ValueError("No debt data available")
+    if not date_from:
+        date_from = parse_report_date(_previous_date(db, date_to))
+        if not date_from:
+            raise ValueError(f"No AR snapshot before {date_to} to compare with")
+    if date_from >= date_to:
+        raise ValueError("'from' snapshot must be earlier than 'to' snapshot")
+
+    previous = _load_snapshot(db, date_from)
+    current = _load_snapshot(db, date_to)
+    for report_date, snapshot in ((date_from, previous), (date_to, current)):
+        if snapshot.empty:
+            raise ValueError(f"No AR snapshot for {report_date}")
+
+    return {"from_date": date_from, "to_date": date_to, **migration_matrix(previous, current, top)}
@@ -4,11 +4,18 @@ Handles AR Aging Report import and analysis
 """
 
 from sqlalchemy.orm import Session
-from sqlalchemy import text, func
+from sqlalchemy import text
 import pandas as pd
-from typing import List, Dict, Any
-from datetime import datetime
-from models import ARAgingReport
+from typing import List, Dict, Any, Optional, Union
+from datetime import datetime, date
+import threading
+from models import ARAgingReport, ARSnapshotSummary
+from file_readers import read_table, to_numeric_column
+from batch_services import create_import_batch, finish_import_batch, save_snapshot_preimage
+from summary_services import refresh_ar_snapshot_summary, AR_SUMMARY_TABLE
+from debt_storage_services import detach_snapshot, store_snapshot, snapshot_source, ROW_COLUMNS
+from data_version import current_version
+from dimension_services import sync_customer_key_map
 
 # Channel mapping for Distribution Channel codes
 CHANNEL_MAP = {
@@ -17,23 +24,73 @@ CHANNEL_MAP = {
     '15': 'Project'
 }
 
-def import_debt_data(file_contents: bytes, db: Session, report_date: str) -> Dict[str, Any]:
+# Snapshot dates from this day on are placeholders (e.g. 9999-12-31 "open items" exports)
+PLACEHOLDER_DATE_FROM = date(2100, 1, 1)
+
+_latest_lock = threading.Lock()
+_latest_snapshot = {"version": None, "date": None}
+
+
+def parse_report_date(value: Union[str, date, None]) -> Optional[date]:
+    """
+    YYYY-MM-DD string (or date) -> date; None stays None
+
+    Raises:
+        ValueError: On a malformed date
+    """
+    if value is None or value == "":
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    try:
+        return date.fromisoformat(str(value).strip()[:10])
+    except ValueError:
+        raise ValueError(f"Invalid report_date '{value}', expected YYYY-MM-DD")
+
+
+def get_latest_report_date(db: Session) -> Optional[date]:
+    """
+    Latest real AR snapshot date (placeholder dates only when nothing else exists)
+    Cached per data version: debt imports / rollbacks bump the version, so the pointer
+    is re-read once after each import instead of on every overview / top-debtor call.
+    """
+    version = current_version()
+    with _latest_lock:
+        if _latest_snapshot["version"] == version:
+            return _latest_snapshot["date"]
+
+    # Index-only range scans on ar_snapshot_summary(report_date, ...)
+    latest = db.execute(text(f"""
+        SELECT MAX(report_date) FROM {AR_SUMMARY_TABLE} WHERE report_date < :placeholder
+    """), {"placeholder": PLACEHOLDER_DATE_FROM}).scalar()
+    if latest is None:
+        latest = db.execute(text(f"SELECT MAX(report_date) FROM {AR_SUMMARY_TABLE}")).scalar()
+
+    latest = parse_report_date(latest)
+    with _latest_lock:
+        _latest_snapshot.update(version=version, date=latest)
+    return latest
+
+
+def import_debt_data(source, db: Session, report_date: str, filename: str = None) -> Dict[str, Any]:
     """
-    Import AR Aging Report from ZRFI005.XLSX
+    Import AR Aging Report from ZRFI005 (Excel or CSV/TSV export)
     Implements idempotent delete-insert pattern
     
     Args:
-        file_contents: Excel file bytes
+        source: Path (or bytes) of the Excel or CSV/TSV upload
         db: Database session
         report_date: Report date in YYYY-MM-DD format
+        filename: Original file name (selects the parser)
     
     Returns:
         Dict with status and statistics
     """
     try:
-        # Fix FutureWarning: Wrap bytes in BytesIO
-        from io import BytesIO
-        df = pd.read_excel(BytesIO(file_contents), engine='openpyxl')
+        report_date = parse_report_date(report_date)
+        df = read_table(source, filename)
         
         print(f"Initial rows loaded: {len(df)}")
         
@@ -62,6 +119,8 @@ def import_debt_data(file_contents: bytes, db: Session, report_date: str) -> Dic
         ]
         # Only fill columns that exist in the dataframe
         existing_numeric_cols = [c for c in numeric_cols if c in df.columns]
+        for col in existing_numeric_cols:
+            df[col] = to_numeric_column(df[col])
         df[existing_numeric_cols] = df[existing_numeric_cols].fillna(0)
         
         # String columns -> ""
@@ -78,9 +137,16 @@ def import_debt_data(file_contents: bytes, db: Session, report_date: str) -> Dic
         print(f"Data cleaning complete: {len(df)} valid rows")
         # ===== END DATA CLEANING =====
         
+        # Lineage: every row of this snapshot is stamped with the batch id;
+        # a snapshot already stored for the date is kept as the batch's pre-image
+        batch_id = create_import_batch(db, "debt", filename)
+        save_snapshot_preimage(db, batch_id, report_date)
+        
         # Delete existing records for this report_date (Idempotency)
+        # Same transaction as the insert and the summary rows below;
+        # later delta snapshots that reconstruct through this date are materialized first
+        detach_snapshot(db, report_date)
         db.query(ARAgingReport).filter(ARAgingReport.report_date == report_date).delete()
-        db.commit()
         
         # Process each row and build list of records
         debt_records = []
@@ -119,7 +185,8 @@ def import_debt_data(file_contents: bytes, db: Session, report_date: str) -> Dic
                 debt_61_90=float(row.get('Target 61 - 90 Days', 0)),
                 debt_91_120=float(row.get('Target 91 - 120 Days', 0)),
                 debt_121_180=float(row.get('Target 121 - 180 Days', 0)),
-                debt_over_180=float(row.get('Target > 180 Days', 0))
+                debt_over_180=float(row.get('Target > 180 Days', 0)),
+                import_batch_id=batch_id
             )
             
             debt_records.append(record)
@@ -129,20 +196,29 @@ def import_debt_data(file_contents: bytes, db: Session, report_date: str) -> Dic
         debt_records = [r for r in debt_records if r.customer_code]
         print(f"\nPre-insert validation: {len(debt_records)} records to insert")
         
-        # Insert records individually and FLUSH to avoid SQLAlchemy sorting issues
-        for record in debt_records:
-            db.add(record)
-            db.flush() 
+        # Full snapshot, or only changed customers in delta storage mode (DEBT_STORAGE=delta)
+        snapshot = pd.DataFrame([{c: getattr(r, c) for c in ROW_COLUMNS} for r in debt_records], columns=ROW_COLUMNS)
+        storage = store_snapshot(db, report_date, snapshot, batch_id)
+        # customer_code -> customer key, for joins with sales_data (DSO)
+        sync_customer_key_map(db, snapshot)
+        
+        # Pre-aggregated snapshot rows for the overview / trend reads
+        refresh_ar_snapshot_summary(db, [report_date])
         
+        finish_import_batch(db, batch_id, storage["rows_stored"])
         db.commit()
         
-        print(f"Import successful: {len(debt_records)} records imported, {skipped_rows} rows skipped")
+        print(f"Import successful: {len(debt_records)} records imported "
+              f"({storage['storage']} snapshot, {storage['rows_stored']} rows stored), {skipped_rows} rows skipped")
         
         return {
             "status": "success",
             "records_imported": len(debt_records),
             "records_skipped": skipped_rows,
-            "report_date": report_date
+            "records_stored": storage["rows_stored"],
+            "storage": storage["storage"],
+            "report_date": report_date,
+            "batch_id": batch_id
         }
         
     except Exception as e:
@@ -155,16 +231,17 @@ def import_debt_data(file_contents: bytes, db: Session, report_date: str) -> Dic
 
 def get_debt_overview(db: Session, report_date: str = None) -> Dict[str, Any]:
     """
-    Get debt overview with KPIs and breakdowns
+    Get debt overview with KPIs and breakdowns (from ar_snapshot_summary)
     Smart date defaulting: If no date provided, use latest available
     
     Returns:
         Dict with report_date, KPIs, channel_breakdown, aging_breakdown
     """
     try:
-        # Smart Date Defaulting: Get latest report_date if not provided
+        # Smart Date Defaulting: Get latest report_date if not provided (cached pointer)
+        report_date = parse_report_date(report_date)
         if not report_date:
-            latest_date_result = db.query(func.max(ARAgingReport.report_date)).scalar()
+            latest_date_result = get_latest_report_date(db)
             if not latest_date_result:
                 return {
                     "status": "error",
@@ -173,8 +250,8 @@ def get_debt_overview(db: Session, report_date: str = None) -> Dict[str, Any]:
                 }
             report_date = latest_date_result
         
-        # Query data for the report_date
-        query = text("""
+        # Pre-aggregated (channel, salesman) rows of the snapshot, rolled up per channel
+        query = text(f"""
             SELECT 
                 channel,
                 SUM(total_debt) as total_debt,
@@ -185,7 +262,7 @@ def get_debt_overview(db: Session, report_date: str = None) -> Dict[str, Any]:
                 SUM(debt_91_120) as debt_91_120,
                 SUM(debt_121_180) as debt_121_180,
                 SUM(debt_over_180) as debt_over_180
-            FROM ar_aging_report
+            FROM {AR_SUMMARY_TABLE}
             WHERE report_date = :report_date
             GROUP BY channel
         """)
@@ -264,34 +341,48 @@ def get_debt_overview(db: Session, report_date: str = None) -> Dict[str, Any]:
         }
 
 
-def get_top_debtors(db: Session, report_date: str = None, limit: int = 10) -> List[Dict[str, Any]]:
+def get_top_debtors(db: Session, report_date: str = None, limit: int = 10,
+                    channel: str = None, salesman: str = None) -> List[Dict[str, Any]]:
     """
     Get top customers by outstanding debt
     Smart date defaulting: If no date provided, use latest available
+    Optional channel / salesman filters; each filter combination is served by a
+    (report_date, [channel | salesman_name,] total_debt) index read backwards, no filesort
     """
     try:
-        # Smart Date Defaulting
+        # Smart Date Defaulting (cached latest snapshot pointer)
+        report_date = parse_report_date(report_date)
         if not report_date:
-            latest_date_result = db.query(func.max(ARAgingReport.report_date)).scalar()
+            latest_date_result = get_latest_report_date(db)
             if not latest_date_result:
                 return []
             report_date = latest_date_result
         
-        # Query top debtors
-        query = text("""
+        source, params = snapshot_source(db, report_date)
+        clauses = ["report_date = :report_date"]
+        params["limit"] = limit
+        if channel:
+            clauses.append("channel = :channel")
+            params["channel"] = channel
+        if salesman:
+            clauses.append("salesman_name = :salesman")
+            params["salesman"] = salesman
+        
+        # Query top debtors (overdue_debt is a stored generated column)
+        query = text(f"""
             SELECT 
                 customer_name,
                 customer_code,
                 channel,
                 total_debt,
-                (debt_61_90 + debt_91_120 + debt_121_180 + debt_over_180) as overdue
-            FROM ar_aging_report
-            WHERE report_date = :report_date
+                overdue_debt as overdue
+            FROM {source} r
+            WHERE {" AND ".join(clauses)}
             ORDER BY total_debt DESC
             LIMIT :limit
         """)
         
-        result = db.execute(query, {"report_date": report_date, "limit": limit}).fetchall()
+        result = db.execute(query, params).fetchall()
         
         debtors = []
         for row in result:
@@ -300,7 +391,7 @@ def get_top_debtors(db: Session, report_date: str = None, limit: int = 10) -> Li
                 "customer_code": row[1],
                 "channel": row[2],
                 "total_debt": float(row[3]),
-                "overdue": float(row[4])
+                "overdue": float(row[4] or 0)
             })
         
         return debtors
@@ -311,21 +402,82 @@ def get_top_debtors(db: Session, report_date: str = None, limit: int = 10) -> Li
         traceback.print_exc()
         return []
 
-def get_available_dates(db: Session) -> List[str]:
+def get_debt_trend(db: Session, date_from: Union[str, date] = None, date_to: Union[str, date] = None,
+                   channel: str = None) -> List[Dict[str, Any]]:
+    """
+    AR KPIs for every snapshot date in a range (one query over ar_snapshot_summary)
+    Uses idx_ar_summary_date_channel, or idx_ar_summary_channel_date with a channel filter,
+    so the cost follows the number of snapshots returned, not the size of ar_aging_report.
+
+    Args:
+        date_from / date_to: Inclusive YYYY-MM-DD bounds; without date_to,
+                             placeholder future dates (e.g. 9999-12-31) are excluded
+        channel: Optional channel ('Industry', 'Retail', 'Project', 'Others')
+
+    Returns:
+        List of {report_date, total_outstanding, total_collected, bad_debt, collection_rate}
+        ordered by report_date
+
+    Raises:
+        ValueError: On a malformed date
+    """
+    date_from, date_to = parse_report_date(date_from), parse_report_date(date_to)
+    # DATE range predicates: a range scan on the summary indexes
+    clauses, params = [], {}
+    if date_from:
+        clauses.append("report_date >= :date_from")
+        params["date_from"] = date_from
+    if date_to:
+        clauses.append("report_date <= :date_to")
+        params["date_to"] = date_to
+    else:
+        clauses.append("report_date < :placeholder")
+        params["placeholder"] = PLACEHOLDER_DATE_FROM
+    if channel:
+        clauses.append("channel = :channel")
+        params["channel"] = channel
+
+    query = text(f"""
+        SELECT 
+            report_date,
+            SUM(total_debt) as total_debt,
+            SUM(total_realization) as total_realization,
+            SUM(debt_over_180) as bad_debt
+        FROM {AR_SUMMARY_TABLE}
+        WHERE {" AND ".join(clauses)}
+        GROUP BY report_date
+        ORDER BY report_date
+    """)
+
+    trend = []
+    for row in db.execute(query, params).fetchall():
+        total_debt = float(row[1] or 0)
+        total_realization = float(row[2] or 0)
+        trend.append({
+            "report_date": row[0],
+            "total_outstanding": total_debt,
+            "total_collected": total_realization,
+            "bad_debt": float(row[3] or 0),
+            "collection_rate": round(total_realization / total_debt * 100, 1) if total_debt > 0 else 0
+        })
+    return trend
+
+
+def get_available_dates(db: Session) -> List[date]:
     """
     Get distinct available report dates sorted by newest first.
-    Excludes future dates (e.g. 9999-12-31) unless that's the only data available.
+    Excludes placeholder dates (e.g. 9999-12-31) unless that's the only data available.
+    Read from ar_snapshot_summary (delta snapshots with no changed rows have no detail rows).
     """
     try:
-        # Primary: Filter out future dates (e.g. 9999-12-31)
-        # Using string comparison '2100-01-01' which is safe for standardized date strings
-        results = db.query(ARAgingReport.report_date).filter(ARAgingReport.report_date < '2100-01-01').distinct().order_by(ARAgingReport.report_date.desc()).all()
+        # Primary: DATE range below the placeholder dates
+        results = db.query(ARSnapshotSummary.report_date).filter(ARSnapshotSummary.report_date < PLACEHOLDER_DATE_FROM).distinct().order_by(ARSnapshotSummary.report_date.desc()).all()
         dates = [r[0] for r in results if r[0]]
         
         # Fallback: If filtered list is empty, return whatever is available (even if it's 9999)
         # This prevents the UI from showing empty dropdowns if only open-items exist
         if not dates:
-            fallback = db.query(ARAgingReport.report_date).distinct().order_by(ARAgingReport.report_date.desc()).all()
+            fallback = db.query(ARSnapshotSummary.report_date).distinct().order_by(ARSnapshotSummary.report_date.desc()).all()
             dates = [r[0] for r in fallback if r[0]]
             
         return dates
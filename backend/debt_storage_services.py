@@ -0,0 +1,257 @@
+"""
+AR Snapshot Storage (optional delta mode)
+By default every ZRFI005 import stores the full customer list for its report_date.
+With DEBT_STORAGE=delta, a full snapshot (checkpoint) is stored every
+DEBT_CHECKPOINT_INTERVAL snapshots and the dates in between store only:
+- the rows of customers whose lines changed (or are new) since the previous snapshot
+- one tombstone row (is_removed = 1) per customer that disappeared
+
+ar_snapshots records how each report_date is stored. snapshot_source() returns a
+derived table with the full snapshot for any date - a plain index range for full
+snapshots, "latest row per customer since the checkpoint" for delta ones - so the
+debt reads (overview summary, top debtors, migration matrix, export) work in both modes.
+
+A customer's lines are compared as a whole (order-independent row hash), so
+customers that appear under several salesmen / channels are stored consistently.
+"""
+import os
+from datetime import date
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from sqlalchemy.orm import Session
+from sqlalchemy import text
+from data_version import mark_changed_report_dates
+
+SNAPSHOT_TABLE = "ar_snapshots"
+
+# Stored (non-generated) columns of ar_aging_report, besides id / report_date / is_removed
+ROW_COLUMNS = [
+    "salesman_name", "customer_name", "customer_code", "channel",
+    "total_debt", "total_realization",
+    "debt_1_30", "debt_31_60", "debt_61_90", "debt_91_120", "debt_121_180", "debt_over_180",
+    "import_batch_id"
+]
+AMOUNT_COLUMNS = ROW_COLUMNS[4:12]
+# What makes a customer's snapshot "changed"
+VALUE_COLUMNS = ["salesman_name", "customer_name", "channel", *AMOUNT_COLUMNS]
+
+_SOURCE_COLUMNS = ", ".join(["id", *ROW_COLUMNS, "overdue_debt"])
+
+
+def delta_enabled() -> bool:
+    return os.getenv("DEBT_STORAGE", "full").lower() == "delta"
+
+
+def checkpoint_interval() -> int:
+    return max(1, int(os.getenv("DEBT_CHECKPOINT_INTERVAL", "7")))
+
+
+def _snapshot_info(db: Session, report_date: date):
+    return db.execute(text(f"""
+        SELECT report_date, storage, checkpoint_date, batch_id
+        FROM {SNAPSHOT_TABLE} WHERE report_date = :report_date
+    """), {"report_date": report_date}).fetchone()
+
+
+def snapshot_source(db: Session, report_date: date) -> Tuple[str, Dict[str, Any]]:
+    """
+    Derived table holding the full snapshot of report_date (ar_aging_report columns)
+    Use as: f"SELECT ... FROM {source} r WHERE ..." with the returned params.
+    Dates without an ar_snapshots row (imported before delta mode) are full snapshots.
+    """
+    info = _snapshot_info(db, report_date)
+    if info is None or info[1] != "delta":
+        # Simple derived table: MySQL merges it, so the report_date indexes still apply
+        return (f"(SELECT report_date, {_SOURCE_COLUMNS} FROM ar_aging_report "
+                f"WHERE report_date = :report_date AND is_removed = 0)"), {"report_date": report_date}
+
+    columns = ", ".join(f"a.{c}" for c in _SOURCE_COLUMNS.split(", "))
+    return f"""(
+        SELECT :report_date AS report_date, {columns}
+        FROM ar_aging_report a
+        JOIN (
+            SELECT customer_code, MAX(report_date) AS source_date
+            FROM ar_aging_report
+            WHERE report_date >= :checkpoint_date AND report_date <= :report_date
+            GROUP BY customer_code
+        ) latest ON latest.customer_code = a.customer_code AND latest.source_date = a.report_date
+        WHERE a.is_removed = 0
+    )""", {"report_date": report_date, "checkpoint_date": info[2]}
+
+
+def load_snapshot_frame(db: Session, report_date: date) -> pd.DataFrame:
+    """Full snapshot of report_date as a DataFrame of ROW_COLUMNS"""
+    source, params = snapshot_source(db, report_date)
+    rows = db.execute(text(f"SELECT {', '.join(ROW_COLUMNS)} FROM {source} r"), params).fetchall()
+    return pd.DataFrame(rows, columns=ROW_COLUMNS)
+
+
+# ---------- change detection ----------
+
+def _row_hashes(df: pd.DataFrame) -> np.ndarray:
+    """
+    uint64 hash of each line's values
+    Amounts are compared at float32 precision, the precision MySQL FLOAT columns keep.
+    """
+    values = df[VALUE_COLUMNS].copy()
+    values[AMOUNT_COLUMNS] = values[AMOUNT_COLUMNS].apply(pd.to_numeric, errors="coerce").fillna(0).astype(np.float32)
+    return pd.util.hash_pandas_object(values, index=False).to_numpy()
+
+
+def _customer_signatures(row_hash: np.ndarray, codes: np.ndarray, n_customers: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Order-independent hash of each customer's lines, and which customers are present"""
+    signature = np.zeros(n_customers, dtype=np.uint64)
+    np.add.at(signature, codes, row_hash)  # uint64 addition wraps: a valid multiset hash
+    present = np.bincount(codes, minlength=n_customers) > 0
+    return signature, present
+
+
+def diff_snapshot(previous: pd.DataFrame, current: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Rows to store for a delta snapshot
+
+    Returns:
+        (changed_rows, removed) - current rows of new / changed customers, and one
+        previous row per customer that no longer appears (tombstone source)
+    """
+    # One integer code per customer_code across both snapshots
+    codes, uniques = pd.factorize(np.concatenate([
+        previous["customer_code"].to_numpy(dtype=object), current["customer_code"].to_numpy(dtype=object)
+    ]))
+    prev_codes, curr_codes = codes[:len(previous)], codes[len(previous):]
+
+    prev_sig, prev_present = _customer_signatures(_row_hashes(previous), prev_codes, len(uniques))
+    curr_sig, curr_present = _customer_signatures(_row_hashes(current), curr_codes, len(uniques))
+
+    changed = curr_present & (~prev_present | (prev_sig != curr_sig))
+    removed = prev_present & ~curr_present
+
+    changed_rows = current[changed[curr_codes]]
+    removed_rows = previous[removed[prev_codes]].drop_duplicates("customer_code")
+    return changed_rows, removed_rows
+
+
+# ---------- write paths ----------
+
+def _previous_snapshot(db: Session, report_date: date) -> Optional[date]:
+    """Latest stored snapshot date before report_date (every import writes ar_snapshot_summary)"""
+    return db.execute(text("""
+        SELECT MAX(report_date) FROM ar_snapshot_summary WHERE report_date < :report_date
+    """), {"report_date": report_date}).scalar()
+
+
+def _insert_rows(db: Session, report_date: date, rows: List[Dict[str, Any]]):
+    if not rows:
+        return
+    columns = ["report_date", *ROW_COLUMNS, "is_removed"]
+    db.execute(text(f"""
+        INSERT INTO ar_aging_report ({", ".join(columns)})
+        VALUES ({", ".join(":" + c for c in columns)})
+    """), [{**row, "report_date": report_date} for row in rows])
+
+
+def _register(db: Session, report_date: date, storage: str, checkpoint_date: date,
+              batch_id: str, rows_total: int, rows_stored: int):
+    db.execute(text(f"DELETE FROM {SNAPSHOT_TABLE} WHERE report_date = :report_date"), {"report_date": report_date})
+    db.execute(text(f"""
+        INSERT INTO {SNAPSHOT_TABLE} (report_date, storage, checkpoint_date, batch_id, rows_total, rows_stored)
+        VALUES (:report_date, :storage, :checkpoint_date, :batch_id, :rows_total, :rows_stored)
+    """), {"report_date": report_date, "storage": storage, "checkpoint_date": checkpoint_date,
+           "batch_id": batch_id, "rows_total": rows_total, "rows_stored": rows_stored})
+
+
+def _materialize(db: Session, report_date: date, batch_id: str):
+    """Rewrite a delta snapshot as a full one (its rows keep the date's own batch id)"""
+    mark_changed_report_dates([report_date])
+    frame = load_snapshot_frame(db, report_date)
+    frame["import_batch_id"] = batch_id
+    db.execute(text("DELETE FROM ar_aging_report WHERE report_date = :report_date"), {"report_date": report_date})
+    _insert_rows(db, report_date, [{**row, "is_removed": 0} for row in frame.to_dict("records")])
+    db.execute(text(f"""
+        UPDATE {SNAPSHOT_TABLE}
+        SET storage = 'full', checkpoint_date = :report_date, rows_stored = :rows
+        WHERE report_date = :report_date
+    """), {"report_date": report_date, "rows": len(frame)})
+
+
+def detach_snapshot(db: Session, report_date: date):
+    """
+    Make later snapshots independent of report_date before it is replaced or removed
+    The next delta snapshot that reconstructs through report_date becomes a checkpoint,
+    and the rest of its chain restarts from there.
+    """
+    following = db.execute(text(f"""
+        SELECT report_date, storage, checkpoint_date, batch_id
+        FROM {SNAPSHOT_TABLE}
+        WHERE report_date > :report_date
+        ORDER BY report_date
+        LIMIT 1
+    """), {"report_date": report_date}).fetchone()
+
+    if following is not None and following[1] == "delta" and following[2] <= report_date:
+        _materialize(db, following[0], following[3])
+        db.execute(text(f"""
+            UPDATE {SNAPSHOT_TABLE}
+            SET checkpoint_date = :next_date
+            WHERE report_date > :next_date AND checkpoint_date <= :report_date
+        """), {"next_date": following[0], "report_date": report_date})
+
+    db.execute(text(f"DELETE FROM {SNAPSHOT_TABLE} WHERE report_date = :report_date"), {"report_date": report_date})
+
+
+def store_snapshot(db: Session, report_date: date, current: pd.DataFrame, batch_id: str) -> Dict[str, Any]:
+    """
+    Write a cleaned snapshot (ROW_COLUMNS frame) for report_date, full or delta
+    Call detach_snapshot() and delete the date's old rows first. Caller commits.
+
+    Returns:
+        Dict with storage ('full' / 'delta'), rows_total and rows_stored
+    """
+    storage, checkpoint_date = "full", report_date
+    rows = current
+
+    previous_date = _previous_snapshot(db, report_date) if delta_enabled() else None
+    if previous_date is not None:
+        info = _snapshot_info(db, previous_date)
+        chain_start = info[2] if info is not None else previous_date
+        chain_length = db.execute(text(f"""
+            SELECT COUNT(*) FROM {SNAPSHOT_TABLE}
+            WHERE checkpoint_date = :chain_start AND report_date <= :previous_date
+        """), {"chain_start": chain_start, "previous_date": previous_date}).scalar() or 1
+
+        if chain_length < checkpoint_interval():
+            changed, removed = diff_snapshot(load_snapshot_frame(db, previous_date), current)
+            tombstones = removed.assign(**{c: 0.0 for c in AMOUNT_COLUMNS}, import_batch_id=batch_id)
+            storage, checkpoint_date = "delta", chain_start
+            rows = pd.concat([changed.assign(is_removed=0), tombstones.assign(is_removed=1)], ignore_index=True)
+
+    if "is_removed" not in rows.columns:
+        rows = rows.assign(is_removed=0)
+    records = rows[[*ROW_COLUMNS, "is_removed"]].astype(object).where(rows[[*ROW_COLUMNS, "is_removed"]].notna(), None)
+    _insert_rows(db, report_date, records.to_dict("records"))
+    _register(db, report_date, storage, checkpoint_date, batch_id, len(current), len(rows))
+
+    return {"storage": storage, "rows_total": len(current), "rows_stored": len(rows)}
+
+
+def snapshot_preimage(db: Session, report_date: date) -> Tuple[pd.DataFrame, Optional[str]]:
+    """
+    Snapshot currently stored for report_date and the batch that owns it
+    Read before a re-import replaces the date, so a rollback can put it back.
+    """
+    info = _snapshot_info(db, report_date)
+    frame = load_snapshot_frame(db, report_date)
+    if info is not None:
+        return frame, info[3]
+    return frame, (frame["import_batch_id"].iloc[0] if len(frame) else None)
+
+
+def restore_snapshot(db: Session, report_date: date, frame: pd.DataFrame, batch_id: Optional[str]):
+    """
+    Write a snapshot captured by snapshot_preimage back as a full checkpoint
+    Call detach_snapshot() and delete the date's rows first. Caller commits.
+    """
+    records = frame[ROW_COLUMNS].astype(object).where(frame[ROW_COLUMNS].notna(), None)
+    _insert_rows(db, report_date, [{**row, "is_removed": 0} for row in records.to_dict("records")])
+    _register(db, report_date, "full", report_date, batch_id, len(frame), len(frame))
@@ -0,0 +1,159 @@
+"""
+Dimension Key Services
+sales_data carries integer surrogate keys for salesman, customer, product, branch
+and channel next to the original name columns. Imports resolve names to keys in
+bulk; aggregates group and join on the keys and join names back only for the rows
+they return. The name columns stay, so sales_data gets wider, not smaller: the gain
+is integer GROUP BY / JOIN and narrower indexes, not storage.
+
+Aggregates trust the keys, so main.py refuses to start while rows still have a name
+but no key (run migrate_dimensions.py), see missing_dimension_keys.
+
+Name matching is done by MySQL itself (temporary table join) so it follows the
+column collation exactly like the old string joins did.
+"""
+from typing import Dict, Iterable, Any, List
+import pandas as pd
+from sqlalchemy.orm import Session
+from sqlalchemy import text
+from migration_utils import column_exists
+
+# key column -> (dimension table, name column in sales_data)
+SALES_DIMENSIONS = {
+    "salesman_id": ("dim_salesman", "salesman_name"),
+    "customer_id": ("dim_customer", "customer_name"),
+    "product_id": ("dim_product", "description"),
+    "branch_id": ("dim_branch", "branch"),
+    "channel_id": ("dim_channel", "dist"),
+}
+
+# Other tables joined on a key: table -> (key column, name column)
+LINKED_KEYS = {
+    "product_cost": ("product_id", "description"),
+    "monthly_targets": ("salesman_id", "user_name"),
+}
+
+# Rows per executemany batch when staging names
+NAME_BATCH_SIZE = 5000
+
+
+def resolve_keys(db: Session, table: str, names: Iterable[Any]) -> Dict[str, int]:
+    """
+    Map names to dimension keys, creating missing dimension rows (caller's transaction)
+
+    Args:
+        table: Dimension table (e.g. 'dim_salesman')
+        names: Names to resolve; NULLs are ignored
+
+    Returns:
+        Dict name -> id for every non-null input name
+    """
+    names = sorted({str(n) for n in names if n is not None and not (isinstance(n, float) and pd.isna(n))})
+    if not names:
+        return {}
+
+    db.execute(text("DROP TEMPORARY TABLE IF EXISTS tmp_dim_names"))
+    db.execute(text("CREATE TEMPORARY TABLE tmp_dim_names (name VARCHAR(255) NOT NULL)"))
+    try:
+        rows = [{"name": n} for n in names]
+        for i in range(0, len(rows), NAME_BATCH_SIZE):
+            db.execute(text("INSERT INTO tmp_dim_names (name) VALUES (:name)"), rows[i:i + NAME_BATCH_SIZE])
+
+        db.execute(text(f"INSERT IGNORE INTO {table} (name) SELECT DISTINCT name FROM tmp_dim_names"))
+        result = db.execute(text(f"""
+            SELECT t.name, d.id
+            FROM tmp_dim_names t
+            JOIN {table} d ON d.name = t.name
+        """)).fetchall()
+        return {name: key for name, key in result}
+    finally:
+        db.execute(text("DROP TEMPORARY TABLE IF EXISTS tmp_dim_names"))
+
+
+def attach_dimension_keys(db: Session, records: pd.DataFrame) -> pd.DataFrame:
+    """
+    Add salesman_id, customer_id, product_id, branch_id and channel_id to a sales frame
+    One bulk resolution per dimension for the whole frame.
+    """
+    if len(records) == 0:
+        return records
+    for key_column, (table, name_column) in SALES_DIMENSIONS.items():
+        if name_column not in records.columns:
+            continue
+        names = records[name_column].where(records[name_column].notna(), None)
+        keys = resolve_keys(db, table, names.unique())
+        records[key_column] = names.map(lambda n: keys.get(str(n)) if n is not None else None).astype("Int64")
+    return records
+
+
+def sync_product_cost_keys(db: Session):
+    """Link product_cost rows to dim_product (after a COGS upload)"""
+    db.execute(text("""
+        INSERT IGNORE INTO dim_product (name)
+        SELECT DISTINCT description FROM product_cost WHERE product_id IS NULL
+    """))
+    db.execute(text("""
+        UPDATE product_cost pc
+        JOIN dim_product d ON d.name = pc.description
+        SET pc.product_id = d.id
+        WHERE pc.product_id IS NULL
+    """))
+
+
+def sync_target_keys(db: Session):
+    """Link monthly_targets rows to dim_salesman (after a target upload)"""
+    db.execute(text("""
+        INSERT IGNORE INTO dim_salesman (name)
+        SELECT DISTINCT user_name FROM monthly_targets WHERE salesman_id IS NULL
+    """))
+    db.execute(text("""
+        UPDATE monthly_targets mt
+        JOIN dim_salesman d ON d.name = mt.user_name
+        SET mt.salesman_id = d.id
+        WHERE mt.salesman_id IS NULL
+    """))
+
+
+def sync_customer_key_map(db: Session, snapshot: pd.DataFrame):
+    """
+    Map the AR snapshot's customer_code values to dim_customer keys (by customer name)
+    so AR rows join sales_data on an integer key instead of a name match.
+    """
+    if snapshot.empty:
+        return
+    pairs = snapshot[["customer_code", "customer_name"]].drop_duplicates("customer_code")
+    keys = resolve_keys(db, "dim_customer", pairs["customer_name"].unique())
+    rows = [
+        {"customer_code": code, "customer_id": keys[name]}
+        for code, name in zip(pairs["customer_code"], pairs["customer_name"])
+        if name in keys
+    ]
+    for i in range(0, len(rows), NAME_BATCH_SIZE):
+        db.execute(text("""
+            INSERT INTO customer_key_map (customer_code, customer_id)
+            VALUES (:customer_code, :customer_id)
+            ON DUPLICATE KEY UPDATE customer_id = VALUES(customer_id)
+        """), rows[i:i + NAME_BATCH_SIZE])
+
+
+def missing_dimension_keys(db: Session) -> List[str]:
+    """
+    Key columns that are absent or not backfilled (a row has the name but no key)
+    With any of these the key joins put every such row in one NULL group, e.g. one
+    salesman for the whole company and no COGS (profit = revenue).
+
+    Returns:
+        'table.column' entries; empty when migrate_dimensions.py has run
+    """
+    checks = [("sales_data", key, name) for key, (_, name) in SALES_DIMENSIONS.items()]
+    checks += [(table, key, name) for table, (key, name) in LINKED_KEYS.items()]
+    conn = db.connection()
+
+    missing = [f"{table}.{key}" for table, key, _ in checks if not column_exists(conn, table, key)]
+    if missing:
+        return missing
+    for table, key, name in checks:
+        unset = db.execute(text(f"SELECT 1 FROM {table} WHERE {key} IS NULL AND {name} IS NOT NULL LIMIT 1")).fetchone()
+        if unset is not None:
+            missing.append(f"{table}.{key}")
+    return missing
@@ -0,0 +1,129 @@
+"""
+DSO (Days Sales Outstanding) Services
+DSO = outstanding AR / trailing revenue * window days, per customer and per salesman.
+
+AR rows join sales revenue on integer keys only:
+ar_aging_report.customer_code -> customer_key_map (built at debt import)
+-> customer_trailing_revenue (rebuilt after sales imports), so one snapshot is a
+single indexed join instead of a name match across the sales history.
+
+The revenue window ends at the snapshot date (or at the last billing date when
+sales data stops earlier). customer_trailing_revenue covers the window ending at
+the last billing date; older snapshots sum their window from sales_data instead.
+"""
+from typing import Dict, Any, Tuple, Union
+from datetime import date, timedelta
+import numpy as np
+import pandas as pd
+from sqlalchemy.orm import Session
+from sqlalchemy import text
+from debt_services import get_latest_report_date, parse_report_date
+from debt_storage_services import snapshot_source
+from summary_services import TRAILING_REVENUE_TABLE, TRAILING_REVENUE_DAYS
+
+
+def _dso(outstanding: np.ndarray, revenue: np.ndarray) -> np.ndarray:
+    """NaN where there was no revenue in the window"""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(revenue > 0, outstanding / revenue * TRAILING_REVENUE_DAYS, np.nan)
+
+
+def _customers_revenue_total(df: pd.DataFrame) -> float:
+    """Trailing revenue of the snapshot's customers, each counted once"""
+    return float(df.drop_duplicates("customer_code")["revenue"].sum())
+
+
+def _records(df: pd.DataFrame):
+    return [
+        {k: (None if isinstance(v, float) and np.isnan(v) else v) for k, v in row.items()}
+        for row in df.to_dict("records")
+    ]
+
+
+def _revenue_source(db: Session, report_date: date) -> Tuple[str, Dict[str, Any], date]:
+    """
+    Trailing revenue per customer_id for the window ending at report_date
+
+    Returns:
+        (table or derived table with customer_id / revenue, its params, window end)
+    """
+    as_of = db.execute(text(f"SELECT MAX(as_of) FROM {TRAILING_REVENUE_TABLE}")).scalar()
+    as_of = date.fromisoformat(str(as_of)[:10]) if as_of else None
+    if as_of is not None and as_of <= report_date:
+        return TRAILING_REVENUE_TABLE, {}, as_of
+
+    # Range scan of idx_sales_billing_date (billing_date is a YYYY-MM-DD string)
+    return f"""(
+        SELECT customer_id, SUM(net_value) AS revenue
+        FROM sales_data
+        WHERE billing_date > :revenue_start AND billing_date <= :revenue_end AND customer_id IS NOT NULL
+        GROUP BY customer_id
+    )""", {"revenue_start": (report_date - timedelta(days=TRAILING_REVENUE_DAYS)).isoformat(),
+           "revenue_end": report_date.isoformat()}, report_date
+
+
+def get_dso(db: Session, report_date: Union[str, date] = None, limit: int = 100) -> Dict[str, Any]:
+    """
+    Customer and salesman DSO for one AR snapshot
+
+    Args:
+        report_date: Snapshot date (default: latest)
+        limit: Number of customers returned (largest outstanding first)
+
+    Returns:
+        Dict with report_date, window_end (last day of the revenue window), window_days,
+        overall_dso, customers and salesmen (dso is None when the customer had no revenue)
+
+    Raises:
+        ValueError: On a malformed date or when there is no AR data
+    """
+    report_date = parse_report_date(report_date) or get_latest_report_date(db)
+    if not report_date:
+        raise ValueError("No debt data available")
+
+    source, params = snapshot_source(db, report_date)
+    revenue, revenue_params, window_end = _revenue_source(db, report_date)
+    rows = db.execute(text(f"""
+        SELECT
+            ar.customer_code,
+            MAX(ar.customer_name) as customer_name,
+            ar.salesman_name,
+            SUM(ar.total_debt) as outstanding,
+            COALESCE(MAX(tr.revenue), 0) as revenue
+        FROM {source} ar
+        LEFT JOIN customer_key_map m ON m.customer_code = ar.customer_code
+        LEFT JOIN {revenue} tr ON tr.customer_id = m.customer_id
+        GROUP BY ar.customer_code, ar.salesman_name
+    """), {**params, **revenue_params}).fetchall()
+
+    df = pd.DataFrame(rows, columns=["customer_code", "customer_name", "salesman_name", "outstanding", "revenue"])
+    df[["outstanding", "revenue"]] = df[["outstanding", "revenue"]].astype(float)
+
+    # Customer level: a customer's revenue is counted once, its debt summed over salesmen
+    customers = df.groupby("customer_code", as_index=False).agg(
+        customer_name=("customer_name", "first"),
+        outstanding=("outstanding", "sum"),
+        revenue=("revenue", "max")
+    )
+    customers["dso"] = _dso(customers["outstanding"].to_numpy(), customers["revenue"].to_numpy()).round(1)
+    customers = customers.sort_values("outstanding", ascending=False).head(limit)
+
+    # Salesman level: the salesman's AR over the revenue of the customers in their book
+    salesmen = df.groupby("salesman_name", as_index=False, dropna=False).agg(
+        outstanding=("outstanding", "sum"),
+        revenue=("revenue", "sum"),
+        customers=("customer_code", "nunique")
+    )
+    salesmen["dso"] = _dso(salesmen["outstanding"].to_numpy(), salesmen["revenue"].to_numpy()).round(1)
+    salesmen = salesmen.sort_values("outstanding", ascending=False)
+
+    overall = _dso(np.array([df["outstanding"].sum()]), np.array([_customers_revenue_total(df)]))[0]
+
+    return {
+        "report_date": report_date,
+        "window_end": window_end,
+        "window_days": TRAILING_REVENUE_DAYS,
+        "overall_dso": None if np.isnan(overall) else round(float(overall), 1),
+        "customers": _records(customers),
+        "salesmen": _records(salesmen)
+    }
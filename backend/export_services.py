@@ -0,0 +1,159 @@
+"""
+Streaming Export Services
+Streams filtered sales_data / ar_aging_report slices as CSV, NDJSON or xlsx.
+
+Rows come from a server-side (unbuffered) cursor in partitions of EXPORT_PARTITION_ROWS
+and are encoded as the response is written, so memory does not grow with export size.
+CSV sends its header line before the query runs, so the first byte is immediate.
+xlsx uses openpyxl's write-only workbook spooled to a temp file: the zip container is
+only complete at the end, so the file is streamed once the last row is written.
+"""
+import csv
+import io
+import json
+import os
+import tempfile
+from typing import Iterator, List, Tuple, Dict, Any
+from database import engine
+from query_builder import build_filters, compile_sql
+from debt_storage_services import snapshot_source
+
+EXPORT_FORMATS = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+}
+EXPORT_PARTITION_ROWS = 2000
+XLSX_CHUNK_SIZE = 1024 * 1024
+
+# (column, header) in export order
+SALES_EXPORT_COLUMNS = [
+    ("billing_date", "Billing Date"),
+    ("billing_document", "Billing Document"),
+    ("billing_item", "Billing Item"),
+    ("customer_name", "Customer"),
+    ("salesman_name", "Salesman"),
+    ("dist", "Channel"),
+    ("branch", "Branch"),
+    ("product_group", "Product Group"),
+    ("material_code", "Material"),
+    ("description", "Product"),
+    ("billing_qty", "Billing Qty"),
+    ("net_value", "Net Value"),
+    ("profit", "Profit"),
+]
+
+DEBT_EXPORT_COLUMNS = [
+    ("report_date", "Report Date"),
+    ("customer_code", "Customer Code"),
+    ("customer_name", "Customer Name"),
+    ("salesman_name", "Salesman"),
+    ("channel", "Channel"),
+    ("total_debt", "Total Debt"),
+    ("total_realization", "Total Realization"),
+    ("debt_1_30", "1-30 Days"),
+    ("debt_31_60", "31-60 Days"),
+    ("debt_61_90", "61-90 Days"),
+    ("debt_91_120", "91-120 Days"),
+    ("debt_121_180", "121-180 Days"),
+    ("debt_over_180", "> 180 Days"),
+]
+
+
+def sales_export_query(year: int = None, semester: int = None, month: int = None, **equals):
+    """
+    Sargable sales_data export query for the analytics filters
+    No ORDER BY: rows stream in index order (year, month) without a filesort
+    """
+    where, params = build_filters(year=year, semester=semester, month=month, **equals)
+    columns = ", ".join(c for c, _ in SALES_EXPORT_COLUMNS)
+    return compile_sql(f"SELECT {columns} FROM sales_data WHERE {where}"), params
+
+
+def debt_export_query(db, report_date: str, channel: str = None, salesman: str = None):
+    """ar_aging_report export query for one snapshot (full or delta-stored)"""
+    source, params = snapshot_source(db, report_date)
+    clauses = ["report_date = :report_date"]
+    if channel:
+        clauses.append("channel = :channel")
+        params["channel"] = channel
+    if salesman:
+        clauses.append("salesman_name = :salesman")
+        params["salesman"] = salesman
+    columns = ", ".join(c for c, _ in DEBT_EXPORT_COLUMNS)
+    return compile_sql(f"SELECT {columns} FROM {source} r WHERE {' AND '.join(clauses)}"), params
+
+
+def _stream_partitions(query, params) -> Iterator[list]:
+    """Yield row partitions from an unbuffered server-side cursor on a dedicated connection"""
+    with engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=EXPORT_PARTITION_ROWS).execute(query, params)
+        for partition in result.partitions():
+            yield partition
+
+
+def _stream_csv(query, params, headers: List[str]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # BOM so Excel opens the UTF-8 (Vietnamese) text correctly
+    writer.writerow(headers)
+    yield ("\ufeff" + buffer.getvalue()).encode("utf-8")
+
+    for partition in _stream_partitions(query, params):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(partition)
+        yield buffer.getvalue().encode("utf-8")
+
+
+def _stream_ndjson(query, params, columns: List[str]) -> Iterator[bytes]:
+    for partition in _stream_partitions(query, params):
+        yield "".join(
+            json.dumps(dict(zip(columns, row)), ensure_ascii=False, default=str) + "\n"
+            for row in partition
+        ).encode("utf-8")
+
+
+def _stream_xlsx(query, params, headers: List[str], sheet_title: str) -> Iterator[bytes]:
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title=sheet_title)
+    sheet.append(headers)
+    for partition in _stream_partitions(query, params):
+        for row in partition:
+            sheet.append(list(row))
+
+    fd, path = tempfile.mkstemp(suffix=".xlsx")
+    os.close(fd)
+    try:
+        workbook.save(path)
+        with open(path, "rb") as f:
+            while chunk := f.read(XLSX_CHUNK_SIZE):
+                yield chunk
+    finally:
+        os.remove(path)
+
+
+def stream_export(query, params, columns: List[Tuple[str, str]], fmt: str,
+                  sheet_title: str = "Export") -> Iterator[bytes]:
+    """
+    Encode query rows in the requested format as a byte stream
+
+    Args:
+        columns: (column, header) pairs matching the query's SELECT list
+        fmt: 'csv', 'ndjson' or 'xlsx'
+    """
+    if fmt == "csv":
+        return _stream_csv(query, params, [h for _, h in columns])
+    if fmt == "ndjson":
+        return _stream_ndjson(query, params, [c for c, _ in columns])
+    if fmt == "xlsx":
+        return _stream_xlsx(query, params, [h for _, h in columns], sheet_title)
+    raise ValueError(f"Unsupported export format: {fmt}")
+
+
+def export_filename(prefix: str, fmt: str, parts: Dict[str, Any]) -> str:
+    """e.g. sales_2025_S1_Retail.csv"""
+    suffix = "_".join(str(v) for v in parts.values() if v is not None)
+    return f"{prefix}_{suffix}.{fmt}" if suffix else f"{prefix}.{fmt}"
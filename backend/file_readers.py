@@ -0,0 +1,213 @@
+"""
+Tabular File Readers
+Reads SAP exports (ZRSD002, ZRFI005, COGS, targets) as Excel or delimited text
+Delimited text goes through pyarrow's multithreaded columnar CSV reader when available
+Uploads are spooled to a temporary file so parsers read from disk instead of in-memory copies
+"""
+import csv
+import io
+import os
+import tempfile
+from contextlib import asynccontextmanager
+import pandas as pd
+
+EXCEL_EXTENSIONS = ('.xlsx', '.xls')
+DELIMITED_EXTENSIONS = ('.csv', '.tsv', '.txt')
+SUPPORTED_EXTENSIONS = EXCEL_EXTENSIONS + DELIMITED_EXTENSIONS
+
+# Upload copy buffer: only this much of an upload is held in memory at a time
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    CSV_ENGINE = 'pyarrow'
+except ImportError:
+    print("--- [WARNING] pyarrow not installed: falling back to single-threaded CSV parser ---")
+    CSV_ENGINE = 'c'
+
+
+def is_supported(filename: str) -> bool:
+    """True if the upload has an extension we can parse"""
+    return bool(filename) and filename.lower().endswith(SUPPORTED_EXTENSIONS)
+
+
+def is_delimited(filename: str) -> bool:
+    """True for CSV/TSV/TXT exports"""
+    return bool(filename) and filename.lower().endswith(DELIMITED_EXTENSIONS)
+
+
+@asynccontextmanager
+async def spooled_upload(upload, chunk_size: int = UPLOAD_CHUNK_SIZE):
+    """
+    Stream a FastAPI UploadFile to a temporary file and yield its path
+    Memory per upload stays at one chunk regardless of file size; the file is removed afterwards
+
+    Usage:
+        async with spooled_upload(file) as path:
+            import_services.import_sales_data(path, db, file.filename)
+    """
+    suffix = os.path.splitext(upload.filename or '')[1]
+    fd, path = tempfile.mkstemp(prefix='upload_', suffix=suffix)
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            while True:
+                chunk = await upload.read(chunk_size)
+                if not chunk:
+                    break
+                out.write(chunk)
+        yield path
+    finally:
+        await upload.close()
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def _as_source(source):
+    """Accept raw bytes, a file path or a binary file object"""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return io.BytesIO(source)
+    return source
+
+
+def _peek_first_line(source) -> str:
+    """Read the header line without consuming the source"""
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as f:
+            head = f.readline()
+    else:
+        pos = source.tell()
+        head = source.readline()
+        source.seek(pos)
+    return head.decode('utf-8', errors='ignore')
+
+
+def detect_delimiter(header_line: str, filename: str = None) -> str:
+    """
+    Pick the delimiter for a SAP text export
+    .tsv is always tab; otherwise the most frequent of tab / semicolon / comma in the header wins
+    """
+    if filename and filename.lower().endswith('.tsv'):
+        return '\t'
+    counts = {d: header_line.count(d) for d in ('\t', ';', ',')}
+    best = max(counts, key=counts.get)
+    return best if counts[best] > 0 else ','
+
+
+def read_delimited(source, filename: str = None) -> pd.DataFrame:
+    """
+    Read a CSV/TSV export with the multithreaded pyarrow engine (C engine fallback)
+    File paths are memory-mapped by the C engine; pyarrow reads them in blocks itself
+    Every column is read as text, so codes keep their leading zeros (Material 000123)
+    as in Excel; callers convert amounts with to_numeric_column
+    """
+    source = _as_source(source)
+    header_line = _peek_first_line(source)
+    sep = detect_delimiter(header_line, filename)
+    if CSV_ENGINE == 'pyarrow':
+        # pandas' pyarrow engine infers types before applying dtype, so declare them up front
+        names = next(csv.reader([header_line.lstrip('\ufeff').rstrip('\r\n')], delimiter=sep), [])
+        table = pa_csv.read_csv(
+            source,
+            parse_options=pa_csv.ParseOptions(delimiter=sep),
+            convert_options=pa_csv.ConvertOptions(column_types={n: pa.string() for n in names},
+                                                  strings_can_be_null=True)
+        )
+        df = table.to_pandas()
+    else:
+        options = {'memory_map': True} if isinstance(source, (str, os.PathLike)) else {}
+        df = pd.read_csv(source, sep=sep, engine='c', dtype=str, **options)
+    df.columns = [str(c).strip() for c in df.columns]
+    return df
+
+
+def read_table(source, filename: str = None, sheet_name=0) -> pd.DataFrame:
+    """
+    Read an uploaded file into a DataFrame
+    Dispatches on the file extension: .csv/.tsv/.txt -> read_delimited, anything else -> Excel (openpyxl)
+    Both read every column as text (pandas would turn a '000123' cell into 123), so a
+    SAP line gets the same codes from either format; convert amounts with to_numeric_column
+
+    Args:
+        source: File bytes, path or binary file object
+        filename: Original upload name (used for format detection)
+        sheet_name: Excel sheet to read (ignored for delimited files)
+    """
+    if is_delimited(filename):
+        return read_delimited(source, filename)
+    return pd.read_excel(_as_source(source), engine='openpyxl', sheet_name=sheet_name, dtype=str)
+
+
+def read_table_any(source, filename: str = None) -> pd.DataFrame:
+    """
+    read_table for uploads whose extension may be wrong (target sheets saved as .csv / .xlsx)
+    Tries CSV first, then Excel - Excel first when the name says .xlsx/.xls
+    """
+    readers = [lambda: read_delimited(source, filename), lambda: read_table(source)]
+    if filename and not is_delimited(filename):
+        readers.reverse()
+    try:
+        return readers[0]()
+    except Exception:
+        if hasattr(source, 'seek'):
+            source.seek(0)
+        return readers[1]()
+
+
+def detect_decimal_separator(values: pd.Series) -> str:
+    """
+    Decimal separator of a text amount column: ',' for SAP European exports
+    (1.234,56 / 12,5 / 1.234.567), '.' otherwise (1,234.56 / 12.5 / 1,234,567)
+    Values like 1.234 or 1,234 are ambiguous and do not vote; ties keep '.'
+    """
+    text = values.dropna().astype(str).str.replace(r'[^\d.,]', '', regex=True)
+    n_dot, n_comma = text.str.count(r'\.'), text.str.count(',')
+    last_dot, last_comma = text.str.rfind('.'), text.str.rfind(',')
+    digits_after = text.str.len() - 1 - pd.concat([last_dot, last_comma], axis=1).max(axis=1)
+    both = (n_dot > 0) & (n_comma > 0)
+
+    comma_decimal = (
+        (both & (last_comma > last_dot))
+        | ((n_dot == 0) & (n_comma == 1) & (digits_after != 3))
+        | ((n_comma == 0) & (n_dot > 1))
+    )
+    dot_decimal = (
+        (both & (last_dot > last_comma))
+        | ((n_comma == 0) & (n_dot == 1) & (digits_after != 3))
+        | ((n_dot == 0) & (n_comma > 1))
+    )
+    return ',' if comma_decimal.sum() > dot_decimal.sum() else '.'
+
+
+def to_numeric_column(values: pd.Series) -> pd.Series:
+    """
+    Coerce an amount column to numbers from Excel or text exports
+    Strips currency text, drops the thousands separator of the column's decimal
+    convention (see detect_decimal_separator) and accepts SAP trailing minus (1.234,56-)
+    """
+    if pd.api.types.is_numeric_dtype(values):
+        return values
+    text = values.astype(str).str.strip()
+    text = text.str.replace(r'^(.*\d)\s*-$', r'-\1', regex=True)
+    text = text.str.replace(r'[^\d.,-]', '', regex=True)
+    if detect_decimal_separator(values) == ',':
+        text = text.str.replace('.', '', regex=False).str.replace(',', '.', regex=False)
+    else:
+        text = text.str.replace(',', '', regex=False)
+    return pd.to_numeric(text, errors='coerce')
+
+
+def parse_sap_dates(values: pd.Series) -> pd.Series:
+    """
+    Parse a date column from Excel or text exports
+    SAP text exports use DD.MM.YYYY, which pandas would otherwise read month-first;
+    blank cells do not count against the format and become NaT
+    """
+    if not pd.api.types.is_datetime64_any_dtype(values):
+        as_text = values.astype('string').str.strip()
+        present = as_text[as_text.notna() & (as_text != '')]
+        if len(present) > 0 and present.str.match(r'^\d{2}\.\d{2}\.\d{4}$').all():
+            return pd.to_datetime(as_text, format='%d.%m.%Y', errors='coerce')
+    return pd.to_datetime(values, errors='coerce')
@@ -0,0 +1,398 @@
+"""
+Forecasting Engine
+Fits one linear model per series (total, salesman, channel, product) in a single
+batched least-squares solve:
+
+    revenue[t] = intercept + trend * t + month-of-year effect
+
+Each series is fitted on its own active span (first to last month with sales), so a
+salesman hired last year is not fitted on the zero months before he started. Series with
+the same span share one design matrix X and are solved at once with
+np.linalg.lstsq(X, Y.T). The current calendar month is still being billed, so it is
+shown as a partial actual but never fitted.
+Prediction intervals use each series' residual variance and the leverage of the future
+rows under its span's design (normal approximation, 95%).
+
+Fitted models are cached per dimension and invalidated by data_version.
+"""
+import threading
+import time
+from datetime import date
+from typing import Dict, Any, List, Optional
+import numpy as np
+import pandas as pd
+from sqlalchemy.orm import Session
+from sqlalchemy import text
+from data_version import current_version
+
+MONTH_NAMES = ["Jan", "Feb", "Mar", "Apr", "May", "Jun",
+               "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+
+# Month-of-year dummies need two full cycles; shorter histories fit trend only
+SEASONAL_MIN_MONTHS = 24
+MIN_HISTORY_MONTHS = 3
+INTERVAL_Z = 1.959964  # 95% two-sided
+MAX_HORIZON = 24
+
+# Monthly (series_key, year, month_number, revenue, profit) per dimension
+SERIES_QUERIES = {
+    "total": """
+        SELECT 'Total' as series_key, year, month_number, SUM(net_value), SUM(profit)
+        FROM sales_data
+        WHERE year IS NOT NULL AND month_number IS NOT NULL
+        GROUP BY year, month_number
+    """,
+    "salesman": """
+        SELECT salesman_name, year, month_number, SUM(net_value), SUM(profit)
+        FROM sales_data
+        WHERE salesman_name IS NOT NULL AND year IS NOT NULL AND month_number IS NOT NULL
+        GROUP BY salesman_name, year, month_number
+    """,
+    "channel": """
+        SELECT dist, year, month_number, SUM(net_value), SUM(profit)
+        FROM sales_data
+        WHERE dist IS NOT NULL AND year IS NOT NULL AND month_number IS NOT NULL
+        GROUP BY dist, year, month_number
+    """,
+    "product": """
+        SELECT description, year, month_number, SUM(net_value), SUM(profit)
+        FROM sales_data
+        WHERE description IS NOT NULL AND year IS NOT NULL AND month_number IS NOT NULL
+        GROUP BY description, year, month_number
+    """
+}
+
+METRICS = ("revenue", "profit")
+
+_cache_lock = threading.Lock()
+_model_cache: Dict[str, Dict[str, Any]] = {}
+_cache_version = None
+
+
+def _period_index(year, month):
+    """Months since year 0 (so period % 12 is the month-of-year, 0 = Jan)"""
+    return np.asarray(year, dtype=np.int64) * 12 + np.asarray(month, dtype=np.int64) - 1
+
+
+def _current_period() -> int:
+    """Period of the current calendar month (its sales are still coming in)"""
+    today = date.today()
+    return int(_period_index(today.year, today.month))
+
+
+def _period_label(period: int) -> Dict[str, Any]:
+    year, month_idx = divmod(int(period), 12)
+    return {"year": year, "month": month_idx + 1, "name": MONTH_NAMES[month_idx]}
+
+
+def design_matrix(periods: np.ndarray, origin: int, seasonal: bool) -> np.ndarray:
+    """
+    Rows = periods, columns = [intercept, trend, Feb..Dec dummies (if seasonal)]
+    """
+    periods = np.asarray(periods, dtype=np.int64)
+    columns = [np.ones(len(periods)), (periods - origin).astype(np.float64)]
+    if seasonal:
+        month_of_year = periods % 12
+        columns.extend((month_of_year == m).astype(np.float64) for m in range(1, 12))
+    return np.column_stack(columns)
+
+
+def fit_batch(Y: np.ndarray, first_period: int) -> Dict[str, Any]:
+    """
+    Fit every row of Y (n_series x n_months, contiguous months from first_period)
+    with one least-squares solve
+
+    Returns:
+        Model dict (coefficients, residual variance, (X'X)^-1, ...) for predict_batch
+    """
+    n_series, n_months = Y.shape
+    seasonal = n_months >= SEASONAL_MIN_MONTHS
+    X = design_matrix(np.arange(first_period, first_period + n_months), first_period, seasonal)
+
+    # One solve for all series: X (T x p) @ B (p x n) ~= Y.T
+    B, _, rank, _ = np.linalg.lstsq(X, Y.T, rcond=None)
+    residuals = Y - (X @ B).T
+    dof = max(n_months - rank, 1)
+    sigma2 = np.einsum('ij,ij->i', residuals, residuals) / dof
+
+    return {
+        "coef": B,
+        "sigma2": sigma2,
+        "xtx_inv": np.linalg.pinv(X.T @ X),
+        "first_period": first_period,
+        "last_period": first_period + n_months - 1,
+        "seasonal": seasonal
+    }
+
+
+def predict_batch(model: Dict[str, Any], horizon: int, start: int = None):
+    """
+    Forecast `horizon` months for every series of a fitted batch, from `start`
+    (default: the month after the batch's last fitted month)
+
+    Returns:
+        (periods, forecast, lower, upper) - arrays of shape (horizon,) and (n_series, horizon)
+    """
+    if start is None:
+        start = model["last_period"] + 1
+    periods = np.arange(start, start + horizon)
+    X_future = design_matrix(periods, model["first_period"], model["seasonal"])
+
+    forecast = (X_future @ model["coef"]).T
+    leverage = np.einsum('ij,jk,ik->i', X_future, model["xtx_inv"], X_future)
+    std_err = np.sqrt(model["sigma2"][:, None] * (1.0 + leverage[None, :]))
+
+    lower = forecast - INTERVAL_Z * std_err
+    upper = forecast + INTERVAL_Z * std_err
+    return periods, forecast, lower, upper
+
+
+def _load_panel(db: Session, dimension: str):
+    """
+    Load a dimension as dense (n_series x n_months) revenue / profit matrices
+    Months without sales are zeros; the timeline spans the first to last month with data.
+    `complete_months` counts the leading columns before the current (partial) month.
+    """
+    rows = db.execute(text(SERIES_QUERIES[dimension])).fetchall()
+    if not rows:
+        return None
+
+    df = pd.DataFrame(rows, columns=["series_key", "year", "month_number", "revenue", "profit"])
+    df = df.dropna(subset=["year", "month_number"])
+    if df.empty:
+        return None
+
+    periods = _period_index(df["year"].to_numpy(), df["month_number"].to_numpy())
+    first_period = int(periods.min())
+    n_months = int(periods.max()) - first_period + 1
+    codes, keys = pd.factorize(df["series_key"])
+
+    panel = {"keys": list(keys), "first_period": first_period,
+             "complete_months": max(0, min(n_months, _current_period() - first_period))}
+    for metric in METRICS:
+        matrix = np.zeros((len(keys), n_months))
+        np.add.at(matrix, (codes, periods - first_period),
+                  pd.to_numeric(df[metric], errors="coerce").fillna(0).to_numpy(dtype=np.float64))
+        panel[metric] = matrix
+    return panel
+
+
+def _active_spans(panel) -> np.ndarray:
+    """
+    (n_series x 2) first / last complete month with sales per series, as column offsets
+    Series without sales in the complete months get (-1, -1).
+    """
+    n = panel["complete_months"]
+    active = (panel["revenue"][:, :n] != 0) | (panel["profit"][:, :n] != 0)
+    has_sales = active.any(axis=1)
+    first = np.where(has_sales, active.argmax(axis=1), -1)
+    last = np.where(has_sales, n - 1 - active[:, ::-1].argmax(axis=1), -1)
+    return np.column_stack([first, last])
+
+
+def fit_spans(Y: np.ndarray, first_period: int, spans: np.ndarray) -> List[Dict[str, Any]]:
+    """
+    Fit every row of Y on its own span, one fit_batch per group of series sharing a span
+
+    Returns:
+        fit_batch models, each with "rows" (the row indices of Y it covers)
+    """
+    fits = []
+    lengths = spans[:, 1] - spans[:, 0] + 1
+    eligible = (spans[:, 0] >= 0) & (lengths >= MIN_HISTORY_MONTHS)
+    groups = pd.Series(np.flatnonzero(eligible)).groupby(
+        [spans[eligible, 0], spans[eligible, 1]], sort=False)
+    for (start, end), rows in groups:
+        rows = rows.to_numpy()
+        fit = fit_batch(Y[rows, start:end + 1], first_period + int(start))
+        fit["rows"] = rows
+        fits.append(fit)
+    return fits
+
+
+def predict_spans(fits: List[Dict[str, Any]], n_series: int, start: int, horizon: int):
+    """
+    Forecast the same `horizon` months (from `start`) for the series of every span fit
+
+    Returns:
+        (periods, forecast, lower, upper); rows of series without a fit are NaN
+    """
+    periods = np.arange(start, start + horizon)
+    forecast, lower, upper = (np.full((n_series, horizon), np.nan) for _ in range(3))
+    for fit in fits:
+        _, f, lo, up = predict_batch(fit, horizon, start)
+        forecast[fit["rows"]], lower[fit["rows"]], upper[fit["rows"]] = f, lo, up
+    return periods, forecast, lower, upper
+
+
+def get_models(db: Session, dimension: str) -> Optional[Dict[str, Any]]:
+    """
+    Fitted models for a dimension (revenue and profit), cached per data version
+
+    Returns:
+        None when no series has MIN_HISTORY_MONTHS complete months of history
+    """
+    global _cache_version
+    if dimension not in SERIES_QUERIES:
+        raise ValueError(f"Unknown forecast dimension: {dimension}")
+
+    version = current_version()
+    with _cache_lock:
+        if _cache_version != version:
+            _model_cache.clear()
+            _cache_version = version
+        if dimension in _model_cache:
+            return _model_cache[dimension]
+
+    panel = _load_panel(db, dimension)
+    models = None
+    if panel is not None and panel["complete_months"] >= MIN_HISTORY_MONTHS:
+        start = time.perf_counter()
+        spans = _active_spans(panel)
+        fits = {metric: fit_spans(panel[metric], panel["first_period"], spans) for metric in METRICS}
+        fitted = np.zeros(len(panel["keys"]), dtype=bool)
+        for fit in fits["revenue"]:
+            fitted[fit["rows"]] = True
+        if fitted.any():
+            models = {
+                "keys": panel["keys"],
+                "history": {metric: panel[metric] for metric in METRICS},
+                "first_period": panel["first_period"],
+                "last_period": panel["first_period"] + panel["complete_months"] - 1,
+                "spans": spans,
+                "fitted": fitted,
+                "fits": fits
+            }
+            models["fit_ms"] = round((time.perf_counter() - start) * 1000, 2)
+            print(f"Forecast: fitted {int(fitted.sum())} {dimension} series "
+                  f"({len(fits['revenue'])} spans) in {models['fit_ms']} ms")
+
+    with _cache_lock:
+        if _cache_version == version:
+            _model_cache[dimension] = models
+    return models
+
+
+def get_monthly_forecast(db: Session, year: int, horizon: int = 3) -> List[Dict[str, Any]]:
+    """
+    Company-wide monthly revenue / profit for a year, extended with forecasts
+
+    Actual months keep the {name, revenue, profit} shape used by the dashboard chart;
+    the current month is flagged partial (it is not fitted). Forecast months (after the
+    last complete month, inside the requested year) carry forecast / forecast_lower /
+    forecast_upper and profit_forecast instead - merged into the partial month's row.
+    The last complete month also carries forecast = revenue so the chart line connects.
+    """
+    models = get_models(db, "total")
+    if models is None:
+        return []
+
+    last_period = models["last_period"]
+    data = []
+    rows_by_period = {}
+
+    for offset, (revenue, profit) in enumerate(zip(models["history"]["revenue"][0],
+                                                   models["history"]["profit"][0])):
+        period = models["first_period"] + offset
+        label = _period_label(period)
+        if label["year"] != year:
+            continue
+        row = {"name": label["name"], "revenue": float(revenue), "profit": float(profit)}
+        if period > last_period:
+            row["partial"] = True
+        data.append(row)
+        rows_by_period[period] = row
+
+    horizon = max(0, min(int(horizon), MAX_HORIZON))
+    if horizon == 0 or not models["fitted"][0]:
+        return data
+
+    n_series = len(models["keys"])
+    periods, forecast, lower, upper = predict_spans(models["fits"]["revenue"], n_series, last_period + 1, horizon)
+    _, profit_forecast, _, _ = predict_spans(models["fits"]["profit"], n_series, last_period + 1, horizon)
+
+    if last_period in rows_by_period:
+        rows_by_period[last_period]["forecast"] = rows_by_period[last_period]["revenue"]
+
+    for i, period in enumerate(periods):
+        label = _period_label(period)
+        if label["year"] != year:
+            continue
+        row = rows_by_period.get(period)
+        if row is None:
+            row = {"name": label["name"]}
+            data.append(row)
+        row.update({
+            "forecast": float(forecast[0, i]),
+            "forecast_lower": max(float(lower[0, i]), 0.0),
+            "forecast_upper": float(upper[0, i]),
+            "profit_forecast": float(profit_forecast[0, i])
+        })
+
+    return data
+
+
+def get_series_forecast(db: Session, dimension: str, horizon: int = 3, limit: int = 50,
+                        key: str = None) -> Dict[str, Any]:
+    """
+    Per-series forecasts for a dimension (salesman, channel, product, total)
+
+    Args:
+        horizon: Months to forecast after the last complete month
+        limit: Return the top-N series by trailing 12-month revenue
+        key: Return only this series (e.g. one salesman name)
+
+    Returns:
+        Dict with the series forecasts (value, lower, upper per future month), each
+        series' active span and fit stats. Series with less than MIN_HISTORY_MONTHS
+        active months are not fitted and not returned.
+    """
+    models = get_models(db, dimension)
+    if models is None:
+        return {"dimension": dimension, "series": [], "series_fitted": 0}
+
+    horizon = max(1, min(int(horizon), MAX_HORIZON))
+    last_period = models["last_period"]
+    periods, forecast, lower, upper = predict_spans(models["fits"]["revenue"], len(models["keys"]),
+                                                    last_period + 1, horizon)
+    labels = [_period_label(p) for p in periods]
+
+    history = models["history"]["revenue"][:, :last_period - models["first_period"] + 1]
+    trailing = history[:, -12:].sum(axis=1)
+    fitted = models["fitted"]
+
+    if key is not None:
+        selected = [i for i, k in enumerate(models["keys"]) if k == key and fitted[i]]
+    else:
+        selected = [i for i in np.argsort(-trailing) if fitted[i]][:limit]
+
+    series = []
+    for i in selected:
+        first, last = models["spans"][i]
+        series.append({
+            "key": models["keys"][i],
+            "trailing_12m_revenue": float(trailing[i]),
+            "first_active": _period_label(models["first_period"] + first),
+            "last_active": _period_label(models["first_period"] + last),
+            "forecast": [
+                {
+                    **label,
+                    "value": float(forecast[i, j]),
+                    "lower": float(lower[i, j]),
+                    "upper": float(upper[i, j])
+                }
+                for j, label in enumerate(labels)
+            ]
+        })
+
+    partial_period = models["first_period"] + models["history"]["revenue"].shape[1] - 1
+    return {
+        "dimension": dimension,
+        "last_actual": _period_label(last_period),
+        "partial_month": _period_label(partial_period) if partial_period > last_period else None,
+        "seasonal": any(fit["seasonal"] for fit in models["fits"]["revenue"]),
+        "series_fitted": int(fitted.sum()),
+        "fit_ms": models["fit_ms"],
+        "data_version": current_version(),
+        "series": series
+    }
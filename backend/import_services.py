@@ -3,231 +3,540 @@ Data Import Service Functions - REWRITTEN FOR IDEMPOTENCY
 Purpose: Import sales and COGS data with strict deduplication and validation
 """
 import pandas as pd
-import io
 from datetime import datetime
 from sqlalchemy.orm import Session
 from sqlalchemy import text
 import os
+import uuid
+from file_readers import read_table, to_numeric_column, parse_sap_dates
+from batch_services import create_import_batch, finish_import_batch, save_preimage
+from summary_services import refresh_sales_performance_cells, refresh_performance_profit
+from dimension_services import attach_dimension_keys, sync_product_cost_keys
 
-def import_sales_data(file_contents: bytes, db: Session):
+# Column mapping for ZRSD002 sales exports
+SALES_COLUMN_MAPPING = {
+    "Billing Document": "billing_document",
+    "Billing Item": "billing_item",
+    "Material": "material_code",
+    "Net Value": "net_value",
+    "Salesman Name": "salesman_name",
+    "Billing Date": "billing_date",
+    "Description": "description",
+    "Billing Qty": "billing_qty",
+    "Dist": "dist",
+    "Branch": "branch",
+    "PH3": "product_group",
+    "Name of Bill to": "customer_name"
+}
+
+# Columns written to sales_data (id is auto-generated)
+SALES_INSERT_COLUMNS = [
+    'billing_document', 'billing_item', 'material_code', 'billing_date',
+    'month', 'month_number', 'year', 'dist', 'branch', 'salesman_name',
+    'product_group', 'description', 'net_value', 'profit', 'marketing_spend',
+    'customer_name', 'billing_qty', 'row_hash', 'import_batch_id',
+    'salesman_id', 'customer_id', 'product_id', 'branch_id', 'channel_id'
+]
+
+
+def _read_sales_frame(source, filename: str = None) -> pd.DataFrame:
+    """Read a ZRSD002 export (Excel or CSV/TSV) and apply the sales column mapping"""
+    df = read_table(source, filename)
+    return df.rename(columns=SALES_COLUMN_MAPPING)
+
+
+def _prepare_sales_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Derive year/month columns from billing_date, clean net_value and build unique keys"""
+    # Convert billing_date and extract year/month
+    if 'billing_date' in df.columns:
+        billing_date = parse_sap_dates(df['billing_date'])
+        df['billing_date'] = billing_date.dt.strftime('%Y-%m-%d')
+        df['year'] = billing_date.dt.year
+        df['month_number'] = billing_date.dt.month
+        df['month'] = billing_date.dt.strftime('%b')
+    
+    # Clean amounts (text exports may carry thousands separators)
+    for col in ('net_value', 'billing_qty'):
+        if col in df.columns:
+            df[col] = to_numeric_column(df[col])
+    
+    df['_unique_key'] = (
+        df['billing_document'].astype(str) + '_' + 
+        df['billing_item'].astype(str)
+    )
+    return df
+
+
+def _check_missing_cogs(records: pd.DataFrame, db: Session):
+    """
+    COGS pre-flight check
+    Returns an error result (and writes missing_cogs_report.xlsx) if any product lacks COGS, else None
+    """
+    unique_descriptions = records['description'].dropna().unique().tolist()
+    if not unique_descriptions:
+        return None
+    
+    from models import ProductCost
+    existing_cogs = db.query(ProductCost.description).all()
+    existing_descriptions = {record[0] for record in existing_cogs}
+    
+    missing_descriptions = [d for d in unique_descriptions if d not in existing_descriptions]
+    if not missing_descriptions:
+        print(f"  ✅ All products have COGS")
+        return None
+    
+    # Generate missing COGS report
+    report_df = pd.DataFrame({
+        'Description': missing_descriptions
+    })
+    
+    report_path = os.path.join(os.path.dirname(__file__), 'missing_cogs_report.xlsx')
+    report_df.to_excel(report_path, index=False)
+    
+    print(f"  ❌ Missing COGS for {len(missing_descriptions)} products")
+    print(f"  Report generated: {report_path}")
+    
+    return {
+        "status": "error",
+        "message": f"Upload Blocked: Found {len(missing_descriptions)} products without COGS. Please check the generated report.",
+        "report_path": report_path,
+        "missing_count": len(missing_descriptions)
+    }
+
+
+def _calculate_profit(records: pd.DataFrame, db: Session) -> pd.DataFrame:
+    """
+    Add profit and marketing_spend columns
+    profit = revenue - (unit COGS * qty), falling back to 70% of revenue when COGS is unknown
+    """
+    from models import ProductCost
+    cogs_records = db.query(ProductCost).all()
+    cogs_map = {record.description: record.cogs for record in cogs_records}
+    
+    revenue = records['net_value'] if 'net_value' in records.columns else pd.Series(0.0, index=records.index)
+    qty = records['billing_qty'] if 'billing_qty' in records.columns else pd.Series(0.0, index=records.index)
+    qty = qty.fillna(0)
+    
+    unit_cogs = records['description'].map(cogs_map) if 'description' in records.columns else pd.Series(float('nan'), index=records.index)
+    has_cogs = unit_cogs.notna() & (qty > 0)
+    cogs = (unit_cogs * qty).where(has_cogs, revenue * 0.7)  # Fallback
+    
+    records['profit'] = revenue - cogs
+    records['marketing_spend'] = revenue * 0.1
+    return records
+
+
+def _sales_cells(records: pd.DataFrame) -> set:
+    """Distinct (salesman_name, year, month_number) summary cells of a frame"""
+    if len(records) == 0:
+        return set()
+    cells = records[['salesman_name', 'year', 'month_number']].drop_duplicates()
+    return {
+        (None if pd.isna(s) else s, y, m)
+        for s, y, m in cells.itertuples(index=False)
+        if pd.notna(y) and pd.notna(m)
+    }
+
+
+def _insert_frame(records: pd.DataFrame) -> pd.DataFrame:
+    """Restrict a prepared frame to the sales_data columns"""
+    cols_to_insert = [c for c in SALES_INSERT_COLUMNS if c in records.columns]
+    return records[cols_to_insert]
+
+
+# Source columns that define a sales line's content (derived profit/marketing excluded)
+ROW_HASH_COLUMNS = [
+    'material_code', 'billing_date', 'net_value', 'billing_qty', 'salesman_name',
+    'description', 'dist', 'branch', 'product_group', 'customer_name'
+]
+
+# Rows per executemany batch for key staging and upserts
+WRITE_BATCH_SIZE = 5000
+
+
+def _canonical_text(values: pd.Series) -> pd.Series:
+    """Render a column as text the same way whether it came from Excel, CSV or MySQL"""
+    def fmt(v):
+        if v is None or (isinstance(v, float) and pd.isna(v)):
+            return ''
+        if isinstance(v, float) and v.is_integer():
+            return str(int(v))
+        return str(v).strip()
+    return values.astype(object).map(fmt)
+
+
+def compute_row_hash(records: pd.DataFrame) -> pd.Series:
+    """
+    Compact 64-bit content hash per sales line (stored in sales_data.row_hash)
+    Amounts are rounded and text is canonicalised so re-reading the same SAP line
+    always yields the same hash, regardless of file format.
+    """
+    canonical = pd.DataFrame(index=records.index)
+    for col in ROW_HASH_COLUMNS:
+        if col not in records.columns:
+            canonical[col] = ''
+        elif col in ('net_value', 'billing_qty'):
+            canonical[col] = _canonical_text(pd.to_numeric(records[col], errors='coerce').round(4))
+        else:
+            canonical[col] = _canonical_text(records[col])
+    hashes = pd.util.hash_pandas_object(canonical, index=False)
+    # Signed view fits a MySQL BIGINT column
+    return pd.Series(hashes.values.view('int64'), index=records.index)
+
+
+def _stage_keys(records: pd.DataFrame, db: Session):
+    """Load the frame's (billing_document, billing_item) keys into the session temp table tmp_import_keys"""
+    db.execute(text("DROP TEMPORARY TABLE IF EXISTS tmp_import_keys"))
+    db.execute(text("""
+        CREATE TEMPORARY TABLE tmp_import_keys
+        SELECT billing_document, billing_item FROM sales_data WHERE 1 = 0
+    """))
+    keys = records[['billing_document', 'billing_item']].astype(str).to_dict('records')
+    insert_keys = text("INSERT INTO tmp_import_keys (billing_document, billing_item) VALUES (:billing_document, :billing_item)")
+    for i in range(0, len(keys), WRITE_BATCH_SIZE):
+        db.execute(insert_keys, keys[i:i + WRITE_BATCH_SIZE])
+
+
+def _fetch_existing_rows(records: pd.DataFrame, db: Session) -> pd.DataFrame:
+    """
+    Look up stored row_hash (and summary cell) for the file's keys only
+    Keys are staged in a session temp table and joined through the unique
+    (billing_document, billing_item) index, so the cost follows the file size,
+    not the size of sales_data. Returns row_hash, salesman_name, year, month_number
+    indexed by _unique_key (NULL hashes from pre-hash rows count as changed).
+    """
+    _stage_keys(records, db)
+    
+    rows = db.execute(text("""
+        SELECT s.billing_document, s.billing_item, s.row_hash,
+               s.salesman_name, s.year, s.month_number
+        FROM tmp_import_keys k
+        JOIN sales_data s
+          ON s.billing_document = k.billing_document
+         AND s.billing_item = k.billing_item
+    """)).fetchall()
+    db.execute(text("DROP TEMPORARY TABLE IF EXISTS tmp_import_keys"))
+    
+    existing = pd.DataFrame(
+        [row[2:] for row in rows],
+        index=[f"{row[0]}_{row[1]}" for row in rows],
+        columns=['row_hash', 'salesman_name', 'year', 'month_number']
+    )
+    existing['row_hash'] = existing['row_hash'].astype('Int64')
+    return existing
+
+
+# Columns kept in a batch's pre-image (restored as-is on rollback)
+PREIMAGE_COLUMNS = ['id'] + SALES_INSERT_COLUMNS
+
+
+def _save_upsert_preimage(records: pd.DataFrame, batch_id: str, db: Session) -> int:
+    """Keep the stored version of the lines an upsert is about to overwrite"""
+    if len(records) == 0:
+        return 0
+    _stage_keys(records, db)
+    rows = db.execute(text(f"""
+        SELECT {", ".join('s.' + c for c in PREIMAGE_COLUMNS)}
+        FROM tmp_import_keys k
+        JOIN sales_data s
+          ON s.billing_document = k.billing_document
+         AND s.billing_item = k.billing_item
+    """)).mappings().fetchall()
+    db.execute(text("DROP TEMPORARY TABLE IF EXISTS tmp_import_keys"))
+    return save_preimage(db, batch_id, "sales_data", rows)
+
+
+def _upsert_changed_rows(records: pd.DataFrame, db: Session) -> int:
+    """Batched INSERT ... ON DUPLICATE KEY UPDATE for corrected SAP lines"""
+    if len(records) == 0:
+        return 0
+    cols = list(records.columns)
+    updates = ", ".join(f"{c} = VALUES({c})" for c in cols if c not in ('billing_document', 'billing_item'))
+    upsert = text(f"""
+        INSERT INTO sales_data ({", ".join(cols)})
+        VALUES ({", ".join(':' + c for c in cols)})
+        ON DUPLICATE KEY UPDATE {updates}
+    """)
+    rows = records.astype(object).where(records.notna(), None).to_dict('records')
+    for i in range(0, len(rows), WRITE_BATCH_SIZE):
+        db.execute(upsert, rows[i:i + WRITE_BATCH_SIZE])
+    return len(rows)
+
+
+def import_sales_data(source, db: Session, filename: str = None):
     """
     Import sales data with IDEMPOTENT guarantee
     Upload 10 times = Data exists only once
+    Rows whose content hash differs from the stored line (SAP reversals/corrections)
+    are upserted; unchanged rows are skipped.
     
     Args:
-        file_contents: Excel file bytes
+        source: Path (or bytes) of the Excel or CSV/TSV upload
         db: SQLAlchemy session
+        filename: Original file name (selects the parser)
         
     Returns:
-        dict with status, message, and optional report_path
+        dict with status, message, rows_imported, rows_updated and optional report_path
     """
     try:
         print("\n" + "=" * 80)
         print("SALES DATA IMPORT - IDEMPOTENT MODE")
         print("=" * 80)
         
-        # STEP 1: Read Excel
-        print("\n[STEP 1] Reading Excel file...")
-        df = pd.read_excel(io.BytesIO(file_contents), engine='openpyxl')
-        
-        # Column mapping
-        column_mapping = {
-            "Billing Document": "billing_document",
-            "Billing Item": "billing_item",
-            "Material": "material_code",
-            "Net Value": "net_value",
-            "Salesman Name": "salesman_name",
-            "Billing Date": "billing_date",
-            "Description": "description",
-            "Billing Qty": "billing_qty",
-            "Dist": "dist",
-            "Branch": "branch",
-            "PH3": "product_group",
-            "Name of Bill to": "customer_name"
-        }
-        
-        df = df.rename(columns=column_mapping)
-        print(f"  ✅ Loaded {len(df):,} rows from Excel")
-        
-        # STEP 2: Data Preparation
-        print("\n[STEP 2] Preparing data...")
-        
-        # Convert billing_date and extract year/month
-        if 'billing_date' in df.columns:
-            df['billing_date'] = pd.to_datetime(df['billing_date'], errors='coerce').dt.strftime('%Y-%m-%d')
-            df['year'] = pd.to_datetime(df['billing_date'], errors='coerce').dt.year
-            df['month_number'] = pd.to_datetime(df['billing_date'], errors='coerce').dt.month
-            df['month'] = pd.to_datetime(df['billing_date'], errors='coerce').dt.strftime('%b')
-        
-        # Clean net_value
-        if 'net_value' in df.columns:
-            if df['net_value'].dtype == 'object':
-                df['net_value'] = pd.to_numeric(
-                    df['net_value'].astype(str).str.replace(r'[^\d.-]', '', regex=True), 
-                    errors='coerce'
-                )
-        
-        # STEP 3: Generate Unique Key
-        print("\n[STEP 3] Generating unique keys...")
-        
-        df['_unique_key'] = (
-            df['billing_document'].astype(str) + '_' + 
-            df['billing_item'].astype(str)
-        )
+        # STEP 1: Read file
+        print("\n[STEP 1] Reading file...")
+        df = _read_sales_frame(source, filename)
+        print(f"  ✅ Loaded {len(df):,} rows from file")
         
+        # STEP 2-3: Data Preparation & Unique Keys
+        print("\n[STEP 2-3] Preparing data and generating unique keys...")
+        df = _prepare_sales_frame(df)
         print(f"  ✅ Generated {len(df):,} unique keys")
         
-        # STEP 4: Fetch Existing Keys (Anti-Join)
-        print("\n[STEP 4] Checking for existing records...")
+        # STEP 4: Classify rows against existing keys & content hashes
+        print("\n[STEP 4] Classifying rows (new / unchanged / changed)...")
         
-        existing_query = text("""
-            SELECT CONCAT(billing_document, '_', billing_item) as unique_key
-            FROM sales_data
-            WHERE billing_document IS NOT NULL 
-            AND billing_item IS NOT NULL
-        """)
+        # Within one file the last occurrence of a key wins
+        df = df.drop_duplicates(subset=['_unique_key'], keep='last')
+        df['row_hash'] = compute_row_hash(df)
         
-        existing_df = pd.read_sql(existing_query, db.get_bind())
-        existing_keys = set(existing_df['unique_key'].tolist()) if not existing_df.empty else set()
+        existing_rows = _fetch_existing_rows(df, db)
+        stored_hash = df['_unique_key'].map(existing_rows['row_hash'])
+        is_existing = df['_unique_key'].isin(existing_rows.index)
         
-        print(f"  Database has {len(existing_keys):,} existing records")
+        new_records = df[~is_existing].copy()
+        hash_differs = stored_hash.ne(df['row_hash']).fillna(True).astype(bool)
+        changed_records = df[is_existing & hash_differs].copy()
+        duplicates_count = int(is_existing.sum()) - len(changed_records)
         
-        # STEP 5: Filter Duplicates
-        print("\n[STEP 5] Filtering duplicates...")
-        
-        new_records = df[~df['_unique_key'].isin(existing_keys)].copy()
-        duplicates_count = len(df) - len(new_records)
-        
-        print(f"  Excel rows: {len(df):,}")
-        print(f"  Duplicates (already in DB): {duplicates_count:,}")
+        print(f"  File rows: {len(df):,}")
+        print(f"  Unchanged (already in DB): {duplicates_count:,}")
+        print(f"  Changed (will be updated): {len(changed_records):,}")
         print(f"  New records to import: {len(new_records):,}")
         
-        if len(new_records) == 0:
+        if len(new_records) == 0 and len(changed_records) == 0:
             return {
                 "status": "info",
                 "message": "No new data to import. All records already exist in the database.",
                 "rows_imported": 0,
+                "rows_updated": 0,
                 "duplicates_skipped": duplicates_count
             }
         
-        # STEP 6: COGS Validation (Pre-flight Check)
-        print("\n[STEP 6] COGS validation...")
-        
-        unique_descriptions = new_records['description'].dropna().unique().tolist()
-        
-        if unique_descriptions:
-            from models import ProductCost
-            existing_cogs = db.query(ProductCost.description).all()
-            existing_descriptions = {record[0] for record in existing_cogs}
-            
-            missing_descriptions = [d for d in unique_descriptions if d not in existing_descriptions]
-            
-            if missing_descriptions:
-                # Generate missing COGS report
-                report_df = pd.DataFrame({
-                    'Description': missing_descriptions
-                })
-                
-                report_path = os.path.join(os.path.dirname(__file__), 'missing_cogs_report.xlsx')
-                report_df.to_excel(report_path, index=False)
-                
-                print(f"  ❌ Missing COGS for {len(missing_descriptions)} products")
-                print(f"  Report generated: {report_path}")
-                
-                return {
-                    "status": "error",
-                    "message": f"Upload Blocked: Found {len(missing_descriptions)} products without COGS. Please check the generated report.",
-                    "report_path": report_path,
-                    "missing_count": len(missing_descriptions)
-                }
-            else:
-                print(f"  ✅ All products have COGS")
-        
-        # STEP 7: Calculate Profit & Marketing Spend
-        print("\n[STEP 7] Calculating profit and marketing spend...")
-        
-        from models import ProductCost
-        cogs_records = db.query(ProductCost).all()
-        cogs_map = {record.description: record.cogs for record in cogs_records}
+        # STEP 5: COGS Validation (Pre-flight Check)
+        print("\n[STEP 5] COGS validation...")
+        to_write = pd.concat([new_records, changed_records])
+        cogs_error = _check_missing_cogs(to_write, db)
+        if cogs_error:
+            return cogs_error
+        
+        # STEP 6: Calculate Profit & Marketing Spend
+        print("\n[STEP 6] Calculating profit and marketing spend...")
+        new_records = _calculate_profit(new_records, db)
+        changed_records = _calculate_profit(changed_records, db)
+        print(f"  ✅ Calculated profit for {len(to_write):,} records")
+        
+        # STEP 7: Insert new rows & upsert changed rows (one transaction)
+        print("\n[STEP 7] Writing records...")
+        
+        batch_id = create_import_batch(db, "sales", filename)
+        new_records['import_batch_id'] = batch_id
+        changed_records['import_batch_id'] = batch_id
+        
+        # Resolve dimension names to integer keys in bulk
+        new_records = attach_dimension_keys(db, new_records)
+        changed_records = attach_dimension_keys(db, changed_records)
+        
+        df_final = _insert_frame(new_records)
+        if len(df_final) > 0:
+            df_final.to_sql('sales_data', db.connection(), if_exists='append', index=False)
+        _save_upsert_preimage(changed_records, batch_id, db)
+        updated_count = _upsert_changed_rows(_insert_frame(changed_records), db)
+        finish_import_batch(db, batch_id, len(df_final) + updated_count)
+        
+        # Refresh performance summary cells touched by this import (old + new cells of changed rows)
+        previous_cells = existing_rows.loc[changed_records['_unique_key'], ['salesman_name', 'year', 'month_number']]
+        refresh_sales_performance_cells(db, _sales_cells(new_records) | _sales_cells(changed_records) | _sales_cells(previous_cells))
+        db.commit()
         
-        def calculate_profit(row):
-            revenue = row.get('net_value', 0) or 0
-            qty = row.get('billing_qty', 0) or 0
-            description = row.get('description', '')
-            
-            if description in cogs_map and qty > 0:
-                cogs = cogs_map[description] * qty
-            else:
-                cogs = revenue * 0.7  # Fallback
-            
-            profit = revenue - cogs
-            marketing = revenue * 0.1
-            return pd.Series([profit, marketing], index=['profit', 'marketing_spend'])
+        print(f"  ✅ Inserted {len(df_final):,} records, updated {updated_count:,} records")
         
-        new_records[['profit', 'marketing_spend']] = new_records.apply(calculate_profit, axis=1)
-        print(f"  ✅ Calculated profit for {len(new_records):,} records")
+        print("\n" + "=" * 80)
+        print("✅ IMPORT COMPLETED")
+        print("=" * 80)
         
-        # STEP 8: Insert Data
-        print("\n[STEP 8] Inserting new records...")
+        return {
+            "status": "success",
+            "message": f"Successfully imported {len(df_final):,} new records, updated {updated_count:,} changed records. Skipped {duplicates_count:,} unchanged records.",
+            "rows_imported": len(df_final),
+            "rows_updated": updated_count,
+            "duplicates_skipped": duplicates_count,
+            "batch_id": batch_id
+        }
         
-        # Select only valid columns
-        valid_cols = [
-            'billing_document', 'billing_item', 'material_code', 'billing_date',
-            'month', 'month_number', 'year', 'dist', 'branch', 'salesman_name',
-            'product_group', 'description', 'net_value', 'profit', 'marketing_spend',
-            'customer_name', 'billing_qty'
-        ]
+    except Exception as e:
+        db.rollback()
+        import traceback
+        traceback.print_exc()
+        return {
+            "status": "error",
+            "message": f"Import failed: {str(e)}"
+        }
+
+
+def replace_sales_period(source, db: Session, year: int = None, month: int = None,
+                         filename: str = None):
+    """
+    Import sales data in REPLACE-BY-PERIOD mode
+    The file is the complete truth for (year, month): existing rows of that period
+    are swapped for the file's rows in one short transaction.
+    
+    Rows are first loaded into a private staging table and validated there, so the
+    live table is only touched by a single DELETE + INSERT ... SELECT. InnoDB readers
+    see either the old month or the new month, never a mix.
+    
+    Args:
+        source: Path (or bytes) of the Excel or CSV/TSV upload
+        db: SQLAlchemy session
+        year, month: Period to replace. Inferred from the file when omitted.
+        filename: Original file name (selects the parser)
         
-        cols_to_insert = [c for c in valid_cols if c in new_records.columns]
-        df_final = new_records[cols_to_insert]
+    Returns:
+        dict with status, message, rows_deleted and rows_imported
+    """
+    staging_table = f"sales_data_staging_{uuid.uuid4().hex[:12]}"
+    try:
+        print("\n" + "=" * 80)
+        print("SALES DATA IMPORT - REPLACE PERIOD MODE")
+        print("=" * 80)
         
-        # Remove the temporary _unique_key column if it exists
-        if '_unique_key' in df_final.columns:
-            df_final = df_final.drop(columns=['_unique_key'])
+        # STEP 1: Read & prepare
+        print("\n[STEP 1] Reading file...")
+        df = _prepare_sales_frame(_read_sales_frame(source, filename))
+        print(f"  ✅ Loaded {len(df):,} rows from file")
         
-        print(f"  Columns to insert: {len(cols_to_insert)}")
-        print(f"  Rows to insert: {len(df_final):,}")
+        # STEP 2: Period validation
+        print("\n[STEP 2] Validating period...")
+        periods = df[['year', 'month_number']].dropna().drop_duplicates()
+        if year is None or month is None:
+            if len(periods) != 1:
+                return {
+                    "status": "error",
+                    "message": f"Cannot infer period: file covers {len(periods)} (year, month) periods. Please specify year and month."
+                }
+            year = int(periods.iloc[0]['year'])
+            month = int(periods.iloc[0]['month_number'])
         
-        # Insert using append mode
-        df_final.to_sql('sales_data', db.get_bind(), if_exists='append', index=False)
+        outside = df[(df['year'] != year) | (df['month_number'] != month)]
+        if len(outside) > 0:
+            return {
+                "status": "error",
+                "message": f"Replace Blocked: {len(outside):,} rows fall outside {year}-{month:02d} (or have no billing date)."
+            }
         
-        print(f"  ✅ Successfully inserted {len(df_final):,} records")
+        duplicated = df['_unique_key'].duplicated()
+        if duplicated.any():
+            return {
+                "status": "error",
+                "message": f"Replace Blocked: {int(duplicated.sum()):,} duplicate (billing_document, billing_item) keys in file."
+            }
+        print(f"  ✅ All rows belong to {year}-{month:02d}")
+        
+        # STEP 3: COGS Validation
+        print("\n[STEP 3] COGS validation...")
+        cogs_error = _check_missing_cogs(df, db)
+        if cogs_error:
+            return cogs_error
+        
+        # STEP 4: Profit & Marketing Spend
+        print("\n[STEP 4] Calculating profit and marketing spend...")
+        df['row_hash'] = compute_row_hash(df)
+        batch_id = str(uuid.uuid4())
+        df['import_batch_id'] = batch_id
+        df = attach_dimension_keys(db, _calculate_profit(df, db))
+        df_final = _insert_frame(df)
+        
+        # STEP 5: Load staging table (same structure & unique index as sales_data)
+        print(f"\n[STEP 5] Loading staging table {staging_table}...")
+        engine = db.get_bind()
+        with engine.begin() as conn:
+            conn.execute(text(f"CREATE TABLE {staging_table} LIKE sales_data"))
+        df_final.to_sql(staging_table, engine, if_exists='append', index=False)
+        
+        staged_count = db.execute(text(f"SELECT COUNT(*) FROM {staging_table}")).scalar()
+        if staged_count != len(df_final):
+            return {
+                "status": "error",
+                "message": f"Staging validation failed: expected {len(df_final):,} rows, staged {staged_count:,}."
+            }
+        print(f"  ✅ Staged {staged_count:,} rows")
+        
+        # STEP 6: Atomic swap
+        print(f"\n[STEP 6] Swapping period {year}-{month:02d}...")
+        cols = ", ".join(df_final.columns)
+        # Pre-image: the period's current rows come back if this batch is rolled back
+        replaced_rows = db.execute(text(f"""
+            SELECT {", ".join(PREIMAGE_COLUMNS)} FROM sales_data
+            WHERE year = :year AND month_number = :month
+        """), {"year": year, "month": month}).mappings().fetchall()
+        save_preimage(db, batch_id, "sales_data", replaced_rows)
+        deleted = db.execute(
+            text("DELETE FROM sales_data WHERE year = :year AND month_number = :month"),
+            {"year": year, "month": month}
+        ).rowcount
+        db.execute(text(f"INSERT INTO sales_data ({cols}) SELECT {cols} FROM {staging_table}"))
+        refresh_sales_performance_cells(db, [(None, year, month)])
+        create_import_batch(db, "sales", filename, batch_id=batch_id)
+        finish_import_batch(db, batch_id, staged_count)
+        db.commit()
         
+        print(f"  ✅ Replaced {deleted:,} rows with {staged_count:,} rows")
         print("\n" + "=" * 80)
-        print("✅ IMPORT COMPLETED")
+        print("✅ REPLACE COMPLETED")
         print("=" * 80)
         
         return {
             "status": "success",
-            "message": f"Successfully imported {len(df_final):,} new records. Skipped {duplicates_count:,} duplicates.",
-            "rows_imported": len(df_final),
-            "duplicates_skipped": duplicates_count
+            "message": f"Replaced {year}-{month:02d}: removed {deleted:,} rows, imported {staged_count:,} rows.",
+            "year": year,
+            "month": month,
+            "rows_deleted": deleted,
+            "rows_imported": staged_count,
+            "batch_id": batch_id
         }
         
     except Exception as e:
+        db.rollback()
         import traceback
         traceback.print_exc()
         return {
             "status": "error",
-            "message": f"Import failed: {str(e)}"
+            "message": f"Replace import failed: {str(e)}"
         }
+    finally:
+        try:
+            with db.get_bind().begin() as conn:
+                conn.execute(text(f"DROP TABLE IF EXISTS {staging_table}"))
+        except Exception as e:
+            print(f"Warning: could not drop staging table {staging_table}: {e}")
 
 
-def import_cogs_data(file_contents: bytes, db: Session):
+def import_cogs_data(source, db: Session, filename: str = None):
     """
-    Import/Update COGS data from Excel
+    Import/Update COGS data from Excel or CSV/TSV
     Uses same logic as process_upload_cogs in services.py
     
     Args:
-        file_contents: Excel file bytes
+        source: Path (or bytes) of the Excel or CSV/TSV upload
         db: SQLAlchemy session
+        filename: Original file name (selects the parser)
         
     Returns:
         dict with status and message
     """
     try:
-        # Read Excel
-        df = pd.read_excel(io.BytesIO(file_contents), engine='openpyxl')
+        # Read file
+        df = read_table(source, filename)
         
         # Expect columns: Description, COGS
         if 'Description' not in df.columns or 'COGS' not in df.columns:
@@ -237,6 +546,7 @@ def import_cogs_data(file_contents: bytes, db: Session):
             }
         
         # Clean data
+        df['COGS'] = to_numeric_column(df['COGS'])
         df = df[['Description', 'COGS']].dropna()
         
         # Import using ORM
@@ -258,6 +568,10 @@ def import_cogs_data(file_contents: bytes, db: Session):
             
             count += 1
         
+        # Only total_profit of cells selling these products changes
+        db.flush()
+        sync_product_cost_keys(db)
+        refresh_performance_profit(db, df['Description'].tolist())
         db.commit()
         
         return {
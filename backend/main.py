@@ -1,5 +1,5 @@
-from fastapi import FastAPI, UploadFile, File, Depends, HTTPException
-from fastapi.responses import FileResponse
+from fastapi import FastAPI, UploadFile, File, Depends, HTTPException, Query
+from fastapi.responses import FileResponse, StreamingResponse
 # Trigger reload for Clean Architecture
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
@@ -10,11 +10,26 @@ import semester_services
 import import_services
 import analytics_services
 import debt_services
+import debt_migration_services
+import dso_services
+import file_readers
+import batch_services
+import forecast_services
+import projection_services
+import scorecard_services
+import chat_cache_services
+import transaction_services
+import export_services
+import analytics_mirror
+import data_version
+import summary_services
+import dimension_services
 from sqlalchemy.orm import Session
 from sqlalchemy import text
 from database import init_db, SessionLocal
 from models import SalesData, ChatHistory, ProductCost, SalesTarget
 import os
+import traceback
 from datetime import datetime
 
 # Gemini API Configuration removed (moved to services.py)
@@ -33,6 +48,13 @@ app.add_middleware(
 # Initialize Database
 init_db()
 
+# Aggregates join on the dimension keys: unset keys would merge every salesman into one
+# NULL group and drop COGS, so refuse to serve until migrate_dimensions.py has run
+with SessionLocal() as _db:
+    _missing_keys = dimension_services.missing_dimension_keys(_db)
+if _missing_keys:
+    raise RuntimeError(f"Dimension keys not backfilled ({', '.join(_missing_keys)}): run migrate_dimensions.py")
+
 # Dependency
 def get_db():
     db = SessionLocal()
@@ -68,19 +90,39 @@ AI_CONTEXT = {
 def refresh_global_state():
     """Helper to refresh global state from DB using services"""
     global DASHBOARD_DATA, AI_CONTEXT
+    # Data changed: invalidate caches keyed by data version (forecast models, ...)
+    data_version.bump_version()
     db = SessionLocal()
     try:
-        # Use year-filtered stats with default year
-        default_year = year_services.get_default_year(db)
-        stats = year_services.get_dashboard_stats_by_year(db, default_year)
-        if stats:
-            DASHBOARD_DATA = stats
-            AI_CONTEXT["rich_context"] = services.generate_ai_context(db, stats)
-            print(f"Global state refreshed successfully for year {default_year}.")
-        else:
-            print("No data found to refresh global state.")
-    except Exception as e:
-        print(f"Error refreshing global state: {e}")
+        # Each step is independent: a failure in one never skips the others
+        try:
+            # Use year-filtered stats with default year
+            default_year = year_services.get_default_year(db)
+            stats = year_services.get_dashboard_stats_by_year(db, default_year)
+            if stats:
+                DASHBOARD_DATA = stats
+                AI_CONTEXT["rich_context"] = services.generate_ai_context(db, stats)
+                print(f"Global state refreshed successfully for year {default_year}.")
+            else:
+                print("No data found to refresh global state.")
+        except Exception as e:
+            db.rollback()
+            print(f"Error refreshing global state: {e}")
+
+        try:
+            # Trailing revenue per customer (DSO) follows the sales data
+            summary_services.refresh_customer_trailing_revenue(db)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            print(f"Error refreshing customer trailing revenue: {e}")
+            traceback.print_exc()
+
+        try:
+            # Re-export the changed periods / snapshots to the DuckDB mirror (optional, no-op when disabled)
+            analytics_mirror.refresh()
+        except Exception as e:
+            print(f"Error refreshing analytics mirror (queries fall back to MySQL): {e}")
     finally:
         db.close()
 
@@ -116,12 +158,55 @@ def get_semester_performance(year: int = None, db: Session = Depends(get_db)):
         year = year_services.get_default_year(db)
     return semester_services.get_performance_by_semester(db, year)
 
+@app.get("/api/performance/scorecard")
+def get_salesman_scorecard(
+    year: int = None,
+    semester: int = None,
+    report_date: str = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Per-salesman revenue, target attainment, outstanding / overdue debt and collection rate
+    Sales for the year (or semester), debt from one AR snapshot (latest by default)
+    """
+    if semester is not None and semester not in (1, 2):
+        raise HTTPException(status_code=400, detail="semester must be 1 or 2")
+    if year is None:
+        year = year_services.get_default_year(db)
+    try:
+        return {"status": "success", **scorecard_services.get_salesman_scorecard(db, year, semester, report_date)}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        print(f"Error in salesman scorecard: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/performance/projection")
+def get_target_projection(
+    year: int = None,
+    semester: int = None,
+    simulations: int = projection_services.DEFAULT_SIMULATIONS,
+    db: Session = Depends(get_db)
+):
+    """
+    Monte Carlo projection of semester target attainment per salesman
+    Returns probability of reaching target and P10/P50/P90 semester totals
+    (cached until the next import)
+    """
+    if semester is not None and semester not in (1, 2):
+        raise HTTPException(status_code=400, detail="semester must be 1 or 2")
+    try:
+        return projection_services.get_target_projection(db, year, semester, simulations)
+    except Exception as e:
+        print(f"Error in target projection: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 
 @app.post("/api/upload-cogs")
 async def upload_cogs(file: UploadFile = File(...), db: Session = Depends(get_db)):
     try:
-        contents = await file.read()
-        count = services.process_upload_cogs(contents, db)
+        async with file_readers.spooled_upload(file) as path:
+            count = services.process_upload_cogs(path, db, file.filename)
         # COGS update affects profit, so refresh stats
         refresh_global_state()
         return {
@@ -134,52 +219,21 @@ async def upload_cogs(file: UploadFile = File(...), db: Session = Depends(get_db
         return {"error": str(e)}
 
 # --- FORECASTING ENGINE ---
-from sklearn.linear_model import LinearRegression
-import numpy as np
-import pandas as pd
 
 @app.get("/api/forecast")
-def get_forecast(year: int = None, db: Session = Depends(get_db)):
+def get_forecast(year: int = None, horizon: int = 3, db: Session = Depends(get_db)):
     """
-    Returns monthly sales revenue and profit data.
-    Renamed from forecast but now just shows actual monthly trends.
+    Returns monthly sales revenue and profit for a year.
+    Months after the last complete month (up to `horizon`) carry forecast,
+    forecast_lower / forecast_upper (95% interval) and profit_forecast; the current
+    month is flagged partial.
     """
     try:
         # Determine year
         if year is None:
             year = year_services.get_default_year(db)
         
-        # Fetch monthly data
-        query = text("""
-            SELECT 
-                month_number,
-                month,
-                SUM(net_value) as revenue,
-                SUM(profit) as profit
-            FROM sales_data
-            WHERE year = :year
-            GROUP BY month_number, month
-            ORDER BY month_number
-        """)
-        
-        result = db.execute(query, {"year": year}).fetchall()
-        
-        # Format response
-        month_names = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", 
-                      "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
-        
-        data = []
-        for row in result:
-            month_num = int(row[0])
-            month_idx = month_num - 1
-            
-            data.append({
-                "name": month_names[month_idx],
-                "revenue": float(row[2] or 0),
-                "profit": float(row[3] or 0)
-            })
-        
-        return data
+        return forecast_services.get_monthly_forecast(db, year, horizon)
         
     except Exception as e:
         print(f"Error in get_forecast: {e}")
@@ -187,12 +241,32 @@ def get_forecast(year: int = None, db: Session = Depends(get_db)):
         traceback.print_exc()
         return []
 
+@app.get("/api/forecast/series")
+def get_forecast_series(
+    dimension: str = "salesman",
+    horizon: int = 3,
+    limit: int = 50,
+    key: str = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Per-series revenue forecasts with 95% intervals
+    dimension: total | salesman | channel | product (series sharing an active span are fitted in one batch)
+    """
+    if dimension not in forecast_services.SERIES_QUERIES:
+        raise HTTPException(status_code=400, detail=f"Unknown dimension: {dimension}")
+    try:
+        return {"status": "success", **forecast_services.get_series_forecast(db, dimension, horizon, limit, key)}
+    except Exception as e:
+        print(f"Error in forecast series: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 
 @app.post("/api/upload-target")
 async def upload_target(file: UploadFile = File(...), db: Session = Depends(get_db)):
     try:
-        contents = await file.read()
-        count = services.process_upload_target(contents, db)
+        async with file_readers.spooled_upload(file) as path:
+            count = services.process_upload_target(path, db, file.filename)
         refresh_global_state()
         return {
             "status": "success",
@@ -210,21 +284,47 @@ class ChatRequest(BaseModel):
 def chat_analyst(request: ChatRequest, db: Session = Depends(get_db)):
     return services.process_chat(request.question, db)
 
+@app.get("/api/chat/cache-stats")
+def chat_cache_stats():
+    """
+    Chat cache statistics since API start
+    sql: question-to-SQL cache size, hit rate and model latency saved
+    results: SQL result cache size and hit rate (current data version only)
+    """
+    return {
+        "status": "success",
+        "sql": chat_cache_services.get_cache_stats(),
+        "results": chat_cache_services.get_result_stats()
+    }
+
 # --- NEW IMPORT ENDPOINTS WITH VALIDATION ---
 
 @app.post("/api/import/sales")
-async def import_sales(file: UploadFile = File(...), db: Session = Depends(get_db)):
+async def import_sales(
+    file: UploadFile = File(...),
+    mode: str = "append",
+    year: int = None,
+    month: int = None,
+    db: Session = Depends(get_db)
+):
     """
     Import sales data with duplicate detection and COGS validation
+    mode=append (default): insert only new (billing_document, billing_item) rows
+    mode=replace: the file is the complete truth for (year, month) - the period is swapped atomically
     Returns: {status, message, rows_imported} or {status, error, report_path}
     """
     try:
         # Validate file type
-        if not file.filename.endswith(('.xlsx', '.xls')):
-            raise HTTPException(status_code=400, detail="Only Excel files (.xlsx, .xls) are supported")
+        if not file_readers.is_supported(file.filename):
+            raise HTTPException(status_code=400, detail="Only Excel (.xlsx, .xls) or delimited text (.csv, .tsv, .txt) files are supported")
+        if mode not in ("append", "replace"):
+            raise HTTPException(status_code=400, detail="mode must be 'append' or 'replace'")
         
-        contents = await file.read()
-        result = import_services.import_sales_data(contents, db)
+        async with file_readers.spooled_upload(file) as path:
+            if mode == "replace":
+                result = import_services.replace_sales_period(path, db, year, month, file.filename)
+            else:
+                result = import_services.import_sales_data(path, db, file.filename)
         
         # Refresh dashboard if import successful
         if result["status"] == "success":
@@ -246,11 +346,11 @@ async def import_cogs(file: UploadFile = File(...), db: Session = Depends(get_db
     """
     try:
         # Validate file type
-        if not file.filename.endswith(('.xlsx', '.xls')):
-            raise HTTPException(status_code=400, detail="Only Excel files (.xlsx, .xls) are supported")
+        if not file_readers.is_supported(file.filename):
+            raise HTTPException(status_code=400, detail="Only Excel (.xlsx, .xls) or delimited text (.csv, .tsv, .txt) files are supported")
         
-        contents = await file.read()
-        result = import_services.import_cogs_data(contents, db)
+        async with file_readers.spooled_upload(file) as path:
+            result = import_services.import_cogs_data(path, db, file.filename)
         
         # Refresh dashboard if import successful
         if result["status"] == "success":
@@ -264,6 +364,40 @@ async def import_cogs(file: UploadFile = File(...), db: Session = Depends(get_db
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/imports")
+def list_imports(limit: int = 50, db: Session = Depends(get_db)):
+    """
+    Import history (most recent first) with batch ids usable for rollback
+    """
+    try:
+        return {"status": "success", "data": batch_services.list_import_batches(db, limit)}
+    except Exception as e:
+        print(f"Error listing imports: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.delete("/api/imports/{batch_id}")
+def rollback_import(batch_id: str, db: Session = Depends(get_db)):
+    """
+    Roll back an import batch: removes the sales_data / ar_aging_report rows it wrote
+    and restores the rows it overwrote (409 when a later import must be rolled back first)
+    """
+    try:
+        result = batch_services.rollback_import_batch(db, batch_id)
+        if result["status"] == "error":
+            raise HTTPException(status_code=404, detail=result["message"])
+        if result["status"] == "conflict":
+            raise HTTPException(status_code=409, detail=result["message"])
+        if result["status"] == "success" and (result["sales_rows_deleted"] > 0 or result["sales_rows_restored"] > 0):
+            refresh_global_state()
+        elif result["status"] == "success":
+            data_version.bump_version()
+        return result
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Error rolling back import {batch_id}: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.get("/api/download/missing-cogs-report")
 async def download_missing_cogs_report():
     """
@@ -325,20 +459,120 @@ def get_seasonality(year: int = None, semester: int = None, db: Session = Depend
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/analytics/channel-performance")
-def get_channel_performance(year: int, semester: int = None, db: Session = Depends(get_db)):
+def get_channel_performance(year: int, semester: int = None, all_semesters: bool = False,
+                            db: Session = Depends(get_db)):
     """
     Channel Performance Analysis
     Returns revenue, profit, and margin by distribution channel (Industry, Retail, Project)
     Includes monthly trend data for stacked visualization
+    all_semesters=true returns {"S1", "S2", "FY"} in one response (semester toggle)
     """
     try:
-        data = services.get_channel_performance(db, year, semester)
+        data = services.get_channel_performance(db, year, semester, all_semesters)
         return {"status": "success", "data": data}
     except Exception as e:
         print(f"Error in channel-performance: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/api/sales/transactions")
+def get_sales_transactions(
+    year: int = None,
+    semester: int = None,
+    month: int = None,
+    channel: str = None,
+    branch: str = None,
+    salesman: str = None,
+    product: str = None,
+    customer: str = None,
+    cursor: str = None,
+    page_size: int = transaction_services.DEFAULT_PAGE_SIZE,
+    db: Session = Depends(get_db)
+):
+    """
+    Transaction drill-down: the sales_data rows behind a chart bar
+    Keyset-paginated on (billing_date, id); pass next_cursor to get the following page.
+    page_size is capped at 500.
+    """
+    try:
+        result = transaction_services.get_transactions(
+            db, year=year, semester=semester, month=month, channel=channel, branch=branch,
+            salesman=salesman, product=product, customer=customer, cursor=cursor, page_size=page_size
+        )
+        return {"status": "success", **result}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        print(f"Error in sales transactions: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# --- STREAMING EXPORTS ---
+
+@app.get("/api/export/sales")
+def export_sales(
+    format: str = "csv",
+    year: int = None,
+    semester: int = None,
+    month: int = None,
+    channel: str = None,
+    branch: str = None,
+    salesman: str = None,
+    product: str = None,
+    customer: str = None
+):
+    """
+    Stream filtered sales_data rows as csv, ndjson or xlsx
+    Rows are read from a server-side cursor while the response is written
+    """
+    if format not in export_services.EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported format: {format}")
+    try:
+        query, params = export_services.sales_export_query(
+            year=year, semester=semester, month=month, channel=channel, branch=branch,
+            salesman=salesman, product=product, customer=customer
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    filename = export_services.export_filename("sales", format, {
+        "year": year, "semester": f"S{semester}" if semester else None, "month": month
+    })
+    return StreamingResponse(
+        export_services.stream_export(query, params, export_services.SALES_EXPORT_COLUMNS, format, "Sales"),
+        media_type=export_services.EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+@app.get("/api/export/debt")
+def export_debt(
+    format: str = "csv",
+    report_date: str = None,
+    channel: str = None,
+    salesman: str = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Stream one AR aging snapshot (latest by default) as csv, ndjson or xlsx
+    """
+    if format not in export_services.EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported format: {format}")
+    try:
+        report_date = debt_services.parse_report_date(report_date) or debt_services.get_latest_report_date(db)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not report_date:
+        raise HTTPException(status_code=404, detail="No debt data available")
+
+    query, params = export_services.debt_export_query(db, report_date, channel, salesman)
+    filename = export_services.export_filename("debt", format, {"report_date": report_date, "channel": channel})
+    return StreamingResponse(
+        export_services.stream_export(query, params, export_services.DEBT_EXPORT_COLUMNS, format, "AR Aging"),
+        media_type=export_services.EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
 # --- DEBT & CREDIT CONTROL ENDPOINTS ---
 
 @app.post("/api/import/debt")
@@ -348,7 +582,7 @@ async def import_debt_report(
     db: Session = Depends(get_db)
 ):
     """
-    Import AR Aging Report (ZRFI005.XLSX)
+    Import AR Aging Report (ZRFI005 as .xlsx or .csv/.tsv)
     Implements idempotent delete-insert pattern
     """
     try:
@@ -356,11 +590,10 @@ async def import_debt_report(
         if not report_date:
             report_date = datetime.now().strftime("%Y-%m-%d")
         
-        # Read file contents
-        contents = await file.read()
-        
-        # Import data
-        result = debt_services.import_debt_data(contents, db, report_date)
+        # Stream upload to disk and import from the file path
+        async with file_readers.spooled_upload(file) as path:
+            result = debt_services.import_debt_data(path, db, report_date, file.filename)
+        data_version.bump_version()
         
         return result
     except Exception as e:
@@ -381,18 +614,80 @@ def get_debt_overview(report_date: str = None, db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/debt/top-customers")
-def get_top_debt_customers(report_date: str = None, limit: int = 10, db: Session = Depends(get_db)):
+def get_top_debt_customers(
+    report_date: str = None,
+    limit: int = 10,
+    channel: str = None,
+    salesman: str = None,
+    db: Session = Depends(get_db)
+):
     """
     Get top customers by outstanding debt
     Smart date defaulting: Uses latest report_date if not provided
+    Optional channel / salesman filters
     """
     try:
-        data = debt_services.get_top_debtors(db, report_date, limit)
+        data = debt_services.get_top_debtors(db, report_date, limit, channel, salesman)
         return {"status": "success", "data": data}
     except Exception as e:
         print(f"Error in top customers: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/debt/trend")
+def get_debt_trend(
+    date_from: str = Query(None, alias="from"),
+    date_to: str = Query(None, alias="to"),
+    channel: str = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Outstanding, collected, bad debt (>180 days) and collection rate per AR snapshot date
+    Optional from / to (YYYY-MM-DD, inclusive) and channel filters
+    """
+    try:
+        data = debt_services.get_debt_trend(db, date_from, date_to, channel)
+        return {"status": "success", "data": data}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        print(f"Error in debt trend: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/debt/migration")
+def get_debt_migration(
+    date_from: str = Query(None, alias="from"),
+    date_to: str = Query(None, alias="to"),
+    top: int = 20,
+    db: Session = Depends(get_db)
+):
+    """
+    Aging bucket migration matrix between two AR snapshots, plus top movers
+    Defaults: to = latest snapshot, from = the snapshot before it
+    """
+    try:
+        data = debt_migration_services.get_aging_migration(db, date_from, date_to, top)
+        return {"status": "success", **data}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        print(f"Error in debt migration: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/debt/dso")
+def get_debt_dso(report_date: str = None, limit: int = 100, db: Session = Depends(get_db)):
+    """
+    Days sales outstanding per customer and per salesman for one AR snapshot (latest by default)
+    DSO = outstanding / revenue of the 90 days ending at the snapshot (window_end) * 90
+    """
+    try:
+        data = dso_services.get_dso(db, report_date, limit)
+        return {"status": "success", **data}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        print(f"Error in DSO: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.get("/api/debt/available-dates")
 def get_available_debt_dates(db: Session = Depends(get_db)):
     """
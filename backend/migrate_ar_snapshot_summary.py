@@ -0,0 +1,55 @@
+"""
+Migration: per-snapshot AR summary
+Creates ar_snapshot_summary (one row per report_date, channel, salesman) and fills it
+from every snapshot already in ar_aging_report. After this, debt imports and
+rollbacks keep it up to date. Re-run at any time to repair it.
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from database import Base, engine, SessionLocal
+from models import ARSnapshotSummary
+from migration_utils import create_index
+from summary_services import refresh_ar_snapshot_summary, AR_SUMMARY_TABLE
+from sqlalchemy import text
+
+
+def run_migration():
+    print("=" * 80)
+    print(f"MIGRATION: {AR_SUMMARY_TABLE}")
+    print("=" * 80)
+
+    print(f"\n[Running] Creating {AR_SUMMARY_TABLE}...")
+    Base.metadata.create_all(bind=engine, tables=[ARSnapshotSummary.__table__])
+    print("  ✓ Done")
+
+    # Trend reads: date range, or channel + date range (tables created before the trend endpoint)
+    with engine.connect() as conn:
+        create_index(conn, AR_SUMMARY_TABLE, "idx_ar_summary_date_channel", "report_date, channel")
+        create_index(conn, AR_SUMMARY_TABLE, "idx_ar_summary_channel_date", "channel, report_date")
+
+    db = SessionLocal()
+    try:
+        report_dates = [r[0] for r in db.execute(text("SELECT DISTINCT report_date FROM ar_aging_report")).fetchall()]
+        print(f"\n[Running] Summarizing {len(report_dates)} snapshots...")
+        start = time.time()
+        # One snapshot per statement keeps each transaction small
+        for report_date in report_dates:
+            refresh_ar_snapshot_summary(db, [report_date])
+            db.commit()
+        count = db.execute(text(f"SELECT COUNT(*) FROM {AR_SUMMARY_TABLE}")).scalar()
+        print(f"  ✓ {count:,} rows ({time.time() - start:.2f}s)")
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+    print("\n=== MIGRATION COMPLETE ===")
+
+
+if __name__ == "__main__":
+    run_migration()
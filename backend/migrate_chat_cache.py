@@ -0,0 +1,30 @@
+"""
+Migration: question-to-SQL cache for the AI analyst
+- Creates chat_sql_cache (normalized question hash -> generated SQL, schema fingerprint,
+  generation time, hits, last use)
+The table starts empty and fills as questions are answered; entries made for an older
+DB_SCHEMA are dropped automatically on the first chat after a deploy.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from database import Base, engine
+from models import ChatSqlCache
+
+
+def run_migration():
+    print("=" * 80)
+    print("MIGRATION: Chat SQL cache")
+    print("=" * 80)
+
+    print("\n[Running] Creating chat_sql_cache...")
+    Base.metadata.create_all(bind=engine, tables=[ChatSqlCache.__table__])
+    print("  ✓ Done")
+
+    print("\n=== MIGRATION COMPLETE ===")
+
+
+if __name__ == "__main__":
+    run_migration()
@@ -0,0 +1,63 @@
+"""
+Migration: AR customer key mapping and trailing revenue (DSO)
+- Creates customer_key_map (ar_aging_report.customer_code -> dim_customer.id) and
+  fills it from the customer names of every stored AR snapshot
+- Creates customer_trailing_revenue and computes the trailing 90-day revenue
+Requires migrate_dimensions.py (dim_customer, sales_data.customer_id).
+After this, debt imports extend the mapping and sales imports rebuild the revenue.
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from database import Base, engine, SessionLocal
+from models import CustomerKeyMap, CustomerTrailingRevenue
+from migration_utils import run_step
+from summary_services import refresh_customer_trailing_revenue, TRAILING_REVENUE_TABLE
+from sqlalchemy import text
+
+
+def run_migration():
+    print("=" * 80)
+    print("MIGRATION: Customer key mapping and trailing revenue")
+    print("=" * 80)
+
+    print("\n[Running] Creating customer_key_map and customer_trailing_revenue...")
+    Base.metadata.create_all(bind=engine, tables=[CustomerKeyMap.__table__, CustomerTrailingRevenue.__table__])
+    print("  ✓ Done")
+
+    with engine.connect() as conn:
+        run_step(conn, "Adding AR customer names to dim_customer", """
+            INSERT IGNORE INTO dim_customer (name)
+            SELECT DISTINCT customer_name FROM ar_aging_report WHERE customer_name IS NOT NULL
+        """)
+        run_step(conn, "Mapping customer codes to customer keys", """
+            INSERT INTO customer_key_map (customer_code, customer_id)
+            SELECT ar.customer_code, MAX(d.id)
+            FROM ar_aging_report ar
+            JOIN dim_customer d ON d.name = ar.customer_name
+            GROUP BY ar.customer_code
+            ON DUPLICATE KEY UPDATE customer_id = VALUES(customer_id)
+        """)
+
+    db = SessionLocal()
+    try:
+        print("\n[Running] Computing trailing revenue...")
+        start = time.time()
+        refresh_customer_trailing_revenue(db)
+        db.commit()
+        count = db.execute(text(f"SELECT COUNT(*) FROM {TRAILING_REVENUE_TABLE}")).scalar()
+        print(f"  ✓ {count:,} customers ({time.time() - start:.2f}s)")
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+    print("\n=== MIGRATION COMPLETE ===")
+
+
+if __name__ == "__main__":
+    run_migration()
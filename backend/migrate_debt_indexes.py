@@ -0,0 +1,46 @@
+"""
+Migration: ar_aging_report indexes
+- (report_date, customer_code): per-snapshot customer reads for the aging migration
+  matrix (report_date = ? then merge by customer_code)
+- overdue_debt: stored generated column (61+ day buckets)
+- (report_date, [channel | salesman_name,] total_debt): top debtors without a filesort
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from database import engine
+from migration_utils import add_column, create_index, run_step
+
+DEBT_INDEXES = [
+    ("idx_ar_date_customer", "report_date, customer_code"),
+    ("idx_ar_date_debt", "report_date, total_debt"),
+    ("idx_ar_date_channel_debt", "report_date, channel, total_debt"),
+    ("idx_ar_date_salesman_debt", "report_date, salesman_name, total_debt"),
+]
+
+OVERDUE_EXPRESSION = "debt_61_90 + debt_91_120 + debt_121_180 + debt_over_180"
+
+
+def run_migration():
+    print("=" * 80)
+    print("MIGRATION: AR aging report indexes")
+    print("=" * 80)
+
+    with engine.connect() as conn:
+        # Older schemas created these as TEXT, which cannot be indexed
+        run_step(conn, "Converting channel to VARCHAR(50)",
+                 "ALTER TABLE ar_aging_report MODIFY channel VARCHAR(50) NOT NULL")
+        run_step(conn, "Converting salesman_name to VARCHAR(255)",
+                 "ALTER TABLE ar_aging_report MODIFY salesman_name VARCHAR(255) NULL")
+        add_column(conn, "ar_aging_report", "overdue_debt",
+                   f"DOUBLE GENERATED ALWAYS AS ({OVERDUE_EXPRESSION}) STORED")
+        for index, columns in DEBT_INDEXES:
+            create_index(conn, "ar_aging_report", index, columns)
+
+    print("\n=== MIGRATION COMPLETE ===")
+
+
+if __name__ == "__main__":
+    run_migration()
@@ -0,0 +1,48 @@
+"""
+Migration: delta storage for AR aging snapshots
+- Adds ar_aging_report.is_removed (tombstone flag of delta snapshots)
+- Creates ar_snapshots and registers every existing report_date as a full snapshot
+- Creates ar_aging_latest (latest snapshot for chat SQL, filled in delta mode)
+Delta mode itself is opt-in (DEBT_STORAGE=delta); existing snapshots are left as they are.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from database import Base, engine, SessionLocal
+from models import ARSnapshot, ARAgingLatest
+from migration_utils import add_column, run_step
+from summary_services import refresh_ar_latest_snapshot
+
+
+def run_migration():
+    print("=" * 80)
+    print("MIGRATION: AR snapshot delta storage")
+    print("=" * 80)
+
+    print("\n[Running] Creating ar_snapshots and ar_aging_latest...")
+    Base.metadata.create_all(bind=engine, tables=[ARSnapshot.__table__, ARAgingLatest.__table__])
+    print("  ✓ Done")
+
+    with engine.connect() as conn:
+        add_column(conn, "ar_aging_report", "is_removed", "TINYINT NOT NULL DEFAULT 0")
+        run_step(conn, "Registering existing snapshots as full", """
+            INSERT IGNORE INTO ar_snapshots (report_date, storage, checkpoint_date, batch_id, rows_total, rows_stored)
+            SELECT report_date, 'full', report_date, MAX(import_batch_id), COUNT(*), COUNT(*)
+            FROM ar_aging_report
+            GROUP BY report_date
+        """)
+
+    db = SessionLocal()
+    try:
+        refresh_ar_latest_snapshot(db)  # no-op unless DEBT_STORAGE=delta
+        db.commit()
+    finally:
+        db.close()
+
+    print("\n=== MIGRATION COMPLETE ===")
+
+
+if __name__ == "__main__":
+    run_migration()
@@ -0,0 +1,111 @@
+"""
+Migration: dimension tables with integer surrogate keys
+- Creates dim_salesman, dim_customer, dim_product, dim_branch, dim_channel
+- Adds salesman_id / customer_id / product_id / branch_id / channel_id to sales_data,
+  product_id to product_cost and salesman_id to monthly_targets
+- Backfills the dimensions from the distinct names and the keys in id-range chunks
+- Rebuilds sales_performance_monthly (its joins now use the keys)
+The name columns stay in place (chat SQL, exports, transaction filters use them), so
+sales_data grows by the five key columns: the gain is in GROUP BY / JOIN, not size.
+main.py refuses to start until this has run (dimension_services.missing_dimension_keys).
+Re-run safe: only rows with a NULL key are updated.
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from database import Base, engine, SessionLocal
+from models import DimSalesman, DimCustomer, DimProduct, DimBranch, DimChannel
+from migration_utils import add_column, create_index, run_step
+from dimension_services import SALES_DIMENSIONS
+from summary_services import rebuild_sales_performance
+from sqlalchemy import text
+
+BACKFILL_CHUNK_ROWS = 50000
+
+SALES_KEY_INDEXES = [
+    ("idx_sales_salesman_id_period", "salesman_id, year, month_number"),
+    ("idx_sales_product_id", "product_id"),
+    ("idx_sales_customer_id", "customer_id"),
+]
+
+
+def backfill_sales_keys(conn):
+    """UPDATE ... JOIN per dimension, chunked by primary key to keep transactions small"""
+    max_id = conn.execute(text("SELECT COALESCE(MAX(id), 0) FROM sales_data")).scalar()
+    for key_column, (table, name_column) in SALES_DIMENSIONS.items():
+        print(f"\n[Running] Backfilling sales_data.{key_column}...")
+        start = time.time()
+        for low in range(0, max_id + 1, BACKFILL_CHUNK_ROWS):
+            conn.execute(text(f"""
+                UPDATE sales_data s
+                JOIN {table} d ON d.name = s.{name_column}
+                SET s.{key_column} = d.id
+                WHERE s.id > :low AND s.id <= :high AND s.{key_column} IS NULL
+            """), {"low": low, "high": low + BACKFILL_CHUNK_ROWS})
+            conn.commit()
+        print(f"  ✓ Done ({time.time() - start:.2f}s)")
+
+
+def run_migration():
+    print("=" * 80)
+    print("MIGRATION: Dimension tables with integer surrogate keys")
+    print("=" * 80)
+
+    print("\n[Running] Creating dimension tables...")
+    Base.metadata.create_all(bind=engine, tables=[
+        DimSalesman.__table__, DimCustomer.__table__, DimProduct.__table__,
+        DimBranch.__table__, DimChannel.__table__
+    ])
+    print("  ✓ Done")
+
+    with engine.connect() as conn:
+        for key_column in SALES_DIMENSIONS:
+            add_column(conn, "sales_data", key_column, "INT NULL")
+        add_column(conn, "product_cost", "product_id", "INT NULL")
+        add_column(conn, "monthly_targets", "salesman_id", "INT NULL")
+
+        for table, name_column in SALES_DIMENSIONS.values():
+            run_step(conn, f"Filling {table}",
+                     f"INSERT IGNORE INTO {table} (name) "
+                     f"SELECT DISTINCT {name_column} FROM sales_data WHERE {name_column} IS NOT NULL")
+        run_step(conn, "Filling dim_product from product_cost",
+                 "INSERT IGNORE INTO dim_product (name) SELECT DISTINCT description FROM product_cost")
+        run_step(conn, "Filling dim_salesman from monthly_targets",
+                 "INSERT IGNORE INTO dim_salesman (name) SELECT DISTINCT user_name FROM monthly_targets")
+
+        backfill_sales_keys(conn)
+        run_step(conn, "Backfilling product_cost.product_id", """
+            UPDATE product_cost pc JOIN dim_product d ON d.name = pc.description
+            SET pc.product_id = d.id WHERE pc.product_id IS NULL
+        """)
+        run_step(conn, "Backfilling monthly_targets.salesman_id", """
+            UPDATE monthly_targets mt JOIN dim_salesman d ON d.name = mt.user_name
+            SET mt.salesman_id = d.id WHERE mt.salesman_id IS NULL
+        """)
+
+        for index, columns in SALES_KEY_INDEXES:
+            create_index(conn, "sales_data", index, columns)
+        create_index(conn, "product_cost", "idx_product_cost_product_id", "product_id", unique=True)
+        create_index(conn, "monthly_targets", "idx_targets_salesman_id_period", "salesman_id, year, month_number")
+
+    db = SessionLocal()
+    try:
+        print("\n[Running] Rebuilding sales_performance_monthly on the new keys...")
+        start = time.time()
+        rebuild_sales_performance(db)
+        db.commit()
+        print(f"  ✓ Done ({time.time() - start:.2f}s)")
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+    print("\n=== MIGRATION COMPLETE ===")
+
+
+if __name__ == "__main__":
+    run_migration()
@@ -0,0 +1,37 @@
+"""
+Migration: import batch lineage
+- Creates the import_batches table
+- Adds an indexed import_batch_id to sales_data and ar_aging_report
+- Creates import_batch_preimages (rows an upsert / replace / debt re-import overwrote,
+  restored when the batch is rolled back)
+Existing rows keep import_batch_id = NULL (they predate lineage and cannot be rolled back)
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from database import Base, engine
+from models import ImportBatch, ImportBatchPreimage
+from migration_utils import add_column, create_index
+
+
+def run_migration():
+    print("=" * 80)
+    print("MIGRATION: Import batch lineage")
+    print("=" * 80)
+
+    print("\n[Running] Creating import_batches and import_batch_preimages tables...")
+    Base.metadata.create_all(bind=engine, tables=[ImportBatch.__table__, ImportBatchPreimage.__table__])
+    print("  ✓ Done")
+
+    with engine.connect() as conn:
+        for table, index in [("sales_data", "ix_sales_data_import_batch_id"), ("ar_aging_report", "ix_ar_aging_report_import_batch_id")]:
+            add_column(conn, table, "import_batch_id", "VARCHAR(36) NULL")
+            create_index(conn, table, index, "import_batch_id")
+
+    print("\n=== MIGRATION COMPLETE ===")
+
+
+if __name__ == "__main__":
+    run_migration()
@@ -0,0 +1,61 @@
+"""
+Migration: typed DATE report_date for the AR tables
+Converts ar_aging_report.report_date, ar_snapshot_summary.report_date and
+ar_snapshots.report_date / checkpoint_date from YYYY-MM-DD strings to DATE, so
+latest-snapshot and trend lookups are DATE range scans on the existing indexes.
+Aborts (changing nothing) if any value is not a valid YYYY-MM-DD date.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from database import engine
+from migration_utils import run_step, table_exists
+from sqlalchemy import text
+
+# (table, column, NULL / NOT NULL)
+DATE_COLUMNS = [
+    ("ar_aging_report", "report_date", "NOT NULL"),
+    ("ar_snapshot_summary", "report_date", "NOT NULL"),
+    ("ar_snapshots", "report_date", "NOT NULL"),
+    ("ar_snapshots", "checkpoint_date", "NOT NULL"),
+]
+
+
+def invalid_values(conn, table: str, column: str):
+    return conn.execute(text(f"""
+        SELECT DISTINCT {column} FROM {table}
+        WHERE {column} IS NULL
+           OR CAST({column} AS CHAR) NOT REGEXP '^[0-9]{{4}}-[0-9]{{2}}-[0-9]{{2}}$'
+           OR STR_TO_DATE(CAST({column} AS CHAR), '%Y-%m-%d') IS NULL
+        LIMIT 20
+    """)).fetchall()
+
+
+def run_migration():
+    print("=" * 80)
+    print("MIGRATION: AR report_date -> DATE")
+    print("=" * 80)
+
+    with engine.connect() as conn:
+        columns = [c for c in DATE_COLUMNS if table_exists(conn, c[0])]
+
+        print("\n[Checking] report_date values...")
+        for table, column, _ in columns:
+            bad = invalid_values(conn, table, column)
+            if bad:
+                print(f"  ✗ {table}.{column} has values that are not YYYY-MM-DD dates: {[r[0] for r in bad]}")
+                print("  Fix or delete these rows, then re-run. Nothing was changed.")
+                return
+        print("  ✓ All values are valid dates")
+
+        for table, column, nullability in columns:
+            run_step(conn, f"Converting {table}.{column} to DATE",
+                     f"ALTER TABLE {table} MODIFY {column} DATE {nullability}")
+
+    print("\n=== MIGRATION COMPLETE ===")
+
+
+if __name__ == "__main__":
+    run_migration()
@@ -0,0 +1,68 @@
+"""
+Migration: sales_data.row_hash for change detection on re-imports
+- Adds row_hash BIGINT (64-bit content hash of the SAP line)
+- Converts the billing keys to VARCHAR and ensures the unique
+  (billing_document, billing_item) index used by upserts
+  (run cleanup_duplicates.py first if the index cannot be created)
+- Backfills hashes for existing rows in id-ordered chunks
+"""
+import os
+import sys
+import pandas as pd
+from sqlalchemy import text
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from database import engine
+from migration_utils import add_column, create_index, run_step
+from import_services import compute_row_hash, ROW_HASH_COLUMNS
+
+BACKFILL_CHUNK = 50000
+
+
+def backfill_row_hash(conn):
+    print("\n[Backfill] Computing row_hash for existing rows...")
+    last_id = 0
+    total = 0
+    cols = ", ".join(ROW_HASH_COLUMNS)
+    while True:
+        chunk = pd.read_sql(
+            text(f"""
+                SELECT id, {cols} FROM sales_data
+                WHERE id > :last_id AND row_hash IS NULL
+                ORDER BY id
+                LIMIT {BACKFILL_CHUNK}
+            """),
+            conn, params={"last_id": last_id}
+        )
+        if chunk.empty:
+            break
+        chunk['row_hash'] = compute_row_hash(chunk)
+        conn.execute(
+            text("UPDATE sales_data SET row_hash = :row_hash WHERE id = :id"),
+            [{"id": int(i), "row_hash": int(h)} for i, h in zip(chunk['id'], chunk['row_hash'])]
+        )
+        conn.commit()
+        last_id = int(chunk['id'].max())
+        total += len(chunk)
+        print(f"  ✓ {total:,} rows hashed (last id {last_id})")
+
+
+def run_migration():
+    print("=" * 80)
+    print("MIGRATION: sales_data.row_hash")
+    print("=" * 80)
+
+    with engine.connect() as conn:
+        add_column(conn, "sales_data", "row_hash", "BIGINT NULL")
+        run_step(conn, "Converting billing keys to VARCHAR",
+                 "ALTER TABLE sales_data MODIFY billing_document VARCHAR(50), MODIFY billing_item VARCHAR(20)")
+        create_index(conn, "sales_data", "idx_sales_unique_transaction",
+                     "billing_document, billing_item", unique=True)
+        backfill_row_hash(conn)
+
+    print("\n=== MIGRATION COMPLETE ===")
+
+
+if __name__ == "__main__":
+    run_migration()
@@ -0,0 +1,46 @@
+"""
+Migration: materialize view_sales_performance_v2
+Creates sales_performance_monthly (same columns as the view) and fills it with a
+full rebuild. After this, imports / target / COGS uploads keep it up to date.
+Re-run at any time to repair the table from sales_data.
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from database import Base, engine, SessionLocal
+from models import SalesPerformance
+from summary_services import rebuild_sales_performance, PERFORMANCE_TABLE
+from sqlalchemy import text
+
+
+def run_migration():
+    print("=" * 80)
+    print(f"MIGRATION: {PERFORMANCE_TABLE}")
+    print("=" * 80)
+
+    print(f"\n[Running] Creating {PERFORMANCE_TABLE}...")
+    Base.metadata.create_all(bind=engine, tables=[SalesPerformance.__table__])
+    print("  ✓ Done")
+
+    db = SessionLocal()
+    try:
+        print("\n[Running] Full rebuild from sales_data...")
+        start = time.time()
+        rebuild_sales_performance(db)
+        db.commit()
+        count = db.execute(text(f"SELECT COUNT(*) FROM {PERFORMANCE_TABLE}")).scalar()
+        print(f"  ✓ {count:,} rows ({time.time() - start:.2f}s)")
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+    print("\n=== MIGRATION COMPLETE ===")
+
+
+if __name__ == "__main__":
+    run_migration()
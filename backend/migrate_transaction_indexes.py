@@ -0,0 +1,40 @@
+"""
+Migration: indexes for the keyset-paginated transaction drill-down
+- Converts billing_date to VARCHAR(10) (older schemas created it as TEXT, which cannot be indexed)
+- Adds (filter column, billing_date) indexes; InnoDB appends the primary key, so each
+  index covers the (billing_date, id) keyset and the page-of-ids subquery
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from database import engine
+from migration_utils import create_index, run_step
+
+TRANSACTION_INDEXES = [
+    ("idx_sales_billing_date", "billing_date"),
+    ("idx_sales_dist_date", "dist, billing_date"),
+    ("idx_sales_branch_date", "branch, billing_date"),
+    ("idx_sales_salesman_date", "salesman_name, billing_date"),
+    ("idx_sales_product_date", "description, billing_date"),
+    ("idx_sales_customer_date", "customer_name, billing_date"),
+]
+
+
+def run_migration():
+    print("=" * 80)
+    print("MIGRATION: Transaction drill-down indexes")
+    print("=" * 80)
+
+    with engine.connect() as conn:
+        run_step(conn, "Converting billing_date to VARCHAR(10)",
+                 "ALTER TABLE sales_data MODIFY billing_date VARCHAR(10) NULL")
+        for index, columns in TRANSACTION_INDEXES:
+            create_index(conn, "sales_data", index, columns)
+
+    print("\n=== MIGRATION COMPLETE ===")
+
+
+if __name__ == "__main__":
+    run_migration()
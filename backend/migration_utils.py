@@ -0,0 +1,53 @@
+"""
+Idempotent schema helpers for MySQL migration scripts
+Each helper checks information_schema / SHOW INDEX first so scripts can be re-run safely
+"""
+import time
+from sqlalchemy import text
+
+
+def column_exists(conn, table: str, column: str) -> bool:
+    result = conn.execute(text("""
+        SELECT 1 FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table AND COLUMN_NAME = :column
+    """), {"table": table, "column": column}).fetchone()
+    return result is not None
+
+
+def index_exists(conn, table: str, index: str) -> bool:
+    result = conn.execute(text(f"SHOW INDEX FROM {table} WHERE Key_name = :index"), {"index": index}).fetchone()
+    return result is not None
+
+
+def table_exists(conn, table: str) -> bool:
+    result = conn.execute(text("""
+        SELECT 1 FROM information_schema.TABLES
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table
+    """), {"table": table}).fetchone()
+    return result is not None
+
+
+def run_step(conn, desc: str, sql: str):
+    """Execute one DDL/DML statement with timing output"""
+    print(f"\n[Running] {desc}...")
+    start = time.time()
+    conn.execute(text(sql))
+    conn.commit()
+    print(f"  ✓ Done ({time.time() - start:.2f}s)")
+
+
+def add_column(conn, table: str, column: str, definition: str):
+    """ALTER TABLE ... ADD COLUMN unless the column already exists"""
+    if column_exists(conn, table, column):
+        print(f"  ⚠ Column {table}.{column} already exists. Skipped.")
+        return
+    run_step(conn, f"Adding {table}.{column}", f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+
+def create_index(conn, table: str, index: str, columns: str, unique: bool = False):
+    """CREATE [UNIQUE] INDEX unless an index with that name already exists"""
+    if index_exists(conn, table, index):
+        print(f"  ⚠ Index {index} already exists. Skipped.")
+        return
+    kind = "UNIQUE INDEX" if unique else "INDEX"
+    run_step(conn, f"Indexing {table}({columns})", f"CREATE {kind} {index} ON {table}({columns})")
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Text
+from sqlalchemy import Column, Integer, BigInteger, String, Float, Date, DateTime, Text, Index, Computed
 from datetime import datetime
 from database import Base
 
@@ -19,6 +19,18 @@ class SalesData(Base):
     net_value = Column(Float, nullable=True) # Revenue
     profit = Column(Float, nullable=True)
     marketing_spend = Column(Float, nullable=True)
+    billing_document = Column(String(50), nullable=True)
+    billing_item = Column(String(20), nullable=True)
+    material_code = Column(String(100), nullable=True)
+    billing_date = Column(String(10), nullable=True) # YYYY-MM-DD
+    row_hash = Column(BigInteger, nullable=True) # Content hash of the SAP line (change detection)
+    import_batch_id = Column(String(36), nullable=True, index=True) # Lineage: batch that wrote the row
+    # Integer surrogate keys (dimension tables); aggregates group/join on these
+    salesman_id = Column(Integer, nullable=True)
+    customer_id = Column(Integer, nullable=True)
+    product_id = Column(Integer, nullable=True)
+    branch_id = Column(Integer, nullable=True)
+    channel_id = Column(Integer, nullable=True)
 
 
 class ChatHistory(Base):
@@ -35,6 +47,7 @@ class ProductCost(Base):
     id = Column(Integer, primary_key=True, index=True)
     description = Column(String, unique=True, index=True, nullable=False)
     cogs = Column(Float, nullable=False)
+    product_id = Column(Integer, nullable=True, unique=True) # dim_product key
 
 class SalesTarget(Base):
     __tablename__ = "sales_target"
@@ -50,6 +63,7 @@ class MonthlyTarget(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     user_name = Column(String, index=True, nullable=False)
+    salesman_id = Column(Integer, nullable=True) # dim_salesman key
     year = Column(Integer, nullable=False)
     month_number = Column(Integer, nullable=False)
     target_amount = Column(Float, nullable=False)
@@ -59,7 +73,7 @@ class ARAgingReport(Base):
     __tablename__ = "ar_aging_report"
 
     id = Column(Integer, primary_key=True, index=True)
-    report_date = Column(String, nullable=False, index=True)  # YYYY-MM-DD format
+    report_date = Column(Date, nullable=False, index=True)
     salesman_name = Column(String, nullable=True)
     customer_name = Column(String, nullable=False)
     customer_code = Column(String, nullable=False, index=True)
@@ -72,3 +86,167 @@ class ARAgingReport(Base):
     debt_91_120 = Column(Float, default=0)
     debt_121_180 = Column(Float, default=0)
     debt_over_180 = Column(Float, default=0)
+    import_batch_id = Column(String(36), nullable=True, index=True) # Lineage: batch that wrote the row
+    # > 60 days, stored generated column (top debtors sort / filter without per-row math)
+    overdue_debt = Column(Float, Computed("debt_61_90 + debt_91_120 + debt_121_180 + debt_over_180", persisted=True))
+    is_removed = Column(Integer, nullable=False, default=0) # Delta storage tombstone (debt_storage_services)
+
+    __table_args__ = (
+        Index("idx_ar_date_customer", "report_date", "customer_code"),
+        # Top-N by total_debt within a snapshot (optionally per channel / salesman): backward index scan, no filesort
+        Index("idx_ar_date_debt", "report_date", "total_debt"),
+        Index("idx_ar_date_channel_debt", "report_date", "channel", "total_debt"),
+        Index("idx_ar_date_salesman_debt", "report_date", "salesman_name", "total_debt"),
+    )
+
+class ARSnapshot(Base):
+    """How each AR report_date is stored: 'full' or 'delta' since checkpoint_date (debt_storage_services)"""
+    __tablename__ = "ar_snapshots"
+
+    report_date = Column(Date, primary_key=True)
+    storage = Column(String(10), nullable=False, default="full")
+    checkpoint_date = Column(Date, nullable=False, index=True)
+    batch_id = Column(String(36), nullable=True)
+    rows_total = Column(Integer, default=0)
+    rows_stored = Column(Integer, default=0)
+
+class ARAgingLatest(Base):
+    """Full copy of the latest AR snapshot in delta storage mode, for chat SQL (summary_services)"""
+    __tablename__ = "ar_aging_latest"
+
+    id = Column(Integer, primary_key=True, index=True)
+    report_date = Column(Date, nullable=False)
+    salesman_name = Column(String(255), nullable=True)
+    customer_name = Column(String(255), nullable=False)
+    customer_code = Column(String(50), nullable=False)
+    channel = Column(String(50), nullable=False)
+    total_debt = Column(Float, default=0)
+    total_realization = Column(Float, default=0)
+    debt_1_30 = Column(Float, default=0)
+    debt_31_60 = Column(Float, default=0)
+    debt_61_90 = Column(Float, default=0)
+    debt_91_120 = Column(Float, default=0)
+    debt_121_180 = Column(Float, default=0)
+    debt_over_180 = Column(Float, default=0)
+    overdue_debt = Column(Float, default=0)
+
+class ARSnapshotSummary(Base):
+    """Per-(report_date, channel, salesman) AR totals, written with each debt import (summary_services)"""
+    __tablename__ = "ar_snapshot_summary"
+
+    id = Column(Integer, primary_key=True, index=True)
+    report_date = Column(Date, nullable=False)
+    channel = Column(String(50), nullable=False)
+    salesman_name = Column(String(255), nullable=True)
+    customer_count = Column(Integer, default=0)
+    total_debt = Column(Float, default=0)
+    total_realization = Column(Float, default=0)
+    debt_1_30 = Column(Float, default=0)
+    debt_31_60 = Column(Float, default=0)
+    debt_61_90 = Column(Float, default=0)
+    debt_91_120 = Column(Float, default=0)
+    debt_121_180 = Column(Float, default=0)
+    debt_over_180 = Column(Float, default=0)
+
+    __table_args__ = (
+        Index("idx_ar_summary_date_channel", "report_date", "channel"),
+        Index("idx_ar_summary_channel_date", "channel", "report_date"),
+    )
+
+class ImportBatch(Base):
+    __tablename__ = "import_batches"
+
+    id = Column(String(36), primary_key=True) # UUID
+    kind = Column(String(20), nullable=False) # 'sales' or 'debt'
+    filename = Column(String(255), nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    rows_written = Column(Integer, default=0)
+    status = Column(String(20), default="active") # 'active' or 'rolled_back'
+
+class ImportBatchPreimage(Base):
+    """Previous version of rows an import overwrote or deleted, restored on rollback (batch_services)"""
+    __tablename__ = "import_batch_preimages"
+
+    id = Column(Integer, primary_key=True)
+    batch_id = Column(String(36), nullable=False, index=True)
+    table_name = Column(String(64), nullable=False) # 'sales_data', 'ar_aging_report' or 'ar_snapshots'
+    row_data = Column(Text, nullable=False) # JSON object of the row's columns
+
+class SalesPerformance(Base):
+    """Materialized view_sales_performance_v2 (maintained by summary_services)"""
+    __tablename__ = "sales_performance_monthly"
+    __table_args__ = (
+        Index("idx_perf_cell", "salesman_name", "year", "month_number", unique=True),
+        Index("idx_perf_year_month", "year", "month_number"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    salesman_name = Column(String(255), nullable=True)
+    year = Column(Integer, nullable=False)
+    month_number = Column(Integer, nullable=False)
+    semester = Column(Integer, nullable=False)
+    total_revenue = Column(Float, default=0)
+    total_profit = Column(Float, default=0)
+    total_target = Column(Float, default=0)
+    achievement_percentage = Column(Float, default=0)
+
+
+# --- Dimension tables (integer surrogate keys for sales_data) ---
+
+class DimSalesman(Base):
+    __tablename__ = "dim_salesman"
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String(255), unique=True, nullable=False)
+
+class DimCustomer(Base):
+    __tablename__ = "dim_customer"
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String(255), unique=True, nullable=False)
+
+class DimProduct(Base):
+    __tablename__ = "dim_product"
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String(255), unique=True, nullable=False)
+
+class DimBranch(Base):
+    __tablename__ = "dim_branch"
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String(255), unique=True, nullable=False)
+
+class DimChannel(Base):
+    __tablename__ = "dim_channel"
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String(255), unique=True, nullable=False)
+
+class CustomerKeyMap(Base):
+    """AR customer_code -> dim_customer key (built at debt import, dimension_services)"""
+    __tablename__ = "customer_key_map"
+
+    customer_code = Column(String(50), primary_key=True)
+    customer_id = Column(Integer, nullable=False, index=True)
+
+class CustomerTrailingRevenue(Base):
+    """Trailing-window sales revenue per dim_customer key (summary_services)"""
+    __tablename__ = "customer_trailing_revenue"
+
+    customer_id = Column(Integer, primary_key=True)
+    revenue = Column(Float, default=0)
+    as_of = Column(Date, nullable=False)
+
+class ChatSqlCache(Base):
+    """Generated chat SQL per normalized question (chat_cache_services)"""
+    __tablename__ = "chat_sql_cache"
+
+    question_key = Column(String(64), primary_key=True) # sha256 of the normalized question
+    question = Column(Text, nullable=False)
+    schema_hash = Column(String(64), nullable=False)
+    sql_query = Column(Text, nullable=False)
+    generation_ms = Column(Float, default=0)
+    hits = Column(Integer, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    last_used_at = Column(DateTime, default=datetime.utcnow, index=True)
@@ -0,0 +1,204 @@
+"""
+Target Attainment Projections (Monte Carlo)
+Simulates the remaining months of a semester for every salesman at once by
+bootstrapping each person's own monthly revenue history, then reports the
+probability of reaching the semester target and percentile bands.
+
+The simulation is the (salesmen x simulations x months) draw, accumulated one
+month at a time into a (salesmen x simulations) float32 total so memory stays
+at one month's slice (500 x 10k x 6 would otherwise be 120 MB).
+
+Results are cached per (year, semester, simulations) until data_version changes.
+"""
+import threading
+import time
+from typing import Dict, Any
+import numpy as np
+from sqlalchemy.orm import Session
+from sqlalchemy import text
+from data_version import current_version
+from query_builder import SEMESTER_MONTHS
+
+DEFAULT_SIMULATIONS = 10000
+MAX_SIMULATIONS = 50000
+# Monthly history used for the bootstrap (trailing months up to the last actual month)
+HISTORY_MONTHS = 24
+PERCENTILES = (10, 50, 90)
+SEED = 42
+
+_cache_lock = threading.Lock()
+_projection_cache: Dict[tuple, Dict[str, Any]] = {}
+_cache_version = None
+
+
+def simulate_totals(history: np.ndarray, n_valid: np.ndarray, actual: np.ndarray,
+                    remaining_months: int, simulations: int, seed: int = SEED) -> np.ndarray:
+    """
+    Bootstrap remaining-month revenue for every salesman in one vectorized pass
+
+    Args:
+        history: (salesmen x HISTORY) monthly revenue, right-aligned (last column = latest month)
+        n_valid: Months of history per salesman (the trailing n_valid columns are sampled)
+        actual: Semester-to-date revenue per salesman
+        remaining_months: Months left in the semester
+        simulations: Simulated paths per salesman
+
+    Returns:
+        (salesmen x simulations) float32 projected semester totals
+    """
+    n_salesmen, n_history = history.shape
+    rng = np.random.default_rng(seed)
+    totals = np.repeat(actual.astype(np.float32)[:, None], simulations, axis=1)
+    if remaining_months == 0 or n_salesmen == 0:
+        return totals
+
+    # Salesmen without history draw from an all-zero row (projection = actual)
+    history = np.where((n_valid > 0)[:, None], history, 0).astype(np.float32).ravel()
+    span = np.maximum(n_valid, 1).astype(np.float32)[:, None]
+    # Flat index of each salesman's first sampled month
+    base = (np.arange(n_salesmen) * n_history + n_history - np.maximum(n_valid, 1)).astype(np.int32)[:, None]
+
+    offsets = np.empty((n_salesmen, simulations), dtype=np.int32)
+    for _ in range(remaining_months):
+        np.multiply(rng.random((n_salesmen, simulations), dtype=np.float32), span, out=offsets, casting='unsafe')
+        offsets += base
+        totals += history.take(offsets)
+
+    return totals
+
+
+def _latest_period(db: Session):
+    row = db.execute(text("""
+        SELECT year, MAX(month_number)
+        FROM sales_performance_monthly
+        WHERE year = (SELECT MAX(year) FROM sales_performance_monthly)
+        GROUP BY year
+    """)).fetchone()
+    if not row or row[0] is None:
+        return None
+    return int(row[0]), int(row[1])
+
+
+def _load_inputs(db: Session, year: int, semester: int, last_year: int, last_month: int):
+    """History matrix, semester-to-date actuals and semester targets per salesman"""
+    last_period = last_year * 12 + last_month - 1
+    first_history = last_period - HISTORY_MONTHS + 1
+    month_from, month_to = SEMESTER_MONTHS[semester]
+
+    history_rows = db.execute(text("""
+        SELECT salesman_name, year, month_number, total_revenue
+        FROM sales_performance_monthly
+        WHERE salesman_name IS NOT NULL
+          AND (year BETWEEN :first_year AND :last_year OR year = :year)
+    """), {"first_year": first_history // 12, "last_year": last_year, "year": year}).fetchall()
+
+    target_rows = db.execute(text("""
+        SELECT user_name, SUM(target_amount)
+        FROM monthly_targets
+        WHERE year = :year AND month_number BETWEEN :month_from AND :month_to
+        GROUP BY user_name
+    """), {"year": year, "month_from": month_from, "month_to": month_to}).fetchall()
+
+    targets = {r[0]: float(r[1] or 0) for r in target_rows if r[0]}
+    names = sorted({r[0] for r in history_rows} | set(targets))
+    index = {name: i for i, name in enumerate(names)}
+
+    history = np.zeros((len(names), HISTORY_MONTHS), dtype=np.float32)
+    first_seen = np.full(len(names), HISTORY_MONTHS, dtype=np.int64)
+    actual = np.zeros(len(names))
+
+    for name, row_year, row_month, revenue in history_rows:
+        i = index[name]
+        if int(row_year) == year and month_from <= int(row_month) <= month_to:
+            actual[i] += float(revenue or 0)
+        col = int(row_year) * 12 + int(row_month) - 1 - first_history
+        if 0 <= col < HISTORY_MONTHS:
+            history[i, col] = float(revenue or 0)
+            first_seen[i] = min(first_seen[i], col)
+
+    # Sample from each salesman's first active month onwards (zeros after that are real misses)
+    n_valid = HISTORY_MONTHS - first_seen
+    target = np.array([targets.get(name, 0.0) for name in names])
+    return names, history, n_valid, actual, target
+
+
+def get_target_projection(db: Session, year: int = None, semester: int = None,
+                          simulations: int = DEFAULT_SIMULATIONS) -> Dict[str, Any]:
+    """
+    Probability of each salesman reaching the semester target
+
+    Args:
+        year, semester: Semester to project (defaults to the semester of the latest data)
+        simulations: Monte Carlo paths per salesman (capped at MAX_SIMULATIONS)
+
+    Returns:
+        Dict with the projection per salesman (actual, target, probability, P10/P50/P90),
+        sorted by probability ascending so likely misses come first
+    """
+    global _cache_version
+    latest = _latest_period(db)
+    if latest is None:
+        return {"status": "info", "message": "No sales data", "data": []}
+
+    last_year, last_month = latest
+    if year is None:
+        year = last_year
+    if semester is None:
+        if year == last_year:
+            semester = 1 if last_month <= 6 else 2
+        else:
+            semester = 2 if year < last_year else 1
+    if semester not in SEMESTER_MONTHS:
+        raise ValueError(f"Invalid semester: {semester}")
+    simulations = max(100, min(int(simulations), MAX_SIMULATIONS))
+
+    version = current_version()
+    key = (year, semester, simulations)
+    with _cache_lock:
+        if _cache_version != version:
+            _projection_cache.clear()
+            _cache_version = version
+        if key in _projection_cache:
+            return _projection_cache[key]
+
+    # Months of the semester that have not happened yet (relative to the latest data)
+    month_from, month_to = SEMESTER_MONTHS[semester]
+    last_period = last_year * 12 + last_month - 1
+    remaining = sum(1 for m in range(month_from, month_to + 1) if year * 12 + m - 1 > last_period)
+
+    names, history, n_valid, actual, target = _load_inputs(db, year, semester, last_year, last_month)
+
+    start = time.perf_counter()
+    totals = simulate_totals(history, n_valid, actual, remaining, simulations)
+    bands = np.percentile(totals, PERCENTILES, axis=1)
+    probability = np.where(target > 0, (totals >= target[:, None].astype(np.float32)).mean(axis=1), np.nan)
+    simulation_ms = round((time.perf_counter() - start) * 1000, 1)
+
+    data = []
+    for i, name in enumerate(names):
+        data.append({
+            "name": name,
+            "actual": float(actual[i]),
+            "target": float(target[i]),
+            "history_months": int(n_valid[i]),
+            "probability": None if np.isnan(probability[i]) else round(float(probability[i]) * 100, 1),
+            **{f"p{p}": float(bands[j, i]) for j, p in enumerate(PERCENTILES)}
+        })
+    data.sort(key=lambda d: (d["probability"] is None, d["probability"] or 0))
+
+    result = {
+        "status": "success",
+        "year": year,
+        "semester": semester,
+        "last_actual": {"year": last_year, "month": last_month},
+        "remaining_months": remaining,
+        "simulations": simulations,
+        "simulation_ms": simulation_ms,
+        "data": data
+    }
+    print(f"Projection: {len(names)} salesmen x {simulations} sims x {remaining} months in {simulation_ms} ms")
+
+    with _cache_lock:
+        if _cache_version == version:
+            _projection_cache[key] = result
+    return result
@@ -0,0 +1,117 @@
+"""
+Sargable Filter Compilation
+Builds index-friendly WHERE clauses for the analytics queries instead of the
+catch-all `(:param IS NULL OR col = :param)` / `CASE WHEN month_number <= 6` forms,
+which stop MySQL from using idx_sales_year_month.
+
+Only the filters that are actually set are emitted, semesters become month ranges,
+and each specialised statement is compiled once and cached.
+"""
+from functools import lru_cache
+from typing import Dict, Any, Tuple
+from sqlalchemy import text
+from sqlalchemy.sql.elements import TextClause
+
+# Semester -> inclusive month_number range
+SEMESTER_MONTHS = {
+    1: (1, 6),
+    2: (7, 12)
+}
+
+# Equality filters accepted by build_filters (keyword -> column)
+EQUALITY_COLUMNS = {
+    'channel': 'dist',
+    'branch': 'branch',
+    'salesman': 'salesman_name',
+    'product': 'description',
+    'customer': 'customer_name'
+}
+
+
+@lru_cache(maxsize=512)
+def compile_sql(sql: str) -> TextClause:
+    """Compile a specialised statement once; repeated filter combinations hit the cache"""
+    return text(sql)
+
+
+def build_filters(alias: str = None, year: int = None, semester: int = None, month: int = None,
+                  **equals) -> Tuple[str, Dict[str, Any]]:
+    """
+    Build a sargable WHERE body for the given filters
+
+    Args:
+        alias: Table alias to prefix columns with (e.g. 'sd')
+        year, semester, month: Period filters; semester is rewritten to a month_number range
+        **equals: Optional equality filters keyed as in EQUALITY_COLUMNS (channel, salesman, ...)
+
+    Returns:
+        (where_sql, params) - where_sql is '1=1' when no filter is set
+    """
+    prefix = f"{alias}." if alias else ""
+    clauses = []
+    params = {}
+
+    if year is not None:
+        clauses.append(f"{prefix}year = :year")
+        params['year'] = year
+
+    if month is not None:
+        clauses.append(f"{prefix}month_number = :month")
+        params['month'] = month
+    elif semester is not None:
+        if semester not in SEMESTER_MONTHS:
+            raise ValueError(f"Invalid semester: {semester}")
+        clauses.append(f"{prefix}month_number BETWEEN :month_from AND :month_to")
+        params['month_from'], params['month_to'] = SEMESTER_MONTHS[semester]
+
+    for key, value in equals.items():
+        if value is None:
+            continue
+        if key not in EQUALITY_COLUMNS:
+            raise ValueError(f"Unknown filter: {key}")
+        clauses.append(f"{prefix}{EQUALITY_COLUMNS[key]} = :{key}")
+        params[key] = value
+
+    return (" AND ".join(clauses) if clauses else "1=1"), params
+
+
+def filtered_query(template: str, alias: str = None, **filters) -> Tuple[TextClause, Dict[str, Any]]:
+    """
+    Fill the {where} placeholder of a query template with sargable filters
+
+    Usage:
+        query, params = filtered_query(
+            "SELECT ... FROM sales_data sd WHERE {where} GROUP BY ...",
+            alias='sd', year=year, semester=semester
+        )
+        db.execute(query, params)
+    """
+    where, params = build_filters(alias, **filters)
+    return compile_sql(template.format(where=where)), params
+
+
+def period_date_range(year: int = None, semester: int = None, month: int = None) -> Tuple[str, str]:
+    """
+    Translate a year / semester / month filter into a half-open billing_date range
+
+    Returns:
+        ('YYYY-MM-DD' inclusive start, 'YYYY-MM-DD' exclusive end), or (None, None) without any filter
+
+    Raises:
+        ValueError: When month / semester is given without a year, or the semester is invalid
+    """
+    if year is None:
+        if month is not None or semester is not None:
+            raise ValueError("A month or semester filter requires a year")
+        return None, None
+    if month is not None:
+        month_from = month_to = month
+    elif semester is not None:
+        if semester not in SEMESTER_MONTHS:
+            raise ValueError(f"Invalid semester: {semester}")
+        month_from, month_to = SEMESTER_MONTHS[semester]
+    else:
+        month_from, month_to = 1, 12
+
+    end_year, end_month = (year + 1, 1) if month_to == 12 else (year, month_to + 1)
+    return f"{year:04d}-{month_from:02d}-01", f"{end_year:04d}-{end_month:02d}-01"
@@ -0,0 +1,117 @@
+"""
+Salesman Collection Scorecard
+Revenue and target attainment (sales_performance_monthly) side by side with
+outstanding, overdue and collected debt (ar_snapshot_summary) per salesman.
+
+Two indexed aggregate queries - one per summary table - merged on a normalized
+salesman name (case-folded, whitespace collapsed), since the sales file and the
+ZRFI005 debt export spell names independently; no per-salesman queries.
+"""
+from typing import Dict, Any, Union
+from datetime import date
+from sqlalchemy.orm import Session
+from sqlalchemy import text
+from query_builder import SEMESTER_MONTHS
+from summary_services import PERFORMANCE_TABLE, AR_SUMMARY_TABLE
+from debt_services import get_latest_report_date, parse_report_date
+
+EMPTY_SALES = {"revenue": 0.0, "target": 0.0}
+EMPTY_DEBT = {"outstanding": 0.0, "collected": 0.0, "overdue": 0.0, "bad_debt": 0.0}
+
+
+def salesman_key(name: str) -> str:
+    """Merge key of a salesman name: ' Nguyễn  Văn A ' and 'NGUYỄN VĂN A' match"""
+    return " ".join(str(name).split()).casefold()
+
+
+def _merge_by_key(rows, empty: Dict[str, float]) -> Dict[str, Dict[str, Any]]:
+    """Sum (name, totals) rows whose names share a salesman_key; keeps the first spelling"""
+    merged = {}
+    for name, totals in rows:
+        entry = merged.setdefault(salesman_key(name), {"name": " ".join(str(name).split()), **empty})
+        for field, value in totals.items():
+            entry[field] += value
+    return merged
+
+
+def _sales_by_salesman(db: Session, year: int, semester: int = None) -> Dict[str, Dict[str, Any]]:
+    """Revenue / target per salesman_key over idx_perf_year_month"""
+    month_from, month_to = SEMESTER_MONTHS[semester] if semester else (1, 12)
+    rows = db.execute(text(f"""
+        SELECT salesman_name, SUM(total_revenue), SUM(total_target)
+        FROM {PERFORMANCE_TABLE}
+        WHERE year = :year AND month_number BETWEEN :month_from AND :month_to
+          AND salesman_name IS NOT NULL
+        GROUP BY salesman_name
+    """), {"year": year, "month_from": month_from, "month_to": month_to}).fetchall()
+    return _merge_by_key(
+        ((r[0], {"revenue": float(r[1] or 0), "target": float(r[2] or 0)}) for r in rows if r[0] and r[0].strip()),
+        EMPTY_SALES
+    )
+
+
+def _debt_by_salesman(db: Session, report_date: date) -> Dict[str, Dict[str, Any]]:
+    """AR totals per salesman_key for one snapshot over idx_ar_summary_date_channel"""
+    rows = db.execute(text(f"""
+        SELECT
+            salesman_name,
+            SUM(total_debt),
+            SUM(total_realization),
+            SUM(debt_61_90 + debt_91_120 + debt_121_180 + debt_over_180),
+            SUM(debt_over_180)
+        FROM {AR_SUMMARY_TABLE}
+        WHERE report_date = :report_date
+        GROUP BY salesman_name
+    """), {"report_date": report_date}).fetchall()
+    return _merge_by_key(
+        ((r[0], {"outstanding": float(r[1] or 0), "collected": float(r[2] or 0),
+                 "overdue": float(r[3] or 0), "bad_debt": float(r[4] or 0)})
+         for r in rows if r[0] and r[0].strip()),
+        EMPTY_DEBT
+    )
+
+
+def get_salesman_scorecard(db: Session, year: int, semester: int = None,
+                           report_date: Union[str, date] = None) -> Dict[str, Any]:
+    """
+    Per-salesman revenue, attainment, outstanding / overdue debt and collection rate
+
+    Args:
+        year: Sales year
+        semester: 1, 2 or None (whole year)
+        report_date: AR snapshot (default: latest)
+
+    Returns:
+        Dict with year, semester, report_date and scorecard rows (largest revenue first)
+
+    Raises:
+        ValueError: On a malformed report_date
+    """
+    report_date = parse_report_date(report_date) or get_latest_report_date(db)
+
+    sales = _sales_by_salesman(db, year, semester)
+    debt = _debt_by_salesman(db, report_date) if report_date else {}
+
+    scorecard = []
+    for key in sales.keys() | debt.keys():
+        s = sales.get(key, EMPTY_SALES)
+        d = debt.get(key, EMPTY_DEBT)
+        scorecard.append({
+            "salesman": s.get("name") or d["name"],  # sales spelling when both exist
+            "revenue": s["revenue"],
+            "target": s["target"],
+            "attainment": round(s["revenue"] / s["target"] * 100, 1) if s["target"] > 0 else 0,
+            "outstanding": d["outstanding"],
+            "overdue": d["overdue"],
+            "bad_debt": d["bad_debt"],
+            "collected": d["collected"],
+            "collection_rate": round(d["collected"] / d["outstanding"] * 100, 1) if d["outstanding"] > 0 else 0
+        })
+    scorecard.sort(key=lambda row: (-row["revenue"], -row["outstanding"], row["salesman"]))
+
+    return {
+        "year": year,
+        "semester": semester,
+        "report_date": report_date,
+        "data": scorecard
+    }
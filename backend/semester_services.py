@@ -18,7 +18,7 @@ def get_performance_by_semester(db: Session, year: int):
                 SUM(total_profit) as profit,
                 MAX(total_target) as target,
                 AVG(achievement_percentage) as achievement
-            FROM view_sales_performance_v2
+            FROM sales_performance_monthly
             WHERE year = :year
             GROUP BY salesman_name, semester
             ORDER BY salesman_name, semester
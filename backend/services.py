@@ -3,11 +3,21 @@ import io
 from dotenv import load_dotenv
 import os
 import traceback
+import time
 import re
 from sqlalchemy.orm import Session
 from sqlalchemy import text
 import google.generativeai as genai
 from models import SalesData, SalesTarget, ProductCost, ChatHistory
+from file_readers import read_table, read_table_any, to_numeric_column
+from query_builder import filtered_query, SEMESTER_MONTHS
+from summary_services import refresh_performance_profit, refresh_performance_targets
+import columnar_cache
+from dimension_services import sync_product_cost_keys, sync_target_keys
+import analytics_mirror
+import chat_cache_services
+from data_version import current_version
+from debt_storage_services import delta_enabled
 
 # --- CONFIGURATION ---
 load_dotenv()
@@ -52,8 +62,8 @@ You are a SQL Expert querying a MySQL database 'ai_command_center'.
 - description (TEXT): Product Name.
 - cogs (REAL): Cost of Goods Sold.
 
---- VIEW: view_sales_performance_v2 (PRE-CALCULATED Performance Metrics) ---
-**Type:** SQLite View (Read-Only, Optimized with JOINs)
+--- TABLE: sales_performance_monthly (PRE-CALCULATED Performance Metrics) ---
+**Type:** Materialized summary of view_sales_performance_v2 (same columns, kept up to date on every import)
 **Purpose:** Use this view for ANY questions about KPI, percentage, achievement, or revenue vs target.
 **IMPORTANT:** This view contains MONTHLY data. For semester/yearly queries, you MUST aggregate.
 
@@ -71,10 +81,10 @@ You are a SQL Expert querying a MySQL database 'ai_command_center'.
 1. **Monthly Questions:** Select directly (e.g., WHERE month_number = 1).
 2. **Semester Questions:** You MUST AGGREGATE the results.
    - Example: "Performance in Semester 2?"
-   - SQL: `SELECT SUM(total_revenue), SUM(total_target) FROM view_sales_performance_v2 WHERE semester = 2 ...`
+   - SQL: `SELECT SUM(total_revenue), SUM(total_target) FROM sales_performance_monthly WHERE semester = 2 ...`
    - Achievement %: `(SUM(total_revenue) / SUM(total_target)) * 100`
 3. **Yearly Questions:** Aggregate all 12 months.
-   - SQL: `SELECT SUM(total_revenue), SUM(total_target) FROM view_sales_performance_v2 WHERE year = 2025 ...`
+   - SQL: `SELECT SUM(total_revenue), SUM(total_target) FROM sales_performance_monthly WHERE year = 2025 ...`
 
 **YEAR FILTERING RULES:**
 1. If user asks about "this year" or "current year", use the latest year available in data.
@@ -101,13 +111,16 @@ You are a SQL Expert querying a MySQL database 'ai_command_center'.
 - **Peak Months:** Months with highest revenue (identify patterns).
 - **Low Months:** Months with lowest revenue (plan promotions).
 - **Question Starters:** "What are our peak months?", "Revenue seasonality"
+"""
 
+# Debt section of DB_SCHEMA (full AR snapshots stored for every report_date)
+AR_SCHEMA = """
 --- TABLE 5: ar_aging_report (Debt & Credit Control) ---
 **Description:** Stores daily snapshots of Account Receivables (Debt) and Collection Performance.
 **CRITICAL:** This table contains HISTORICAL SNAPSHOTS. NEVER sum total_debt across multiple dates.
 
 **Columns:**
-- report_date (TEXT): The date of the snapshot (YYYY-MM-DD).
+- report_date (DATE): The date of the snapshot (YYYY-MM-DD).
 - salesman_name (TEXT): Name of the sales staff.
 - customer_name (TEXT): Name of the customer (Debtor).
 - customer_code (TEXT): Customer code.
@@ -120,6 +133,7 @@ You are a SQL Expert querying a MySQL database 'ai_command_center'.
 - debt_91_120 (REAL): Outstanding debt aged 91-120 days.
 - debt_121_180 (REAL): Outstanding debt aged 121-180 days.
 - debt_over_180 (REAL): **BAD DEBT** (overdue > 6 months).
+- overdue_debt (REAL): Debt overdue more than 60 days (debt_61_90 + debt_91_120 + debt_121_180 + debt_over_180).
 
 **DEBT QUERY RULES (CRITICAL):**
 
@@ -145,6 +159,46 @@ You are a SQL Expert querying a MySQL database 'ai_command_center'.
    - "Nợ quá hạn là bao nhiêu?" → `SELECT SUM(debt_over_180) FROM ar_aging_report WHERE report_date = (SELECT MAX(report_date) FROM ar_aging_report)`
 """
 
+# Debt section of DB_SCHEMA in DEBT_STORAGE=delta mode: ar_aging_report only holds
+# changed rows for most dates, so chat reads the materialized latest snapshot and the summary
+AR_DELTA_SCHEMA = """
+--- TABLE 5: ar_aging_latest (Debt & Credit Control - CURRENT snapshot) ---
+**Description:** Account Receivables (Debt) of every customer at the LATEST report date only.
+**CRITICAL:** NEVER query ar_aging_report (it is an internal change log, not a snapshot).
+
+**Columns:**
+- report_date (DATE): The date of the snapshot (same value on every row).
+- salesman_name (TEXT): Name of the sales staff.
+- customer_name (TEXT): Name of the customer (Debtor).
+- customer_code (TEXT): Customer code.
+- channel (TEXT): Distribution channel ('Industry', 'Retail', 'Project', 'Others').
+- total_debt (REAL): **OUTSTANDING AMOUNT** (Phải thu / Target in Excel).
+- total_realization (REAL): **COLLECTED AMOUNT** (Đã thu / Realization in Excel).
+- debt_1_30, debt_31_60, debt_61_90, debt_91_120, debt_121_180 (REAL): Outstanding debt by age bucket (days).
+- debt_over_180 (REAL): **BAD DEBT** (overdue > 6 months).
+- overdue_debt (REAL): Debt overdue more than 60 days.
+
+--- TABLE 6: ar_snapshot_summary (Debt HISTORY per date) ---
+**Description:** Debt totals per (report_date, channel, salesman_name) for EVERY snapshot date.
+**Columns:** report_date, channel, salesman_name, customer_count, total_debt, total_realization,
+debt_1_30, debt_31_60, debt_61_90, debt_91_120, debt_121_180, debt_over_180.
+
+**DEBT QUERY RULES (CRITICAL):**
+1. Current debt, customers, top debtors -> `ar_aging_latest` (no date filter needed).
+2. A past date or a trend over dates -> `ar_snapshot_summary` (filter / GROUP BY report_date).
+   NEVER sum total_debt across multiple report_date values.
+3. Customer-level debt of past dates is not stored: answer NO_SQL.
+4. **Key Calculations:**
+   - **Collection Rate** (Tỷ lệ thu hồi): `total_realization / (total_debt + total_realization) * 100`
+   - **Bad Debt Ratio**: `debt_over_180 / total_debt * 100`
+5. **Question Examples:**
+   - "Tình hình nợ hiện tại?" → `SELECT SUM(total_debt), SUM(total_realization) FROM ar_aging_latest`
+   - "Top 10 khách hàng nợ nhiều nhất?" → `SELECT customer_name, total_debt FROM ar_aging_latest ORDER BY total_debt DESC LIMIT 10`
+   - "Nợ theo kênh ngày 2025-10-01?" → `SELECT channel, SUM(total_debt) FROM ar_snapshot_summary WHERE report_date = '2025-10-01' GROUP BY channel`
+"""
+
+DB_SCHEMA += AR_DELTA_SCHEMA if delta_enabled() else AR_SCHEMA
+
 # --- Helper Functions ---
 def compact_curr(value):
     """Format large numbers to B (Billion) or M (Million) for token efficiency"""
@@ -171,21 +225,21 @@ COLUMN_MAPPING = {
     "Billing Qty": "billing_qty"
 }
 
-def process_upload_sales(file_contents: bytes, db: Session):
+def process_upload_sales(source, db: Session, filename: str = None):
     """
-    Process Sales Excel file:
+    Process Sales Excel or CSV/TSV file:
     1. Read and clean data
     2. Rename columns using COLUMN_MAPPING
     3. Calculate Profit (using COGS) and Marketing Spend
     4. Replace all data in sales_data table using to_sql
     """
     try:
-        df = pd.read_excel(io.BytesIO(file_contents), engine='openpyxl')
+        df = read_table(source, filename)
         
-        # Data Cleaning & Renaming
-        if 'Net Value' in df.columns:
-            if df['Net Value'].dtype == 'object':
-                 df['Net Value'] = pd.to_numeric(df['Net Value'].astype(str).str.replace(r'[^\d.-]', '', regex=True), errors='coerce')
+        # Data Cleaning & Renaming (text exports read every column as text)
+        for col in ('Net Value', 'Billing Qty', 'Month number', 'Year'):
+            if col in df.columns:
+                df[col] = to_numeric_column(df[col])
         
         # Apply Mapping
         df = df.rename(columns=COLUMN_MAPPING)
@@ -252,15 +306,15 @@ def process_upload_sales(file_contents: bytes, db: Session):
         traceback.print_exc()
         raise Exception(f"Error processing sales upload: {str(e)}")
 
-def process_upload_cogs(file_contents: bytes, db: Session):
-    """Process COGS Master File upload"""
+def process_upload_cogs(source, db: Session, filename: str = None):
+    """Process COGS Master File upload (Excel Sheet1 or CSV/TSV)"""
     try:
-        df = pd.read_excel(io.BytesIO(file_contents), engine='openpyxl', sheet_name='Sheet1')
+        df = read_table(source, filename, sheet_name='Sheet1')
         
         if 'Description' not in df.columns or 'COGS' not in df.columns:
-            raise Exception("Excel file must contain 'Description' and 'COGS' columns")
+            raise Exception("File must contain 'Description' and 'COGS' columns")
         
-        df['COGS'] = pd.to_numeric(df['COGS'], errors='coerce')
+        df['COGS'] = to_numeric_column(df['COGS'])
         df = df.dropna(subset=['Description', 'COGS'])
         df = df.drop_duplicates(subset=['Description'], keep='last')
         
@@ -279,22 +333,22 @@ def process_upload_cogs(file_contents: bytes, db: Session):
                 db.add(new_product)
                 updated_count += 1
         
+        # Only total_profit of cells selling these products changes
+        db.flush()
+        sync_product_cost_keys(db)
+        refresh_performance_profit(db, df['Description'].astype(str).str.strip().tolist())
         db.commit()
         return updated_count
     except Exception as e:
         raise Exception(f"Error processing COGS upload: {str(e)}")
 
-def process_upload_target(file_contents: bytes, db: Session):
+def process_upload_target(source, db: Session, filename: str = None):
     """
     Process Sales Target File upload
     NEW: Splits semester targets into monthly targets and writes to monthly_targets table
     """
     try:
-        # Try reading as CSV first, then Excel
-        try:
-            df = pd.read_csv(io.BytesIO(file_contents))
-        except:
-            df = pd.read_excel(io.BytesIO(file_contents), engine='openpyxl')
+        df = read_table_any(source, filename)
         
         df.columns = [c.strip() for c in df.columns]
         
@@ -302,8 +356,12 @@ def process_upload_target(file_contents: bytes, db: Session):
         missing = [c for c in required if c not in df.columns]
         if missing:
             raise Exception(f"Missing columns: {missing}")
+        for col in ('Semester', 'Target', 'Year'):
+            if col in df.columns:
+                df[col] = to_numeric_column(df[col])
             
         updated_count = 0
+        written_targets = []
         
         # Import MonthlyTarget model
         from sqlalchemy import text
@@ -328,28 +386,31 @@ def process_upload_target(file_contents: bytes, db: Session):
             else:  # semester == 2
                 months = [7, 8, 9, 10, 11, 12]
             
-            # Upsert for each month in the semester
+            # Replace each month of the semester: delete + insert, as monthly_targets
+            # has no unique key on MySQL for ON DUPLICATE KEY UPDATE to match
             for month_num in months:
-                # Use raw SQL for UPSERT (INSERT OR REPLACE)
-                upsert_query = text("""
-                    INSERT INTO monthly_targets (user_name, year, month_number, target_amount, semester)
-                    VALUES (:user_name, :year, :month_number, :target_amount, :semester)
-                    ON CONFLICT(user_name, year, month_number) 
-                    DO UPDATE SET 
-                        target_amount = excluded.target_amount,
-                        semester = excluded.semester
-                """)
-                
-                db.execute(upsert_query, {
+                params = {
                     'user_name': name,
                     'year': year,
                     'month_number': month_num,
                     'target_amount': monthly_target,
                     'semester': semester
-                })
+                }
+                db.execute(text("""
+                    DELETE FROM monthly_targets
+                    WHERE user_name = :user_name AND year = :year AND month_number = :month_number
+                """), params)
+                db.execute(text("""
+                    INSERT INTO monthly_targets (user_name, year, month_number, target_amount, semester)
+                    VALUES (:user_name, :year, :month_number, :target_amount, :semester)
+                """), params)
                 
+                written_targets.append((name, year, month_num))
                 updated_count += 1
-            
+        
+        # Only target / achievement columns of the summary change
+        sync_target_keys(db)
+        refresh_performance_targets(db, written_targets)
         db.commit()
         return updated_count
 
@@ -580,22 +641,8 @@ Margin: {kpi['margin']:.1f}% | Profit: {compact_curr(kpi['profit'])} | Rev: {com
 
 # --- 4. CHAT LOGIC ---
 
-def process_chat(question: str, db: Session):
-    print(f"--- [AI] Processing: {question} ---")
-    
-    # FORCE CONFIGURATION (Replace with the user's real key if env var fails)
-    api_key = os.environ.get("GEMINI_API_KEY")
-    if not api_key:
-        print("[WARNING] GEMINI_API_KEY not found in environment.")
-        # Do NOT hardcode the key here anymore. Let it fail or warn loudly.
-
-    genai.configure(api_key=api_key)
-    model = genai.GenerativeModel('gemini-2.0-flash')
-
-    # STEP 1: GENERATE SQL
-    sql_prompt = f"""
-    {DB_SCHEMA}
-    User Question: "{question}"
+# Instructions appended after the schema and the question (part of the SQL cache fingerprint)
+SQL_PROMPT_RULES = """
     Task: Convert to a single executable SQLite SELECT query.
     
     CRITICAL RULES (FOLLOW STRICTLY):
@@ -614,10 +661,10 @@ def process_chat(question: str, db: Session):
     3. **QUERY ROUTING (CRITICAL):**
        - If user asks about "performance", "achievement", "% completion", "KPI", or "target vs revenue":
          * IGNORE raw sales_data and sales_target tables.
-         * SELECT directly from `view_sales_performance_v2`.
-         * **MONTHLY:** `SELECT * FROM view_sales_performance_v2 WHERE month_number = 1`
-         * **SEMESTER:** `SELECT SUM(total_revenue), SUM(total_target) FROM view_sales_performance_v2 WHERE semester = 1`
-         * **YEARLY:** `SELECT SUM(total_revenue), SUM(total_target) FROM view_sales_performance_v2 WHERE year = 2025`
+         * SELECT directly from `sales_performance_monthly`.
+         * **MONTHLY:** `SELECT * FROM sales_performance_monthly WHERE month_number = 1`
+         * **SEMESTER:** `SELECT SUM(total_revenue), SUM(total_target) FROM sales_performance_monthly WHERE semester = 1`
+         * **YEARLY:** `SELECT SUM(total_revenue), SUM(total_target) FROM sales_performance_monthly WHERE year = 2025`
        
     4. **SEARCH RULES:**
        - Text search: ALWAYS use `LIKE '%KEYWORD%'` (Fuzzy match).
@@ -626,37 +673,77 @@ def process_chat(question: str, db: Session):
        
     5. **OUTPUT:** Return ONLY the SQL string.
     """
+
+SQL_CACHE_FINGERPRINT = chat_cache_services.schema_fingerprint(DB_SCHEMA, SQL_PROMPT_RULES)
+
+
+def process_chat(question: str, db: Session):
+    print(f"--- [AI] Processing: {question} ---")
+    
+    # FORCE CONFIGURATION (Replace with the user's real key if env var fails)
+    api_key = os.environ.get("GEMINI_API_KEY")
+    if not api_key:
+        print("[WARNING] GEMINI_API_KEY not found in environment.")
+        # Do NOT hardcode the key here anymore. Let it fail or warn loudly.
+
+    genai.configure(api_key=api_key)
+    model = genai.GenerativeModel('gemini-2.0-flash')
+
+    # STEP 1: GENERATE SQL (skipped when the normalized question is cached)
+    sql_prompt = f"""
+    {DB_SCHEMA}
+    User Question: "{question}"{SQL_PROMPT_RULES}"""
     
     try:
-        sql_response = model.generate_content(sql_prompt)
-        raw_text = sql_response.text.strip()
-        
-        # CLEANING: Remove markdown code blocks first
-        clean_text = raw_text.replace('```sql', '').replace('```', '').strip()
-        
-        # REGEX EXTRACTION: Find the SELECT statement
-        # Look for "SELECT" (case insensitive) followed by anything until the end
-        match = re.search(r'(SELECT\s+.*)', clean_text, re.IGNORECASE | re.DOTALL)
-        
-        if match:
-            sql_query = match.group(1)
-            # Remove any trailing semicolon if present, though SQLite handles it fine usually
-            sql_query = sql_query.rstrip(';')
-        elif clean_text == "NO_SQL":
-             sql_query = "NO_SQL"
-        else:
-            print(f"[AI] Could not find SQL in response: {raw_text}")
-            return {"answer": "I don't understand this question or cannot generate a valid query."}
+        sql_query = chat_cache_services.get_sql(db, question, SQL_CACHE_FINGERPRINT)
+        from_cache = sql_query is not None
+
+        if not from_cache:
+            started = time.perf_counter()
+            sql_response = model.generate_content(sql_prompt)
+            generation_ms = (time.perf_counter() - started) * 1000
+            raw_text = sql_response.text.strip()
+            
+            # CLEANING: Remove markdown code blocks first
+            clean_text = raw_text.replace('```sql', '').replace('```', '').strip()
+            
+            # REGEX EXTRACTION: Find the SELECT statement
+            # Look for "SELECT" (case insensitive) followed by anything until the end
+            match = re.search(r'(SELECT\s+.*)', clean_text, re.IGNORECASE | re.DOTALL)
+            
+            if match:
+                sql_query = match.group(1)
+                # Remove any trailing semicolon if present, though SQLite handles it fine usually
+                sql_query = sql_query.rstrip(';')
+            elif clean_text == "NO_SQL":
+                 sql_query = "NO_SQL"
+            else:
+                print(f"[AI] Could not find SQL in response: {raw_text}")
+                return {"answer": "I don't understand this question or cannot generate a valid query."}
             
-        print(f"--- [AI] Executing SQL: {sql_query} ---")
+        print(f"--- [AI] Executing SQL{' (cached)' if from_cache else ''}: {sql_query} ---")
 
         if sql_query == "NO_SQL":
+            if not from_cache:
+                chat_cache_services.put_sql(db, question, SQL_CACHE_FINGERPRINT, sql_query, generation_ms)
             # Chat mode
             chat_response = model.generate_content(f"User says: {question}. Reply helpfully in English with a professional business tone.")
             return {"answer": chat_response.text}
 
-        # STEP 2: EXECUTE SQL
-        result = db.execute(text(sql_query)).fetchall()
+        # STEP 2: EXECUTE SQL (result cache, then DuckDB mirror when enabled, MySQL otherwise)
+        result = chat_cache_services.get_result(sql_query)
+        if result is None:
+            version = current_version()
+            try:
+                result = analytics_mirror.fetchall(db, sql_query)
+            except Exception:
+                if from_cache:
+                    db.rollback()
+                    chat_cache_services.discard_sql(db, question)
+                raise
+            result = chat_cache_services.put_result(sql_query, result, version)
+        if not from_cache:
+            chat_cache_services.put_sql(db, question, SQL_CACHE_FINGERPRINT, sql_query, generation_ms)
         print(f"--- [AI] SQL Result: {result} ---")
         
         # STEP 3: EXPLAIN RESULT
@@ -689,130 +776,133 @@ def process_chat(question: str, db: Session):
 
 # --- 5. CHANNEL PERFORMANCE ANALYSIS ---
 
-def get_channel_performance(db: Session, year: int, semester: int = None):
+# Channels shown as stacked series in the monthly trend chart
+TREND_CHANNELS = ("Industry", "Retail", "Project", "Others")
+
+
+def _empty_channel_performance():
+    return {
+        "overview": [],
+        "monthly_trend": [],
+        "radar_data": []
+    }
+
+
+def _derive_channel_performance(rows, month_range=None):
     """
-    Get channel performance analysis with SQL-SIDE MAPPING & DYNAMIC PROFIT
-    Aggregates sales data by distribution channel (Industry, Retail, Project)
-    Uses SQL CASE WHEN for robust mapping and Revenue - (Qty * COGS) for profit
+    Derive overview, monthly trend and radar data from (month, channel) aggregates
+
+    Args:
+        rows: (month_number, channel_name, revenue, profit, deals) tuples
+        month_range: Inclusive (from, to) month_number range, None for all rows
+
+    Returns:
+        Dict with overview, monthly_trend and radar_data
     """
-    try:
-        # Logic to handle semester filter
-        semester_condition = "1=1"
-        if semester == 1:
-            semester_condition = "s.month_number <= 6"
-        elif semester == 2:
-            semester_condition = "s.month_number > 6"
-
-        # SQL query - dist column already contains channel names
-        # No mapping needed, just use dist directly
-        sql = text(f"""
+    overview = {}
+    monthly_data = {}
+
+    for month, channel, revenue, profit, deals in rows:
+        if month_range and not (month_range[0] <= month <= month_range[1]):
+            continue
+
+        ch = overview.setdefault(channel, {"channel": channel, "revenue": 0.0, "profit": 0.0, "deals": 0})
+        ch["revenue"] += revenue
+        ch["profit"] += profit
+        ch["deals"] += deals
+
+        if month not in monthly_data:
+            monthly_data[month] = {"month": month, **{name: 0 for name in TREND_CHANNELS}}
+        if channel in monthly_data[month]:
+            monthly_data[month][channel] = revenue
+
+    overview_list = list(overview.values())
+    for ch in overview_list:
+        ch["margin"] = (ch["profit"] / ch["revenue"] * 100) if ch["revenue"] != 0 else 0
+
+    # Radar chart data (normalized metrics for comparison)
+    # Margin is shown in KPI cards and table instead
+    radar_data = []
+    if overview_list:
+        max_revenue = max(ch['revenue'] for ch in overview_list)
+        max_profit = max(ch['profit'] for ch in overview_list)
+        max_deals = max(ch['deals'] for ch in overview_list)
+
+        for ch in overview_list:
+            radar_data.append({
+                "channel": ch['channel'],
+                "Revenue": round((ch['revenue'] / max_revenue * 100) if max_revenue > 0 else 0, 1),
+                "Profit": round((ch['profit'] / max_profit * 100) if max_profit > 0 else 0, 1),
+                "Volume": round((ch['deals'] / max_deals * 100) if max_deals > 0 else 0, 1)
+            })
+
+    return {
+        "overview": overview_list,
+        "monthly_trend": sorted(monthly_data.values(), key=lambda x: x['month']),
+        "radar_data": radar_data
+    }
+
+
+def _channel_rows_sql(db: Session, year: int, semester: int = None):
+    """(month, channel, revenue, profit, deals) rows from one GROUP BY month_number, channel_id"""
+    # Group on the integer channel key, channel names come from dim_channel
+    # Semester filter is compiled to a month_number range (sargable)
+    sql, params = filtered_query("""
+    SELECT 
+        t.month_number,
+        dc.name as channel_name,
+        t.revenue,
+        t.profit,
+        t.deals
+    FROM (
         SELECT 
-            s.dist as channel_name,
+            s.month_number,
+            s.channel_id,
             SUM(s.net_value) as revenue,
             SUM(s.profit) as profit,
             COUNT(*) as deals
         FROM sales_data s
-        WHERE (:year IS NULL OR s.year = :year)
-        AND {semester_condition}
-        GROUP BY s.dist
-        """)
-        
-        # Execution
-        result = db.execute(sql, {"year": year}).fetchall()
-        
-        if not result:
+        WHERE {where}
+        GROUP BY s.month_number, s.channel_id
+    ) t
+    LEFT JOIN dim_channel dc ON dc.id = t.channel_id
+    """, alias='s', year=year, semester=semester)
+
+    return [
+        (int(r[0]), r[1], float(r[2] or 0), float(r[3] or 0), int(r[4] or 0))
+        for r in analytics_mirror.fetchall(db, sql, params)
+        if r[0] is not None
+    ]
+
+
+def get_channel_performance(db: Session, year: int, semester: int = None, all_semesters: bool = False):
+    """
+    Get channel performance analysis (Industry, Retail, Project)
+    One GROUP BY (month_number, dist) aggregate (MySQL or columnar cache); overview, monthly trend and radar
+    normalization are all derived from that result in Python.
+
+    Args:
+        semester: 1 or 2 to restrict to a half year, None for the full year
+        all_semesters: Return {"S1", "S2", "FY"} in one response (semester is ignored)
+    """
+    try:
+        # Columnar cache when enabled, otherwise one MySQL round trip
+        if all_semesters:
+            semester = None
+        cache = columnar_cache.get_cache(db)
+        rows = cache.channel_rows(year, semester) if cache is not None else _channel_rows_sql(db, year, semester)
+
+        if all_semesters:
             return {
-                "overview": [],
-                "monthly_trend": [],
-                "radar_data": []
+                "S1": _derive_channel_performance(rows, SEMESTER_MONTHS[1]),
+                "S2": _derive_channel_performance(rows, SEMESTER_MONTHS[2]),
+                "FY": _derive_channel_performance(rows)
             }
-            
-        # Process result directly
-        overview_list = []
-        for row in result:
-            channel_name = row[0]
-            revenue = float(row[1] or 0)
-            profit = float(row[2] or 0)
-            deals = int(row[3] or 0)
-            margin = (profit / revenue * 100) if revenue != 0 else 0
-            
-            overview_list.append({
-                "channel": channel_name,
-                "revenue": revenue,
-                "profit": profit,
-                "margin": margin,
-                "deals": deals
-            })
-            
-        # Calculate monthly trend - dist already contains channel names
-        monthly_sql = text(f"""
-        SELECT 
-            s.month_number,
-            s.dist as channel_name,
-            SUM(s.net_value) as revenue
-        FROM sales_data s
-        WHERE (:year IS NULL OR s.year = :year)
-        AND {semester_condition}
-        GROUP BY s.month_number, s.dist
-        ORDER BY s.month_number
-        """)
-        
-        monthly_result = db.execute(monthly_sql, {"year": year}).fetchall()
-        
-        # Process monthly trend
-        monthly_data = {}
-        for row in monthly_result:
-            month = int(row[0])
-            channel = row[1]
-            revenue = float(row[2] or 0)
-            
-            if month not in monthly_data:
-                monthly_data[month] = {"month": month, "Industry": 0, "Retail": 0, "Project": 0, "Others": 0}
-            
-            if channel in monthly_data[month]:
-                monthly_data[month][channel] = revenue
-                
-        monthly_trend = sorted(monthly_data.values(), key=lambda x: x['month'])
-        
-        # Prepare radar chart data (normalized metrics for comparison)
-        radar_data = []
-        if len(overview_list) > 0:
-            # Find max values for normalization
-            max_revenue = max([ch['revenue'] for ch in overview_list]) if overview_list else 0
-            max_profit = max([ch['profit'] for ch in overview_list]) if overview_list else 0
-            max_deals = max([ch['deals'] for ch in overview_list]) if overview_list else 0
-            
-            for ch in overview_list:
-                radar_data.append({
-                    "channel": ch['channel'],
-                    "Revenue": round((ch['revenue'] / max_revenue * 100) if max_revenue > 0 else 0, 1),
-                    "Profit": round((ch['profit'] / max_profit * 100) if max_profit > 0 else 0, 1),
-                    "Volume": round((ch['deals'] / max_deals * 100) if max_deals > 0 else 0, 1)
-                    # Margin removed - shown in KPI cards and table instead
-                })
-        
-        return {
-            "overview": overview_list,
-            "monthly_trend": monthly_trend,
-            "radar_data": radar_data
-        }
-        
-    except Exception as e:
-        print(f"Error in get_channel_performance: {e}")
-        traceback.print_exc()
-        return {
-            "overview": [],
-            "monthly_trend": [],
-            "radar_data": []
-        }
-        
+        return _derive_channel_performance(rows)
+
     except Exception as e:
         print(f"Error in get_channel_performance: {e}")
         traceback.print_exc()
-        return {
-            "overview": [],
-            "monthly_trend": [],
-            "radar_data": []
-        }
-
-
+        if all_semesters:
+            return {key: _empty_channel_performance() for key in ("S1", "S2", "FY")}
+        return _empty_channel_performance()
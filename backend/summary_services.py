@@ -0,0 +1,251 @@
+"""
+Sales Performance Summary (materialized view_sales_performance_v2)
+sales_performance_monthly holds one row per (salesman, year, month) with the same
+columns as view_sales_performance_v2, refreshed incrementally by the write paths:
+- Sales imports / rollbacks refresh only the affected (salesman, year, month) cells
+- Target uploads refresh only total_target and achievement_percentage
+- COGS updates refresh only total_profit
+ar_snapshot_summary holds one row per (report_date, channel, salesman) of each AR
+snapshot, written by the debt import / rollback for the snapshot dates they touch.
+customer_trailing_revenue holds trailing-window revenue per customer key, rebuilt
+after sales data changes.
+All refresh functions run in the caller's transaction; the caller commits.
+"""
+from collections import defaultdict
+from datetime import date, timedelta
+from typing import Iterable, Tuple
+from sqlalchemy.orm import Session
+from sqlalchemy import text, bindparam
+from data_version import mark_changed_periods, mark_changed_report_dates
+from debt_storage_services import snapshot_source, delta_enabled
+
+PERFORMANCE_TABLE = "sales_performance_monthly"
+
+# Same aggregation as update_view_sales_performance_v2.sql, restricted by {where};
+# joins and grouping use the integer dimension keys (dimension_services)
+_CELL_SELECT = """
+    SELECT
+        MAX(s.salesman_name) as salesman_name,
+        s.year,
+        s.month_number,
+        CASE WHEN s.month_number <= 6 THEN 1 ELSE 2 END as semester,
+        SUM(s.net_value) as total_revenue,
+        SUM(s.net_value - (s.billing_qty * COALESCE(pc.cogs, 0))) as total_profit,
+        COALESCE(MAX(mt.target_amount), 0) as total_target,
+        CASE
+            WHEN COALESCE(MAX(mt.target_amount), 0) > 0
+            THEN ROUND((SUM(s.net_value) * 1.0 / MAX(mt.target_amount)) * 100, 2)
+            ELSE 0
+        END as achievement_percentage
+    FROM sales_data s
+    LEFT JOIN product_cost pc ON pc.product_id = s.product_id
+    LEFT JOIN monthly_targets mt ON mt.salesman_id = s.salesman_id
+                                 AND mt.year = s.year
+                                 AND mt.month_number = s.month_number
+    WHERE {where}
+    GROUP BY s.salesman_id, s.year, s.month_number
+"""
+
+_COLUMNS = "salesman_name, year, month_number, semester, total_revenue, total_profit, total_target, achievement_percentage"
+
+
+def _refresh(db: Session, where_sales: str, where_summary: str, params: dict, expanding=()):
+    """Delete + re-aggregate the summary rows matching a predicate"""
+    delete = text(f"DELETE FROM {PERFORMANCE_TABLE} WHERE {where_summary}")
+    insert = text(f"INSERT INTO {PERFORMANCE_TABLE} ({_COLUMNS}) " + _CELL_SELECT.format(where=where_sales))
+    if expanding:
+        delete = delete.bindparams(*[bindparam(name, expanding=True) for name in expanding])
+        insert = insert.bindparams(*[bindparam(name, expanding=True) for name in expanding])
+    db.execute(delete, params)
+    db.execute(insert, params)
+
+
+def rebuild_sales_performance(db: Session):
+    """Full rebuild (migration / repair)"""
+    db.execute(text(f"DELETE FROM {PERFORMANCE_TABLE}"))
+    db.execute(text(f"INSERT INTO {PERFORMANCE_TABLE} ({_COLUMNS}) " + _CELL_SELECT.format(where="1=1")))
+
+
+def refresh_sales_performance_cells(db: Session, cells: Iterable[Tuple[str, int, int]]) -> int:
+    """
+    Re-aggregate the given (salesman_name, year, month_number) cells from sales_data
+    Cells are grouped per (year, month) so each refresh is one idx_sales_year_month range.
+    A NULL salesman in a period refreshes that whole period.
+
+    Returns:
+        Number of (year, month) periods refreshed
+    """
+    periods = defaultdict(set)
+    for salesman, year, month in cells:
+        if year is None or month is None:
+            continue
+        periods[(int(year), int(month))].add(salesman)
+
+    # Lets row-level caches (columnar_cache) reload just these periods
+    mark_changed_periods(periods.keys())
+
+    for (year, month), salesmen in periods.items():
+        params = {"year": year, "month": month}
+        if None in salesmen:
+            _refresh(db, "s.year = :year AND s.month_number = :month",
+                     "year = :year AND month_number = :month", params)
+        else:
+            params["names"] = sorted(salesmen)
+            _refresh(db, "s.year = :year AND s.month_number = :month AND s.salesman_name IN :names",
+                     "year = :year AND month_number = :month AND salesman_name IN :names",
+                     params, expanding=("names",))
+    return len(periods)
+
+
+def refresh_performance_targets(db: Session, targets: Iterable[Tuple[str, int, int]]):
+    """
+    Update only total_target / achievement_percentage after a target upload
+    Joins targets on salesman_id like _CELL_SELECT (run sync_target_keys first), so
+    an upload and a full rebuild write the same values.
+
+    Args:
+        targets: (user_name, year, month_number) keys written to monthly_targets
+    """
+    by_year = defaultdict(set)
+    for user_name, year, _month in targets:
+        by_year[int(year)].add(user_name)
+
+    query = text(f"""
+        UPDATE {PERFORMANCE_TABLE} sp
+        JOIN dim_salesman d ON d.name = sp.salesman_name
+        LEFT JOIN monthly_targets mt ON mt.salesman_id = d.id
+                                     AND mt.year = sp.year
+                                     AND mt.month_number = sp.month_number
+        SET sp.total_target = COALESCE(mt.target_amount, 0),
+            sp.achievement_percentage = CASE
+                WHEN COALESCE(mt.target_amount, 0) > 0
+                THEN ROUND((sp.total_revenue * 1.0 / mt.target_amount) * 100, 2)
+                ELSE 0
+            END
+        WHERE sp.year = :year
+          AND d.id IN (
+              SELECT salesman_id FROM monthly_targets
+              WHERE year = :year AND user_name IN :names AND salesman_id IS NOT NULL
+          )
+    """).bindparams(bindparam("names", expanding=True))
+
+    for year, names in by_year.items():
+        db.execute(query, {"year": year, "names": sorted(names)})
+
+
+def refresh_performance_profit(db: Session, descriptions: Iterable[str]):
+    """
+    Update only total_profit for cells that sold any of the re-costed products
+    """
+    descriptions = sorted({d for d in descriptions if d})
+    if not descriptions:
+        return
+
+    query = text(f"""
+        UPDATE {PERFORMANCE_TABLE} sp
+        JOIN (
+            SELECT MAX(s.salesman_name) as salesman_name, s.year, s.month_number,
+                   SUM(s.net_value - (s.billing_qty * COALESCE(pc.cogs, 0))) as total_profit
+            FROM sales_data s
+            JOIN (
+                SELECT DISTINCT salesman_id, year, month_number
+                FROM sales_data
+                WHERE description IN :descriptions
+            ) cells ON s.salesman_id <=> cells.salesman_id
+                   AND s.year = cells.year
+                   AND s.month_number = cells.month_number
+            LEFT JOIN product_cost pc ON pc.product_id = s.product_id
+            GROUP BY s.salesman_id, s.year, s.month_number
+        ) p ON sp.salesman_name <=> p.salesman_name
+           AND sp.year = p.year
+           AND sp.month_number = p.month_number
+        SET sp.total_profit = p.total_profit
+    """).bindparams(bindparam("descriptions", expanding=True))
+
+    # Chunk to keep the IN list bounded on large COGS uploads
+    for i in range(0, len(descriptions), 1000):
+        db.execute(query, {"descriptions": descriptions[i:i + 1000]})
+
+
+AR_SUMMARY_TABLE = "ar_snapshot_summary"
+
+_AR_SUMMARY_COLUMNS = ("report_date, channel, salesman_name, customer_count, total_debt, total_realization, "
+                       "debt_1_30, debt_31_60, debt_61_90, debt_91_120, debt_121_180, debt_over_180")
+
+
+def refresh_ar_snapshot_summary(db: Session, report_dates: Iterable[str]):
+    """
+    Re-aggregate ar_snapshot_summary for the given snapshot dates from ar_aging_report
+    (reconstructed through debt_storage_services for delta snapshots)
+    A date with no detail rows left (rolled back) simply loses its summary rows.
+    Also refreshes ar_aging_latest, since the latest snapshot may be among the dates.
+    """
+    report_dates = sorted({str(d) for d in report_dates if d})
+    if not report_dates:
+        return
+    mark_changed_report_dates(report_dates)
+
+    db.execute(text(f"DELETE FROM {AR_SUMMARY_TABLE} WHERE report_date IN :report_dates").bindparams(
+        bindparam("report_dates", expanding=True)), {"report_dates": report_dates})
+    for report_date in report_dates:
+        source, params = snapshot_source(db, report_date)
+        db.execute(text(f"""
+            INSERT INTO {AR_SUMMARY_TABLE} ({_AR_SUMMARY_COLUMNS})
+            SELECT
+                report_date, channel, salesman_name,
+                COUNT(*),
+                SUM(total_debt), SUM(total_realization),
+                SUM(debt_1_30), SUM(debt_31_60), SUM(debt_61_90),
+                SUM(debt_91_120), SUM(debt_121_180), SUM(debt_over_180)
+            FROM {source} r
+            GROUP BY report_date, channel, salesman_name
+        """), params)
+    refresh_ar_latest_snapshot(db)
+
+
+AR_LATEST_TABLE = "ar_aging_latest"
+
+_AR_LATEST_COLUMNS = ("report_date, salesman_name, customer_name, customer_code, channel, total_debt, "
+                      "total_realization, debt_1_30, debt_31_60, debt_61_90, debt_91_120, debt_121_180, "
+                      "debt_over_180, overdue_debt")
+
+
+def refresh_ar_latest_snapshot(db: Session):
+    """
+    Copy the reconstructed latest AR snapshot into ar_aging_latest (delta storage only)
+    Delta dates hold only changed rows in ar_aging_report, so chat SQL reads this table.
+    """
+    if not delta_enabled():
+        return
+    db.execute(text(f"DELETE FROM {AR_LATEST_TABLE}"))
+    latest = db.execute(text(f"SELECT MAX(report_date) FROM {AR_SUMMARY_TABLE}")).scalar()
+    if not latest:
+        return
+    source, params = snapshot_source(db, latest)
+    db.execute(text(f"""
+        INSERT INTO {AR_LATEST_TABLE} ({_AR_LATEST_COLUMNS})
+        SELECT {_AR_LATEST_COLUMNS} FROM {source} r
+    """), params)
+
+
+TRAILING_REVENUE_TABLE = "customer_trailing_revenue"
+TRAILING_REVENUE_DAYS = 90
+
+
+def refresh_customer_trailing_revenue(db: Session, days: int = TRAILING_REVENUE_DAYS):
+    """
+    Rebuild revenue per customer_id over the `days` ending at the latest billing_date
+    One range scan of idx_sales_billing_date; the caller commits.
+    """
+    latest = db.execute(text("SELECT MAX(billing_date) FROM sales_data")).scalar()
+    db.execute(text(f"DELETE FROM {TRAILING_REVENUE_TABLE}"))
+    if not latest:
+        return
+    as_of = date.fromisoformat(str(latest)[:10])
+    db.execute(text(f"""
+        INSERT INTO {TRAILING_REVENUE_TABLE} (customer_id, revenue, as_of)
+        SELECT customer_id, SUM(net_value), :as_of
+        FROM sales_data
+        WHERE billing_date > :start AND billing_date <= :end AND customer_id IS NOT NULL
+        GROUP BY customer_id
+    """), {"as_of": as_of, "start": (as_of - timedelta(days=days)).isoformat(), "end": as_of.isoformat()})
@@ -0,0 +1,49 @@
+"""
+Test script for the chat result cache (in memory, no database needed)
+1. SQL text normalization (whitespace outside quoted literals)
+2. Volatile SQL (CURDATE(), NOW(), RAND(), ...) is never cached
+3. A data_version change drops cached results
+"""
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+import chat_cache_services as cache
+from data_version import current_version, bump_version
+
+
+def test_normalize_sql():
+    assert cache.normalize_sql("SELECT  *\n FROM t WHERE a = 'x  y' ;") == "SELECT * FROM t WHERE a = 'x  y'"
+
+
+def test_volatile_sql_is_not_cached():
+    for sql in ("SELECT SUM(net_value) FROM sales_data WHERE year = YEAR(CURDATE())",
+                "SELECT * FROM ar_aging_report WHERE report_date >= now() - INTERVAL 7 DAY",
+                "SELECT customer_name FROM sales_data ORDER BY RAND() LIMIT 5",
+                "SELECT CURRENT_DATE"):
+        assert cache.is_volatile(sql), sql
+        cache.get_result(sql)
+        cache.put_result(sql, [(1,)], current_version())
+        assert cache.get_result(sql) is None, sql
+
+    # Function names inside literals or as part of identifiers are fine
+    for sql in ("SELECT * FROM sales_data WHERE description LIKE '%NOW()%'",
+                "SELECT random_sample FROM t"):
+        assert not cache.is_volatile(sql), sql
+
+
+def test_result_cache_follows_data_version():
+    sql = "SELECT SUM(net_value) FROM sales_data WHERE year = 2025"
+    cache.get_result(sql)
+    cache.put_result(sql, [(10.0,)], current_version())
+    assert cache.get_result(sql) == [(10.0,)]
+    bump_version()
+    assert cache.get_result(sql) is None
+
+
+if __name__ == "__main__":
+    test_normalize_sql()
+    test_volatile_sql_is_not_cached()
+    test_result_cache_follows_data_version()
+    print("✅ All assertions passed")
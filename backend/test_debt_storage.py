@@ -0,0 +1,172 @@
+"""
+Test script for debt_storage_services (delta AR snapshots on an in-memory SQLite database)
+1. diff_snapshot: changed / new / removed customers, order-independent customer lines
+2. Checkpoint chain: every date reconstructs to its imported snapshot
+3. detach_snapshot: re-importing or removing a date keeps the later dates intact
+4. ar_aging_latest holds the reconstructed latest snapshot (chat SQL)
+"""
+import sys
+import os
+from contextlib import contextmanager
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+import debt_storage_services as ds
+from summary_services import refresh_ar_snapshot_summary, AR_LATEST_TABLE
+
+DATES = ["2025-01-01", "2025-01-02", "2025-01-03", "2025-01-04", "2025-01-05"]
+
+
+@contextmanager
+def delta_mode(interval):
+    saved = {k: os.environ.get(k) for k in ("DEBT_STORAGE", "DEBT_CHECKPOINT_INTERVAL")}
+    os.environ.update({"DEBT_STORAGE": "delta", "DEBT_CHECKPOINT_INTERVAL": str(interval)})
+    try:
+        yield
+    finally:
+        for key, value in saved.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+
+
+def make_db() -> Session:
+    db = Session(create_engine("sqlite://"))
+    db.execute(text("""
+        CREATE TABLE ar_aging_report (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, report_date TEXT, salesman_name TEXT, customer_name TEXT,
+            customer_code TEXT, channel TEXT, total_debt REAL, total_realization REAL,
+            debt_1_30 REAL, debt_31_60 REAL, debt_61_90 REAL, debt_91_120 REAL, debt_121_180 REAL,
+            debt_over_180 REAL, import_batch_id TEXT, is_removed INTEGER DEFAULT 0,
+            overdue_debt REAL AS (debt_61_90 + debt_91_120 + debt_121_180 + debt_over_180) STORED)
+    """))
+    db.execute(text("""
+        CREATE TABLE ar_snapshots (report_date TEXT PRIMARY KEY, storage TEXT, checkpoint_date TEXT,
+                                   batch_id TEXT, rows_total INTEGER, rows_stored INTEGER)
+    """))
+    db.execute(text("""
+        CREATE TABLE ar_snapshot_summary (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, report_date TEXT, channel TEXT, salesman_name TEXT,
+            customer_count INTEGER, total_debt REAL, total_realization REAL, debt_1_30 REAL, debt_31_60 REAL,
+            debt_61_90 REAL, debt_91_120 REAL, debt_121_180 REAL, debt_over_180 REAL)
+    """))
+    db.execute(text(f"""
+        CREATE TABLE {AR_LATEST_TABLE} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, report_date TEXT, salesman_name TEXT, customer_name TEXT,
+            customer_code TEXT, channel TEXT, total_debt REAL, total_realization REAL,
+            debt_1_30 REAL, debt_31_60 REAL, debt_61_90 REAL, debt_91_120 REAL, debt_121_180 REAL,
+            debt_over_180 REAL, overdue_debt REAL)
+    """))
+    return db
+
+
+def snapshot(codes, rng, salesman="S1"):
+    df = pd.DataFrame({"salesman_name": salesman, "customer_name": [f"Customer {c}" for c in codes],
+                       "customer_code": codes, "channel": "Retail"})
+    for column in ds.AMOUNT_COLUMNS:
+        df[column] = rng.integers(0, 5, len(codes)).astype(float)
+    df["import_batch_id"] = None
+    return df
+
+
+def import_snapshot(db, report_date, df, batch_id):
+    """What debt_services.upload_debt_data does around store_snapshot"""
+    ds.detach_snapshot(db, report_date)
+    db.execute(text("DELETE FROM ar_aging_report WHERE report_date = :d"), {"d": report_date})
+    result = ds.store_snapshot(db, report_date, df.assign(import_batch_id=batch_id), batch_id)
+    refresh_ar_snapshot_summary(db, [report_date])
+    return result
+
+
+def assert_snapshot(db, report_date, expected):
+    got = ds.load_snapshot_frame(db, report_date).drop(columns="import_batch_id")
+    expected = expected.drop(columns="import_batch_id")
+    pd.testing.assert_frame_equal(got.sort_values("customer_code").reset_index(drop=True),
+                                  expected.sort_values("customer_code").reset_index(drop=True), check_dtype=False)
+
+
+def test_diff_snapshot():
+    rng = np.random.default_rng(0)
+    previous = snapshot(["A", "B", "C", "D"], rng)
+    # B has two lines (two salesmen); their order must not matter
+    previous = pd.concat([previous, previous[previous.customer_code == "B"].assign(salesman_name="S2")],
+                         ignore_index=True)
+    current = previous[previous.customer_code != "D"].iloc[::-1].copy()  # D removed, order reversed
+    current.loc[current.customer_code == "C", "total_debt"] += 10         # C changed
+    current = pd.concat([current, snapshot(["E"], rng)], ignore_index=True)  # E new
+
+    changed, removed = ds.diff_snapshot(previous, current)
+    assert sorted(changed["customer_code"]) == ["C", "E"]
+    assert removed["customer_code"].tolist() == ["D"]
+
+    # A changed line of a multi-line customer stores all of its lines
+    current.loc[(current.customer_code == "B") & (current.salesman_name == "S2"), "debt_1_30"] += 1
+    changed, _ = ds.diff_snapshot(previous, current)
+    assert sorted(changed["customer_code"]) == ["B", "B", "C", "E"]
+
+
+def test_checkpoint_chain_and_detach():
+    rng = np.random.default_rng(1)
+    with delta_mode(interval=3):
+        db = make_db()
+        imported = {}
+        base = snapshot([f"C{i}" for i in range(40)], rng)
+        for i, report_date in enumerate(DATES):
+            current = base.copy()
+            current.loc[rng.choice(len(current), 4, replace=False), "total_debt"] += 100
+            current = pd.concat([current.iloc[2:], snapshot([f"N{i}a", f"N{i}b"], rng)], ignore_index=True)
+            result = import_snapshot(db, report_date, current, f"batch-{i}")
+            assert result["rows_stored"] < result["rows_total"] or result["storage"] == "full"
+            imported[report_date] = base = current
+
+        storage = dict(db.execute(text("SELECT report_date, storage FROM ar_snapshots")).fetchall())
+        assert [storage[d] for d in DATES] == ["full", "delta", "delta", "full", "delta"]
+        for report_date, expected in imported.items():
+            assert_snapshot(db, report_date, expected)
+
+        # Re-import a checkpoint that a delta date reconstructs through
+        changed = imported["2025-01-01"].iloc[1:].copy()
+        changed["total_debt"] += 1
+        import_snapshot(db, "2025-01-01", changed, "batch-9")
+        imported["2025-01-01"] = changed
+        for report_date, expected in imported.items():
+            assert_snapshot(db, report_date, expected)
+        assert db.execute(text("SELECT storage FROM ar_snapshots WHERE report_date = '2025-01-02'")).scalar() == "full"
+
+        # Remove a delta date in the middle of a chain (batch rollback)
+        ds.detach_snapshot(db, "2025-01-02")
+        db.execute(text("DELETE FROM ar_aging_report WHERE report_date = '2025-01-02'"))
+        refresh_ar_snapshot_summary(db, ["2025-01-02"])
+        del imported["2025-01-02"]
+        for report_date, expected in imported.items():
+            assert_snapshot(db, report_date, expected)
+
+
+def test_latest_snapshot_table():
+    rng = np.random.default_rng(2)
+    with delta_mode(interval=7):
+        db = make_db()
+        first = snapshot(["A", "B", "C"], rng)
+        second = first[first.customer_code != "B"].copy()
+        second.loc[second.customer_code == "C", "debt_over_180"] = 50.0
+        import_snapshot(db, DATES[0], first, "batch-1")
+        import_snapshot(db, DATES[1], second, "batch-2")
+
+        rows = db.execute(text(f"""
+            SELECT report_date, customer_code, debt_over_180 FROM {AR_LATEST_TABLE} ORDER BY customer_code
+        """)).fetchall()
+        assert [r[1] for r in rows] == ["A", "C"]
+        assert {r[0] for r in rows} == {DATES[1]}
+        assert rows[1][2] == 50.0
+
+
+if __name__ == "__main__":
+    test_diff_snapshot()
+    test_checkpoint_chain_and_detach()
+    test_latest_snapshot_table()
+    print("✅ All assertions passed")
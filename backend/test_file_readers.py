@@ -0,0 +1,93 @@
+"""
+Test script for file_readers (text export parsing, no database needed)
+1. Amount columns in SAP European (1.234,56) and US (1,234.56) formats
+2. DD.MM.YYYY dates, also with blank cells
+3. Codes keep their leading zeros in text exports
+4. Target uploads saved with the wrong extension
+"""
+import sys
+import os
+import tempfile
+import io
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+import pandas as pd
+from file_readers import detect_decimal_separator, to_numeric_column, parse_sap_dates, read_delimited, read_table_any
+
+
+def test_decimal_convention():
+    print("=" * 80)
+    print("AMOUNT PARSING")
+    print("=" * 80)
+
+    european = pd.Series(["1.234,56", "12,5", "1.234.567,00", "VND 2.000,00"])
+    assert detect_decimal_separator(european) == ','
+    assert to_numeric_column(european).tolist() == [1234.56, 12.5, 1234567.0, 2000.0]
+
+    us = pd.Series(["1,234.56", "12.5", "1,234,567.00"])
+    assert detect_decimal_separator(us) == '.'
+    assert to_numeric_column(us).tolist() == [1234.56, 12.5, 1234567.0]
+
+    # Dot-grouped integers (VND) are thousands, not decimals
+    assert to_numeric_column(pd.Series(["1.234.567", "250"])).tolist() == [1234567, 250]
+
+    # SAP trailing minus, blanks
+    parsed = to_numeric_column(pd.Series(["1.234,56-", "", None]))
+    assert parsed.iloc[0] == -1234.56 and parsed.iloc[1:].isna().all()
+
+    # Numeric columns (Excel) pass through untouched
+    numbers = pd.Series([1.5, 2.25])
+    assert to_numeric_column(numbers) is numbers
+    print("  ✅ All assertions passed")
+
+
+def test_sap_dates():
+    dates = parse_sap_dates(pd.Series(["03.10.2025", "31.12.2025"]))
+    assert [d.strftime('%Y-%m-%d') for d in dates] == ['2025-10-03', '2025-12-31']
+
+    # Blank cells must not switch the column to month-first parsing
+    dates = parse_sap_dates(pd.Series(["01.02.2025", "", None]))
+    assert dates.iloc[0] == pd.Timestamp(2025, 2, 1)
+    assert dates.iloc[1:].isna().all()
+
+
+def test_european_csv_end_to_end():
+    content = "Customer;Net Value\nA;1.234.567,89\nB;12,50\n".encode('utf-8')
+    df = read_delimited(content, 'sales.csv')
+    assert to_numeric_column(df['Net Value']).tolist() == [1234567.89, 12.5]
+
+
+def test_codes_keep_leading_zeros():
+    content = "Billing Document,Billing Item,Material,Net Value\n0090001234,000010,000123,5\n".encode('utf-8')
+    df = read_delimited(content, 'sales.csv')
+    assert df.iloc[0][['Billing Document', 'Billing Item', 'Material']].tolist() == ['0090001234', '000010', '000123']
+
+
+def test_target_fallback_readers():
+    """Target sheets saved with the wrong extension still parse"""
+    fd, path = tempfile.mkstemp(suffix='.xlsx')
+    with os.fdopen(fd, 'w') as f:
+        f.write("Salesman Name,Semester,Target\nA,1,600\n")
+    try:
+        for filename in ('targets.xlsx', 'targets.csv', None):
+            df = read_table_any(path, filename)
+            assert list(df.columns) == ['Salesman Name', 'Semester', 'Target'], filename
+            assert to_numeric_column(df['Target']).tolist() == [600]
+    finally:
+        os.remove(path)
+
+    excel = io.BytesIO()
+    pd.DataFrame({'Salesman Name': ['A'], 'Semester': [2], 'Target': [600]}).to_excel(excel, index=False)
+    for filename in ('targets.csv', 'targets.xlsx'):
+        excel.seek(0)
+        df = read_table_any(excel, filename)
+        assert to_numeric_column(df['Semester']).tolist() == [2], filename
+
+
+if __name__ == "__main__":
+    test_decimal_convention()
+    test_sap_dates()
+    test_european_csv_end_to_end()
+    test_codes_keep_leading_zeros()
+    test_target_fallback_readers()
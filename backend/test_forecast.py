@@ -0,0 +1,92 @@
+"""
+Test script for forecast_services (in-memory SQLite database)
+1. Each series is fitted on its own active span, not the dataset's timeline
+2. The current (partial) month is shown but never fitted
+"""
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from datetime import date
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+from database import Base
+import models
+import forecast_services as fs
+
+
+def make_db() -> Session:
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine, tables=[models.SalesData.__table__])
+    return Session(engine)
+
+
+def months_back(n):
+    """(year, month) n months before the current month"""
+    period = fs._current_period() - n
+    return period // 12, period % 12 + 1
+
+
+def add_sales(db, salesman, months, value):
+    for n in months:
+        year, month = months_back(n)
+        db.execute(text("""
+            INSERT INTO sales_data (salesman_name, dist, description, year, month_number, net_value, profit)
+            VALUES (:s, 'Retail', 'Paint A', :y, :m, :v, :p)
+        """), {"s": salesman, "y": year, "m": month, "v": value(n), "p": value(n) / 4})
+    db.commit()
+
+
+def test_series_fitted_on_own_span():
+    fs._model_cache.clear()
+    db = make_db()
+    add_sales(db, "VETERAN", range(1, 31), lambda n: 1000 - 10 * n)
+    add_sales(db, "NEW HIRE", range(1, 7), lambda n: 500 - 20 * n)   # started 6 months ago
+    add_sales(db, "LEFT", range(20, 31), lambda n: 300.0)            # stopped 20 months ago
+    add_sales(db, "TOO SHORT", [1, 2], lambda n: 50.0)
+    add_sales(db, "VETERAN", [0], lambda n: 1.0)                     # current month, partial
+
+    result = fs.get_series_forecast(db, "salesman", horizon=2)
+    series = {s["key"]: s for s in result["series"]}
+    assert set(series) == {"VETERAN", "NEW HIRE", "LEFT"} and result["series_fitted"] == 3
+
+    current = _label(months_back(0))
+    assert result["partial_month"] == current
+    assert result["last_actual"] == _label(months_back(1))
+    assert series["NEW HIRE"]["first_active"] == _label(months_back(6))
+    assert series["LEFT"]["last_active"] == _label(months_back(20))
+
+    # A straight line from its first month: the leading zeros would drag it down
+    new_hire = series["NEW HIRE"]["forecast"]
+    assert new_hire[0]["year"] == current["year"] and new_hire[0]["month"] == current["month"]
+    assert abs(new_hire[0]["value"] - 500) < 1e-6 and abs(new_hire[1]["value"] - 520) < 1e-6
+
+    # Every span is fitted on complete months only (the partial month would bend VETERAN)
+    veteran = series["VETERAN"]["forecast"]
+    assert abs(veteran[0]["value"] - 1000) < 1e-6
+
+
+def test_monthly_forecast_partial_month():
+    fs._model_cache.clear()
+    db = make_db()
+    add_sales(db, "VETERAN", range(1, 13), lambda n: 1000 - 10 * n)
+    add_sales(db, "VETERAN", [0], lambda n: 1.0)
+
+    year, month = months_back(0)
+    data = fs.get_monthly_forecast(db, year, horizon=1)
+    current = [row for row in data if row["name"] == fs.MONTH_NAMES[month - 1]]
+    assert len(current) == 1 and current[0]["partial"] is True
+    assert current[0]["revenue"] == 1.0 and abs(current[0]["forecast"] - 1000) < 1e-6
+    assert not any(row.get("partial") for row in data if row is not current[0])
+
+
+def _label(period):
+    year, month = period
+    return {"year": year, "month": month, "name": fs.MONTH_NAMES[month - 1]}
+
+
+if __name__ == "__main__":
+    test_series_fitted_on_own_span()
+    test_monthly_forecast_partial_month()
+    print("✅ All assertions passed")
@@ -0,0 +1,189 @@
+"""
+Test script for sales imports and batch rollback (in-memory SQLite, no MySQL needed)
+1. import_sales_data: new / unchanged / changed classification, xlsx vs CSV of the same lines
+2. replace_sales_period: period swap and its validation
+3. rollback_import_batch: append batch, batch that overwrote rows, later-batch conflict
+
+The services issue MySQL statements; _mysql_to_sqlite rewrites the few MySQL-only
+forms they use (INSERT IGNORE, temporary tables, CREATE TABLE LIKE, ON DUPLICATE KEY)
+so the Python logic around them runs against SQLite.
+"""
+import sys
+import os
+import io
+import re
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+import pandas as pd
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
+from database import Base
+import models
+from import_services import import_sales_data, replace_sales_period
+from batch_services import rollback_import_batch
+
+SALES_HEADER = ["Billing Document", "Billing Item", "Material", "Net Value", "Salesman Name", "Billing Date",
+                "Description", "Billing Qty", "Dist", "Branch", "PH3", "Name of Bill to"]
+
+
+def _mysql_to_sqlite(conn, cursor, statement, parameters, context, executemany):
+    statement = statement.replace("INSERT IGNORE", "INSERT OR IGNORE").replace("DROP TEMPORARY TABLE", "DROP TABLE")
+    statement = re.sub(r"CREATE TEMPORARY TABLE (\w+)\s+SELECT", r"CREATE TEMPORARY TABLE \1 AS SELECT", statement)
+    statement = re.sub(r"CREATE TABLE (\w+) LIKE (\w+)", r"CREATE TABLE \1 AS SELECT * FROM \2 WHERE 0", statement)
+    if "ON DUPLICATE KEY UPDATE" in statement:
+        head, updates = statement.split("ON DUPLICATE KEY UPDATE")
+        statement = (head + "ON CONFLICT(billing_document, billing_item) DO UPDATE SET "
+                     + re.sub(r"VALUES\((\w+)\)", r"excluded.\1", updates))
+    return statement, parameters
+
+
+def make_db() -> Session:
+    # One shared connection: replace_sales_period stages through a second connection
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    event.listen(engine, "before_cursor_execute", _mysql_to_sqlite, retval=True)
+    Base.metadata.create_all(engine, tables=[
+        models.SalesData.__table__, models.ProductCost.__table__, models.MonthlyTarget.__table__,
+        models.ImportBatch.__table__, models.ImportBatchPreimage.__table__, models.SalesPerformance.__table__,
+        models.ARAgingReport.__table__, models.ARSnapshot.__table__, models.ARSnapshotSummary.__table__,
+        models.DimSalesman.__table__, models.DimCustomer.__table__, models.DimProduct.__table__,
+        models.DimBranch.__table__, models.DimChannel.__table__,
+    ])
+    db = Session(engine)
+    db.execute(text("CREATE UNIQUE INDEX idx_unique_sales_transaction ON sales_data (billing_document, billing_item)"))
+    db.execute(text("INSERT INTO product_cost (description, cogs) VALUES ('Paint A', 10), ('Paint B', 20)"))
+    db.commit()
+    return db
+
+
+def line(doc, item, net_value, date="01.10.2025", description="Paint A", salesman="NGUYEN VAN A", material="000123"):
+    return [doc, item, material, net_value, salesman, date, description, "2", "Retail", "HCM", "Deco", "CUSTOMER X"]
+
+
+def sales_csv(lines) -> bytes:
+    rows = [";".join(SALES_HEADER)] + [";".join(str(v) for v in l) for l in lines]
+    return ("\n".join(rows) + "\n").encode("utf-8")
+
+
+def sales_xlsx(lines) -> bytes:
+    out = io.BytesIO()
+    pd.DataFrame(lines, columns=SALES_HEADER).astype(str).to_excel(out, index=False)
+    return out.getvalue()
+
+
+def sales_rows(db):
+    return {(r[0], r[1]): (r[2], r[3]) for r in db.execute(text(
+        "SELECT billing_document, billing_item, net_value, import_batch_id FROM sales_data"
+    )).fetchall()}
+
+
+def revenue(db, month=10):
+    return db.execute(text(
+        "SELECT SUM(total_revenue) FROM sales_performance_monthly WHERE year = 2025 AND month_number = :m"
+    ), {"m": month}).scalar()
+
+
+def test_import_classification():
+    db = make_db()
+    first = [line("90001", "10", "100,00"), line("90001", "20", "50,00")]
+    result = import_sales_data(sales_xlsx(first), db, "oct.xlsx")
+    assert (result["status"], result["rows_imported"], result["rows_updated"]) == ("success", 2, 0)
+    assert db.execute(text("SELECT DISTINCT material_code FROM sales_data")).scalar() == "000123"
+
+    # The same lines as a CSV export are unchanged (same key and row_hash as the xlsx)
+    result = import_sales_data(sales_csv(first), db, "oct.csv")
+    assert result["status"] == "info" and result["duplicates_skipped"] == 2
+
+    # One corrected, one unchanged, one new
+    second = [line("90001", "10", "120,00"), line("90001", "20", "50,00"), line("90002", "10", "7,50")]
+    result = import_sales_data(sales_csv(second), db, "oct.csv")
+    assert (result["rows_imported"], result["rows_updated"], result["duplicates_skipped"]) == (1, 1, 1)
+    rows = sales_rows(db)
+    assert {k: v[0] for k, v in rows.items()} == {("90001", "10"): 120.0, ("90001", "20"): 50.0, ("90002", "10"): 7.5}
+    assert rows[("90001", "10")][1] == rows[("90002", "10")][1] == result["batch_id"]
+    assert revenue(db) == 177.5
+
+
+def test_rollback_append_batch():
+    db = make_db()
+    first = import_sales_data(sales_csv([line("90001", "10", "100")]), db, "a.csv")
+    second = import_sales_data(sales_csv([line("90002", "10", "30")]), db, "b.csv")
+    assert revenue(db) == 130
+
+    result = rollback_import_batch(db, second["batch_id"])
+    assert (result["status"], result["sales_rows_deleted"], result["sales_rows_restored"]) == ("success", 1, 0)
+    assert sales_rows(db) == {("90001", "10"): (100.0, first["batch_id"])}
+    assert revenue(db) == 100
+    assert rollback_import_batch(db, second["batch_id"])["status"] == "info"
+
+
+def test_rollback_restores_overwritten_rows():
+    db = make_db()
+    first = import_sales_data(sales_csv([line("90001", "10", "100"), line("90001", "20", "5")]), db, "a.csv")
+    second = import_sales_data(sales_csv([line("90001", "10", "150", date="01.11.2025")]), db, "b.csv")
+    assert second["rows_updated"] == 1 and revenue(db, 11) == 150
+
+    result = rollback_import_batch(db, second["batch_id"])
+    assert (result["status"], result["sales_rows_deleted"], result["sales_rows_restored"]) == ("success", 1, 1)
+    assert sales_rows(db) == {("90001", "10"): (100.0, first["batch_id"]), ("90001", "20"): (5.0, first["batch_id"])}
+    # Both the cell the line moved to and the one it came back to are re-aggregated
+    assert revenue(db, 10) == 105 and revenue(db, 11) is None
+    assert db.execute(text("SELECT COUNT(*) FROM import_batch_preimages")).scalar() == 0
+
+
+def test_rollback_conflict_with_later_batch():
+    db = make_db()
+    import_sales_data(sales_csv([line("90001", "10", "100")]), db, "a.csv")
+    correction = import_sales_data(sales_csv([line("90001", "10", "150")]), db, "b.csv")
+    later = import_sales_data(sales_csv([line("90003", "10", "1")]), db, "c.csv")
+
+    result = rollback_import_batch(db, correction["batch_id"])
+    assert result["status"] == "conflict" and later["batch_id"] in result["message"]
+    assert sales_rows(db)[("90001", "10")][0] == 150  # nothing was touched
+
+    assert rollback_import_batch(db, later["batch_id"])["status"] == "success"
+    assert rollback_import_batch(db, correction["batch_id"])["status"] == "success"
+    assert {k: v[0] for k, v in sales_rows(db).items()} == {("90001", "10"): 100.0}
+
+
+def test_replace_sales_period():
+    db = make_db()
+    original = import_sales_data(sales_csv([
+        line("90001", "10", "100"), line("90001", "20", "50"), line("90009", "10", "9", date="05.11.2025")
+    ]), db, "a.csv")
+
+    # Validation: rows outside the period, duplicate keys
+    mixed = sales_csv([line("90001", "10", "1"), line("90002", "10", "1", date="01.11.2025")])
+    assert "outside" in replace_sales_period(mixed, db, 2025, 10, "x.csv")["message"]
+    assert "Cannot infer period" in replace_sales_period(mixed, db, filename="x.csv")["message"]
+    duplicated = sales_csv([line("90001", "10", "1"), line("90001", "10", "2")])
+    assert "duplicate" in replace_sales_period(duplicated, db, 2025, 10, "x.csv")["message"]
+    assert len(sales_rows(db)) == 3
+
+    result = replace_sales_period(sales_csv([line("90001", "10", "110"), line("90004", "10", "40")]), db,
+                                  filename="oct.csv")
+    assert (result["status"], result["year"], result["month"]) == ("success", 2025, 10)
+    assert (result["rows_deleted"], result["rows_imported"]) == (2, 2)
+    assert {k: v[0] for k, v in sales_rows(db).items()} == {
+        ("90001", "10"): 110.0, ("90004", "10"): 40.0, ("90009", "10"): 9.0
+    }
+    assert revenue(db, 10) == 150 and revenue(db, 11) == 9
+    assert "sales_data_staging" not in str(db.execute(text("SELECT name FROM sqlite_master")).fetchall())
+
+    # Rolling the replace back restores the month it replaced
+    assert rollback_import_batch(db, result["batch_id"])["status"] == "success"
+    assert sales_rows(db) == {
+        ("90001", "10"): (100.0, original["batch_id"]), ("90001", "20"): (50.0, original["batch_id"]),
+        ("90009", "10"): (9.0, original["batch_id"])
+    }
+    assert revenue(db, 10) == 150
+
+
+if __name__ == "__main__":
+    test_import_classification()
+    test_rollback_append_batch()
+    test_rollback_restores_overwritten_rows()
+    test_rollback_conflict_with_later_batch()
+    test_replace_sales_period()
+    print("✅ All assertions passed")
@@ -0,0 +1,118 @@
+"""
+Transaction Drill-Down (keyset pagination)
+Returns the sales_data rows behind a chart bar, newest first, ordered by (billing_date, id).
+
+Pages are addressed by an opaque cursor holding the last (billing_date, id) seen, so every
+page is an index seek + LIMIT - page 500 costs the same as page 1 (no OFFSET scan).
+The page of ids is selected from a (filter column, billing_date[, id]) index alone and the
+full rows are then fetched by primary key (deferred join).
+
+Period filters are applied as billing_date ranges (month_number is derived from billing_date
+at import), so rows without a billing_date are not reachable here.
+"""
+import base64
+from typing import Dict, Any, Optional, Tuple
+from sqlalchemy.orm import Session
+from query_builder import build_filters, compile_sql, period_date_range
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+_PAGE_SQL = """
+    SELECT
+        s.id, s.billing_date, s.billing_document, s.billing_item,
+        s.customer_name, s.salesman_name, s.dist, s.branch,
+        s.description, s.material_code, s.billing_qty, s.net_value, s.profit
+    FROM (
+        SELECT id
+        FROM sales_data
+        WHERE {where}
+        ORDER BY billing_date DESC, id DESC
+        LIMIT :limit
+    ) page
+    JOIN sales_data s ON s.id = page.id
+    ORDER BY s.billing_date DESC, s.id DESC
+"""
+
+
+def encode_cursor(billing_date: str, row_id: int) -> str:
+    return base64.urlsafe_b64encode(f"{billing_date}|{row_id}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, int]:
+    """
+    Raises:
+        ValueError: If the cursor was not produced by encode_cursor
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        billing_date, row_id = raw.split("|")
+        return billing_date, int(row_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def get_transactions(db: Session, year: int = None, semester: int = None, month: int = None,
+                     channel: str = None, branch: str = None, salesman: str = None,
+                     product: str = None, customer: str = None,
+                     cursor: Optional[str] = None, page_size: int = DEFAULT_PAGE_SIZE) -> Dict[str, Any]:
+    """
+    One page of sales_data rows matching the analytics filters
+
+    Args:
+        year, semester, month: Period filters (same meaning as the analytics endpoints)
+        channel, branch, salesman, product, customer: Equality filters
+        cursor: next_cursor from the previous page (None for the first page)
+        page_size: Rows per page, capped at MAX_PAGE_SIZE
+
+    Returns:
+        Dict with data (rows), next_cursor (None on the last page) and page_size
+    """
+    page_size = max(1, min(int(page_size), MAX_PAGE_SIZE))
+
+    where, params = build_filters(channel=channel, branch=branch, salesman=salesman,
+                                  product=product, customer=customer)
+    clauses = [] if where == "1=1" else [where]
+    clauses.append("billing_date IS NOT NULL")
+
+    date_from, date_to = period_date_range(year, semester, month)
+    if date_from:
+        clauses.append("billing_date >= :date_from AND billing_date < :date_to")
+        params.update(date_from=date_from, date_to=date_to)
+
+    if cursor:
+        # Leading billing_date <= keeps the predicate a range seek on the index
+        params["cursor_date"], params["cursor_id"] = decode_cursor(cursor)
+        clauses.append("billing_date <= :cursor_date AND (billing_date < :cursor_date OR id < :cursor_id)")
+
+    # Fetch one extra row to know whether there is a next page
+    params["limit"] = page_size + 1
+    rows = db.execute(compile_sql(_PAGE_SQL.format(where=" AND ".join(clauses))), params).fetchall()
+
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+
+    data = [
+        {
+            "id": r[0],
+            "billing_date": r[1],
+            "billing_document": r[2],
+            "billing_item": r[3],
+            "customer": r[4],
+            "salesman": r[5],
+            "channel": r[6],
+            "branch": r[7],
+            "product": r[8],
+            "material_code": r[9],
+            "billing_qty": float(r[10] or 0),
+            "revenue": float(r[11] or 0),
+            "profit": float(r[12] or 0)
+        }
+        for r in rows
+    ]
+
+    return {
+        "data": data,
+        "next_cursor": encode_cursor(rows[-1][1], rows[-1][0]) if has_more else None,
+        "page_size": page_size
+    }
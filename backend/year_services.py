@@ -4,6 +4,7 @@ Year-aware utility functions for dashboard
 from sqlalchemy.orm import Session
 from sqlalchemy import text
 from datetime import datetime
+import columnar_cache
 
 def get_available_years(db: Session):
     """
@@ -27,6 +28,93 @@ def get_default_year(db: Session):
         return years[0]  # Latest year
     return datetime.now().year  # Fallback to current year
 
+def _top_by_key(db: Session, year: int, key_column: str, dim_table: str, limit: int = 10):
+    """Top-N dimension members by revenue for a year (NULL keys excluded)"""
+    query = text(f"""
+        SELECT d.name, t.value
+        FROM (
+            SELECT {key_column} as id, SUM(net_value) as value
+            FROM sales_data
+            WHERE year = :year AND {key_column} IS NOT NULL
+            GROUP BY {key_column}
+            ORDER BY value DESC
+            LIMIT :limit
+        ) t
+        JOIN {dim_table} d ON d.id = t.id
+        ORDER BY t.value DESC
+    """)
+    return [
+        {"name": row[0], "value": float(row[1] or 0)}
+        for row in db.execute(query, {"year": year, "limit": limit}).fetchall()
+    ]
+
+def _dashboard_charts_sql(db: Session, year: int):
+    """KPI sums, monthly trend and top-10 distributions for a year (MySQL path)"""
+    # KPI Calculations
+    kpi_query = text("""
+        SELECT 
+            SUM(net_value) as total_revenue,
+            SUM(profit) as total_profit,
+            SUM(marketing_spend) as total_marketing
+        FROM sales_data
+        WHERE year = :year
+    """)
+    
+    kpi_result = db.execute(kpi_query, {"year": year}).fetchone()
+    
+    # Growth calculations (compare with previous year)
+    prev_year_query = text("""
+        SELECT 
+            SUM(net_value) as prev_revenue,
+            SUM(profit) as prev_profit
+        FROM sales_data
+        WHERE year = :prev_year
+    """)
+    
+    prev_result = db.execute(prev_year_query, {"prev_year": year - 1}).fetchone()
+    
+    # Monthly Trend
+    monthly_query = text("""
+        SELECT 
+            month_number,
+            month,
+            SUM(net_value) as revenue,
+            SUM(profit) as profit
+        FROM sales_data
+        WHERE year = :year
+        GROUP BY month_number, month
+        ORDER BY month_number
+    """)
+    
+    monthly_result = db.execute(monthly_query, {"year": year}).fetchall()
+    monthly_trend = [
+        {
+            "name": row[1] or f"Month {row[0]}",
+            "revenue": float(row[2] or 0),
+            "profit": float(row[3] or 0)
+        }
+        for row in monthly_result
+    ]
+    
+    # Top-10 distributions: group on the integer keys, join names for the 10 rows only
+    channel_distribution = _top_by_key(db, year, "channel_id", "dim_channel")
+    branch_distribution = _top_by_key(db, year, "branch_id", "dim_branch")
+    top_products = _top_by_key(db, year, "product_id", "dim_product")
+    top_salesmen = _top_by_key(db, year, "salesman_id", "dim_salesman")
+    
+    return {
+        "revenue": kpi_result[0] or 0,
+        "profit": kpi_result[1] or 0,
+        "marketing": kpi_result[2] or 0,
+        "prev_revenue": prev_result[0] or 0,
+        "prev_profit": prev_result[1] or 0,
+        "monthly_trend": monthly_trend,
+        "channel_distribution": channel_distribution,
+        "branch_distribution": branch_distribution,
+        "top_products": top_products,
+        "top_salesmen": top_salesmen
+    }
+
 def get_dashboard_stats_by_year(db: Session, year: int = None):
     """
     Get dashboard statistics filtered by year
@@ -36,135 +124,22 @@ def get_dashboard_stats_by_year(db: Session, year: int = None):
         year = get_default_year(db)
     
     try:
-        # KPI Calculations
-        kpi_query = text("""
-            SELECT 
-                SUM(net_value) as total_revenue,
-                SUM(profit) as total_profit,
-                SUM(marketing_spend) as total_marketing
-            FROM sales_data
-            WHERE year = :year
-        """)
+        # KPIs and charts: columnar cache when enabled, otherwise MySQL
+        cache = columnar_cache.get_cache(db)
+        charts = cache.dashboard_charts(year) if cache is not None else _dashboard_charts_sql(db, year)
         
-        kpi_result = db.execute(kpi_query, {"year": year}).fetchone()
-        
-        revenue = kpi_result[0] or 0
-        profit = kpi_result[1] or 0
-        marketing = kpi_result[2] or 0
+        revenue = charts["revenue"]
+        profit = charts["profit"]
+        marketing = charts["marketing"]
         margin = (profit / revenue * 100) if revenue > 0 else 0
         
         # Growth calculations (compare with previous year)
-        prev_year_query = text("""
-            SELECT 
-                SUM(net_value) as prev_revenue,
-                SUM(profit) as prev_profit
-            FROM sales_data
-            WHERE year = :prev_year
-        """)
-        
-        prev_result = db.execute(prev_year_query, {"prev_year": year - 1}).fetchone()
-        prev_revenue = prev_result[0] or 0
-        prev_profit = prev_result[1] or 0
-        
+        prev_revenue = charts["prev_revenue"]
+        prev_profit = charts["prev_profit"]
         revenue_growth = ((revenue - prev_revenue) / prev_revenue * 100) if prev_revenue > 0 else 0
         profit_growth = ((profit - prev_profit) / prev_profit * 100) if prev_profit > 0 else 0
         
-        # Monthly Trend
-        monthly_query = text("""
-            SELECT 
-                month_number,
-                month,
-                SUM(net_value) as revenue,
-                SUM(profit) as profit
-            FROM sales_data
-            WHERE year = :year
-            GROUP BY month_number, month
-            ORDER BY month_number
-        """)
-        
-        monthly_result = db.execute(monthly_query, {"year": year}).fetchall()
-        monthly_trend = [
-            {
-                "name": row[1] or f"Month {row[0]}",
-                "revenue": float(row[2] or 0),
-                "profit": float(row[3] or 0)
-            }
-            for row in monthly_result
-        ]
-        
-        # Channel Distribution
-        channel_query = text("""
-            SELECT 
-                dist as channel,
-                SUM(net_value) as value
-            FROM sales_data
-            WHERE year = :year AND dist IS NOT NULL
-            GROUP BY dist
-            ORDER BY value DESC
-            LIMIT 10
-        """)
-        
-        channel_result = db.execute(channel_query, {"year": year}).fetchall()
-        channel_distribution = [
-            {"name": row[0], "value": float(row[1] or 0)}
-            for row in channel_result
-        ]
-        
-        # Branch Distribution
-        branch_query = text("""
-            SELECT 
-                branch,
-                SUM(net_value) as value
-            FROM sales_data
-            WHERE year = :year AND branch IS NOT NULL
-            GROUP BY branch
-            ORDER BY value DESC
-            LIMIT 10
-        """)
-        
-        branch_result = db.execute(branch_query, {"year": year}).fetchall()
-        branch_distribution = [
-            {"name": row[0], "value": float(row[1] or 0)}
-            for row in branch_result
-        ]
-        
-        # Top Products
-        product_query = text("""
-            SELECT 
-                description,
-                SUM(net_value) as value
-            FROM sales_data
-            WHERE year = :year AND description IS NOT NULL
-            GROUP BY description
-            ORDER BY value DESC
-            LIMIT 10
-        """)
-        
-        product_result = db.execute(product_query, {"year": year}).fetchall()
-        top_products = [
-            {"name": row[0], "value": float(row[1] or 0)}
-            for row in product_result
-        ]
-        
-        # Top Salesmen
-        salesman_query = text("""
-            SELECT 
-                salesman_name,
-                SUM(net_value) as value
-            FROM sales_data
-            WHERE year = :year AND salesman_name IS NOT NULL
-            GROUP BY salesman_name
-            ORDER BY value DESC
-            LIMIT 10
-        """)
-        
-        salesman_result = db.execute(salesman_query, {"year": year}).fetchall()
-        top_salesmen = [
-            {"name": row[0], "value": float(row[1] or 0)}
-            for row in salesman_result
-        ]
-        
-        # Sales Performance (from view) - Grouped by Semester
+        # Sales Performance (from materialized summary) - Grouped by Semester
         performance_query = text("""
             SELECT 
                 salesman_name,
@@ -176,7 +151,7 @@ def get_dashboard_stats_by_year(db: Session, year: int = None):
                     THEN (SUM(total_revenue) * 1.0 / SUM(total_target)) * 100
                     ELSE 0 
                 END as achievement
-            FROM view_sales_performance_v2
+            FROM sales_performance_monthly
             WHERE year = :year
             GROUP BY salesman_name, semester
             ORDER BY salesman_name, semester
@@ -218,11 +193,11 @@ def get_dashboard_stats_by_year(db: Session, year: int = None):
                 "margin": margin
             },
             "charts": {
-                "monthly_trend": monthly_trend,
-                "channel_distribution": channel_distribution,
-                "branch_distribution": branch_distribution,
-                "top_products": top_products,
-                "top_salesmen": top_salesmen
+                "monthly_trend": charts["monthly_trend"],
+                "channel_distribution": charts["channel_distribution"],
+                "branch_distribution": charts["branch_distribution"],
+                "top_products": charts["top_products"],
+                "top_salesmen": charts["top_salesmen"]
             },
             "sales_performance": sales_performance
         }
@@ -119,7 +119,11 @@ const AnalyticsPage: React.FC = () => {
     const [selectedDebtDate, setSelectedDebtDate] = useState<string | null>(null);
 
     // Channel Analysis state
-    const [channelData, setChannelData] = useState<ChannelData | null>(null);
+    // All three semester views are fetched together; the toggle switches locally
+    const [channelBySemester, setChannelBySemester] = useState<Record<'S1' | 'S2' | 'FY', ChannelData> | null>(null);
+    const channelData: ChannelData | null = channelBySemester
+        ? channelBySemester[selectedSemester === 1 ? 'S1' : selectedSemester === 2 ? 'S2' : 'FY']
+        : null;
     const [channelLoading, setChannelLoading] = useState(false);
 
     // ============= DATA FETCHING =============
@@ -185,12 +189,11 @@ const AnalyticsPage: React.FC = () => {
     const fetchChannelData = async () => {
         setChannelLoading(true);
         try {
-            const semesterParam = selectedSemester !== null ? `&semester=${selectedSemester}` : '';
-            const response = await fetch(`http://localhost:8000/api/analytics/channel-performance?year=${selectedYear}${semesterParam}`);
+            const response = await fetch(`http://localhost:8000/api/analytics/channel-performance?year=${selectedYear}&all_semesters=true`);
             const data = await response.json();
 
             if (data.status === 'success') {
-                setChannelData(data.data);
+                setChannelBySemester(data.data);
             }
         } catch (error) {
             console.error('Error fetching channel data:', error);
@@ -214,7 +217,7 @@ const AnalyticsPage: React.FC = () => {
         if (activeTab === 'channel') {
             fetchChannelData();
         }
-    }, [activeTab, selectedYear, selectedSemester]);
+    }, [activeTab, selectedYear]);
 
     // Calculate averages for reference lines
     const avgRevenue = productMatrix.length > 0
@@ -26,6 +26,7 @@ interface BusinessChartsProps {
 const CHART_COLORS = {
     revenue: '#10b981',
     profit: '#3b82f6',
+    forecast: '#6366f1',
     marketing: '#f43f5e',
     products: '#f59e0b',
     salesmen: '#8b5cf6',
@@ -83,6 +84,16 @@ const BusinessCharts: React.FC<BusinessChartsProps> = ({ charts }) => {
                                     strokeWidth={3}
                                     dot={{ r: 4, fill: "#fff", stroke: CHART_COLORS.profit, strokeWidth: 2 }}
                                 />
+                                <Line
+                                    type="monotone"
+                                    dataKey="forecast"
+                                    name="Forecast"
+                                    stroke={CHART_COLORS.forecast}
+                                    strokeWidth={2}
+                                    strokeDasharray="6 4"
+                                    dot={false}
+                                    connectNulls
+                                />
                             </ComposedChart>
                         </ResponsiveContainer>
                     </div>